@@ -0,0 +1,323 @@
+import glob
+import io
+import json
+import os
+import queue
+import struct
+import threading
+import time
+from datetime import datetime, timezone, timedelta
+
+import numpy as np
+
+from metrics import registry
+
+# Columnar market-data archive. Published payloads are flattened to one row
+# per strike pair and buffered by a background writer thread, which appends
+# them as compressed record batches (np.savez_compressed, one frame per
+# flush) to segment files named
+#   <root>/<prefix>_<YYYY-MM-DD>_<NNN>.mda
+# A new segment starts on each IST trading day and whenever the current one
+# passes max_bytes. A frame is MAGIC + uint32 length + npz bytes, so a frame
+# cut short by a crash is simply ignored by the reader.
+#
+# Each flush writes one frame per underlying, and each frame gets a line in a
+# sidecar index (<segment>.idx, JSONL) with its byte offset, size, underlying
+# and ts range. Readers seek straight to the frames of the requested
+# underlying and time window, and decode only the requested columns.
+
+IST = timezone(timedelta(hours=5, minutes=30))
+MAGIC = b"MDA1"
+FRAME_HEADER = struct.Struct("<4sI")
+SUFFIX = ".mda"
+INDEX_SUFFIX = ".idx"
+
+# Flat row schema: (column, dtype). Strings are fixed-width unicode so the
+# batches load without pickle.
+BLOCK_COLUMNS = [("ts", "f8"), ("underlying", "U32"), ("spot", "f8"), ("expiry", "U10"), ("lot", "i4"),
+                 ("weight", "f8"), ("status", "U8"), ("vix", "f8")]
+ROW_COLUMNS = [("pair_index", "i2"),
+               ("ce_strike", "f8"), ("ce_ltp", "f8"), ("ce_fv", "f8"), ("ce_iv", "f8"), ("ce_tv", "f8"),
+               ("bs_ce_fv", "f8"), ("cs_ce_fv", "f8"), ("ce_vol", "i8"), ("ce_oi", "i8"), ("ce_impv", "f8"),
+               ("pe_strike", "f8"), ("pe_ltp", "f8"), ("pe_fv", "f8"), ("pe_iv", "f8"), ("pe_tv", "f8"),
+               ("bs_pe_fv", "f8"), ("cs_pe_fv", "f8"), ("pe_vol", "i8"), ("pe_oi", "i8"), ("pe_impv", "f8"),
+               ("diff", "f8"), ("fv_diff", "f8"), ("bias", "U12")]
+COLUMNS = BLOCK_COLUMNS + ROW_COLUMNS
+MISSING = {"f8": np.nan, "i8": 0, "i4": 0, "i2": 0}
+
+WRITE_SECONDS = registry.histogram("archive_write_seconds", "Time to encode and append one flush to a segment")
+
+def flatten_payload(payload, ts, vix=None):
+    # {"indices": [{"name", "spot", "expiry", "lot", "rows": [...]}, ...]} ->
+    # list of flat row dicts, one per strike pair
+    out = []
+    for block in payload.get("indices", []):
+        head = {"ts": ts, "underlying": block.get("name", ""), "spot": block.get("spot"),
+                "expiry": block.get("expiry", ""), "lot": block.get("lot"),
+                "weight": block.get("weight"), "status": block.get("status", ""), "vix": vix}
+        for i, row in enumerate(block.get("rows", [])):
+            flat = dict(head, pair_index=i)
+            for name, _ in ROW_COLUMNS[1:]:
+                flat[name] = row.get(name)
+            out.append(flat)
+    return out
+
+def encode_batch(rows):
+    columns = {}
+    for name, dtype in COLUMNS:
+        missing = MISSING.get(dtype, "")
+        columns[name] = np.array([missing if r.get(name) is None else r[name] for r in rows], dtype=dtype)
+    buf = io.BytesIO()
+    np.savez_compressed(buf, **columns)
+    data = buf.getvalue()
+    return FRAME_HEADER.pack(MAGIC, len(data)) + data
+
+def segment_day(ts):
+    return datetime.fromtimestamp(ts, IST).strftime('%Y-%m-%d')
+
+class ArchiveWriter:
+    def __init__(self, root, prefix, max_bytes=64 << 20, flush_rows=5000, flush_interval=60.0, queue_size=1024):
+        self.root = root
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self.rows_written = 0
+        self.bytes_written = 0
+        self.segment = None
+        self._thread = None
+
+    def start(self):
+        os.makedirs(self.root, exist_ok=True)
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=f"archive-{self.prefix}", daemon=True)
+            self._thread.start()
+        return self
+
+    def append(self, payload, ts=None, vix=None):
+        # Never blocks the caller; a full queue drops the payload and counts it.
+        # vix is the India VIX the payload was priced with (kept for replay).
+        if not payload:
+            return False
+        try:
+            self.queue.put_nowait((time.time() if ts is None else ts, payload, vix))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def close(self, timeout=10.0):
+        # Flushes whatever is buffered and stops the writer thread
+        if self._thread is not None:
+            self.queue.put(None)
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _segment_path(self, day):
+        # Continue the newest segment of the day unless it is full
+        paths = sorted(glob.glob(os.path.join(self.root, f"{self.prefix}_{day}_*{SUFFIX}")))
+        n = int(paths[-1][-len(SUFFIX) - 3:-len(SUFFIX)]) if paths else 0
+        path = os.path.join(self.root, f"{self.prefix}_{day}_{n:03d}{SUFFIX}")
+        while os.path.exists(path) and os.path.getsize(path) >= self.max_bytes:
+            n += 1
+            path = os.path.join(self.root, f"{self.prefix}_{day}_{n:03d}{SUFFIX}")
+        return path
+
+    def _write(self, day, rows):
+        if not rows:
+            return
+        if (self.segment is None or self.segment[0] != day or not os.path.exists(self.segment[1])
+                or os.path.getsize(self.segment[1]) >= self.max_bytes):
+            os.makedirs(self.root, exist_ok=True)
+            self.segment = (day, self._segment_path(day))
+        groups = {}
+        for row in rows:
+            groups.setdefault(row["underlying"], []).append(row)
+        path = self.segment[1]
+        try:
+            with open(path, "ab") as f, open(path + INDEX_SUFFIX, "a") as idx:
+                for underlying, group in groups.items():
+                    frame = encode_batch(group)
+                    offset = f.seek(0, os.SEEK_END)
+                    f.write(frame)
+                    f.flush()
+                    idx.write(json.dumps({"offset": offset, "size": len(frame), "underlying": underlying,
+                                          "rows": len(group), "ts_min": group[0]["ts"],
+                                          "ts_max": group[-1]["ts"]}) + "\n")
+                    self.bytes_written += len(frame)
+        except OSError:
+            self.segment = None  # pick (and create) a fresh segment on the next flush
+            raise
+        self.rows_written += len(rows)
+
+    def _flush(self, pending):
+        for day, rows in pending.items():
+            try:
+                with WRITE_SECONDS.time(prefix=self.prefix):
+                    self._write(day, rows)
+            except Exception as e:
+                print(f"Error writing archive {self.prefix}: {e}")
+        pending.clear()
+
+    def _run(self):
+        pending = {}  # day -> rows
+        count = 0
+        last_flush = time.time()
+        while True:
+            try:
+                item = self.queue.get(timeout=1.0)
+            except queue.Empty:
+                item = False
+            if item is None:
+                break
+            if item:
+                ts, payload, vix = item
+                rows = flatten_payload(payload, ts, vix)
+                pending.setdefault(segment_day(ts), []).extend(rows)
+                count += len(rows)
+            if count >= self.flush_rows or (count and time.time() - last_flush >= self.flush_interval):
+                self._flush(pending)
+                count, last_flush = 0, time.time()
+        self._flush(pending)
+
+# --- Reader ---
+
+def _read_frame(f, offset, names=None):
+    # Decoded columns of the frame at offset (None if torn or not a frame)
+    f.seek(offset)
+    header = f.read(FRAME_HEADER.size)
+    if len(header) < FRAME_HEADER.size:
+        return None
+    magic, size = FRAME_HEADER.unpack(header)
+    data = f.read(size)
+    if magic != MAGIC or len(data) < size:
+        return None
+    with np.load(io.BytesIO(data), allow_pickle=False) as z:
+        if names is None:
+            return {name: z[name] for name in z.files}
+        # Columns added after a segment was written read as missing values
+        rows = len(z["ts"])
+        dtypes = dict(COLUMNS)
+        return {name: z[name] if name in z.files else np.full(rows, MISSING.get(dtypes[name], ""), dtype=dtypes[name])
+                for name in names}
+
+def segment_index(path):
+    # Frame entries of one segment: the sidecar index, plus a scan of any
+    # frames written after it (a missing .idx is rebuilt the same way)
+    entries = []
+    file_size = os.path.getsize(path)
+    try:
+        with open(path + INDEX_SUFFIX) as idx:
+            for line in idx:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+                if entry["offset"] + entry["size"] > file_size:
+                    break
+                entries.append(entry)
+    except FileNotFoundError:
+        pass
+    offset = entries[-1]["offset"] + entries[-1]["size"] if entries else 0
+    with open(path, "rb") as f:
+        while offset < file_size:
+            batch = _read_frame(f, offset, ("ts", "underlying"))
+            if batch is None:
+                break
+            size = f.tell() - offset
+            ts = batch["ts"]
+            for underlying in np.unique(batch["underlying"]).tolist():
+                sel = ts[batch["underlying"] == underlying]
+                entries.append({"offset": offset, "size": size, "underlying": underlying, "rows": len(sel),
+                                "ts_min": float(sel.min()), "ts_max": float(sel.max())})
+            offset += size
+    return entries
+
+def iter_frames(path):
+    # Decoded batches ({column: array}) of one segment file, in write order
+    with open(path, "rb") as f:
+        offset = 0
+        while True:
+            batch = _read_frame(f, offset)
+            if batch is None:
+                return
+            offset = f.tell()
+            yield batch
+
+def segment_paths(root, prefix, start=None, end=None):
+    # Segment files that can hold rows between start and end (epoch seconds)
+    first = segment_day(start) if start is not None else ""
+    last = segment_day(end) if end is not None else "9999"
+    out = []
+    for path in sorted(glob.glob(os.path.join(root, f"{prefix}_*{SUFFIX}"))):
+        day = os.path.basename(path)[len(prefix) + 1:len(prefix) + 11]
+        if first <= day <= last:
+            out.append(path)
+    return out
+
+def _columns(fields):
+    dtypes = dict(COLUMNS)
+    names = [n for n, _ in COLUMNS] if fields is None else ["ts"] + [f for f in fields if f != "ts"]
+    unknown = [n for n in names if n not in dtypes]
+    if unknown:
+        raise ValueError(f"Unknown archive fields: {unknown}")
+    return names
+
+def iter_range(root, prefix, start=None, end=None, fields=None, underlying=None):
+    # Yields {column: array} batches of the rows with start <= ts <= end (and
+    # the given underlying, if any), in write order. Only frames whose index
+    # entry overlaps the request are read, and only the requested columns.
+    names = _columns(fields)
+    load = names if underlying is None or "underlying" in names else names + ["underlying"]
+    for path in segment_paths(root, prefix, start, end):
+        offsets = []
+        for entry in segment_index(path):
+            if underlying is not None and entry["underlying"] != underlying:
+                continue
+            if (start is not None and entry["ts_max"] < start) or (end is not None and entry["ts_min"] > end):
+                continue
+            if not offsets or offsets[-1] != entry["offset"]:
+                offsets.append(entry["offset"])
+        if not offsets:
+            continue
+        with open(path, "rb") as f:
+            for offset in offsets:
+                batch = _read_frame(f, offset, load)
+                if batch is None:
+                    break
+                ts = batch["ts"]
+                mask = np.ones(len(ts), dtype=bool)
+                if start is not None:
+                    mask &= ts >= start
+                if end is not None:
+                    mask &= ts <= end
+                if underlying is not None:
+                    mask &= batch["underlying"] == underlying
+                if mask.any():
+                    yield {n: batch[n][mask] for n in names}
+
+def read_range(root, prefix, start=None, end=None, fields=None, underlying=None):
+    # Every matching row as {column: array}, ordered by time. fields limits
+    # the columns returned ("ts" is always included).
+    names = _columns(fields)
+    parts = {n: [] for n in names}
+    for batch in iter_range(root, prefix, start, end, fields, underlying):
+        for n in names:
+            parts[n].append(batch[n])
+    dtypes = dict(COLUMNS)
+    out = {n: np.concatenate(parts[n]) if parts[n] else np.array([], dtype=dtypes[n]) for n in names}
+    order = np.argsort(out["ts"], kind="stable")
+    return {n: v[order] for n, v in out.items()}
+
+def batch_records(batch):
+    # Row dicts of a batch, with NaN (missing IV etc.) as None for JSON
+    names = list(batch)
+    columns = []
+    for n in names:
+        values = batch[n].tolist()
+        if batch[n].dtype.kind == "f":
+            values = [None if v != v else v for v in values]
+        columns.append(values)
+    return [dict(zip(names, row)) for row in zip(*columns)]
@@ -0,0 +1,335 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# Reproducible benchmarks for the fetch -> compute -> publish path, all
+# offline. Micro benchmarks time the pricing models (vectorized against the
+# scalar per-leg loop they replaced) and the payload builders at 50/200/1000
+# underlyings; macro benchmarks run full mega-quote cycles against
+# fake_upstox.py and fan a payload out to 10/100/1000 subscribers. Results
+# are written as JSON and compared with a baseline:
+#   python benchmarks.py --out bench_results.json --baseline bench_baseline.json
+#   python benchmarks.py --save-baseline bench_baseline.json   # on the box
+# Exits non-zero when a benchmark is slower than baseline by more than
+# --tolerance.
+
+BENCHMARKS = []
+
+def benchmark(name):
+    def register(fn):
+        BENCHMARKS.append((name, fn))
+        return fn
+    return register
+
+def summarize(samples, per_call=1):
+    # Seconds per operation from a list of batch timings
+    per_op = sorted(s / per_call for s in samples)
+    return {"median": statistics.median(per_op), "p95": per_op[min(len(per_op) - 1, int(0.95 * len(per_op)))],
+            "min": per_op[0], "ops_per_s": 1.0 / statistics.median(per_op), "samples": len(per_op)}
+
+def timed(fn, repeat, number=1):
+    fn()  # warm-up
+    samples = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append(time.perf_counter() - t)
+    return summarize(samples, number)
+
+# --- 1. MICRO ---
+
+@benchmark("pricing.bs_call_price")
+def bench_bs(scale):
+    from pricing import bs_call_price
+    return timed(lambda: bs_call_price(22000.0, 22100.0, 7 / 365.0, 0.1, 0.14), 20 * scale, 200)
+
+@benchmark("pricing.mjd_call_price")
+def bench_mjd(scale):
+    from pricing import mjd_call_price
+    return timed(lambda: mjd_call_price(22000.0, 22100.0, 7 / 365.0, 0.1, 0.14), 20 * scale, 50)
+
+@benchmark("pricing.cs_call_price")
+def bench_cs(scale):
+    from pricing import cs_call_price
+    return timed(lambda: cs_call_price(22000.0, 22100.0, 7 / 365.0, 0.1, 0.14), 20 * scale, 200)
+
+@benchmark("pricing.calculate_iv")
+def bench_iv(scale):
+    from pricing import calculate_iv
+    return timed(lambda: calculate_iv(120.0, 22000.0, 22100.0, 7.0, 0.1, "CE"), 20 * scale, 10)
+
+def synthetic_blocks(n, pairs=6):
+    # n underlyings worth of build_pair_rows input
+    rng = np.random.default_rng(n)
+    blocks = []
+    for i in range(n):
+        spot = float(rng.uniform(200, 5000))
+        step = 10.0 if spot > 1000 else 5.0
+        atm = round(spot / step) * step
+        legs = [{"ce_strike": atm - k * step, "ce_ltp": max(spot - atm + k * step, 0) + 8.0, "ce_vol": 100, "ce_oi": 1000,
+                 "pe_strike": atm + k * step, "pe_ltp": max(atm + k * step - spot, 0) + 7.5, "pe_vol": 100, "pe_oi": 1000}
+                for k in range(1, pairs + 1)]
+        blocks.append({"spot": spot, "days_to_expiry": 12.0, "lot": 500, "legs": legs})
+    return blocks
+
+def pair_inputs(n):
+    # Flattened CE/PE legs of n synthetic underlyings, as build_pair_rows passes them
+    legs = [(b["spot"], leg["ce_strike"], leg["pe_strike"], b["days_to_expiry"] / 365.0)
+            for b in synthetic_blocks(n) for leg in b["legs"]]
+    return [list(col) for col in zip(*legs)]
+
+def pairs_vectorized(n):
+    # price_pairs over every leg in one pass, compared with pairs_scalar below
+    def run(scale):
+        from pricing import price_pairs
+        spots, ce, pe, T = pair_inputs(n)
+        return timed(lambda: price_pairs(spots, ce, pe, T, 0.14), 5 * scale)
+    return run
+
+def pairs_scalar(n):
+    # The per-leg loop over the scalar models that price_pairs replaced
+    def run(scale):
+        from pricing import bs_call_price, bs_put_price, cs_call_price, cs_put_price, mjd_call_price, mjd_put_price
+        legs = list(zip(*pair_inputs(n)))
+
+        def loop():
+            for s, ce, pe, t in legs:
+                mjd_call_price(s, ce, t, 0.1, 0.14), mjd_put_price(s, pe, t, 0.1, 0.14)
+                bs_call_price(s, ce, t, 0.1, 0.14), bs_put_price(s, pe, t, 0.1, 0.14)
+                cs_call_price(s, ce, t, 0.1, 0.14), cs_put_price(s, pe, t, 0.1, 0.14)
+        return timed(loop, 2 * scale)
+    return run
+
+for _n in (50, 1000):
+    benchmark(f"pricing.price_pairs[{_n}]")(pairs_vectorized(_n))
+    benchmark(f"pricing.scalar_pairs[{_n}]")(pairs_scalar(_n))
+
+@benchmark("pricing.norm_cdf_vec[180k]")
+def bench_norm_cdf(scale):
+    from pricing import norm_cdf_vec
+    x = np.random.default_rng(0).normal(0.0, 3.0, 180_000)
+    return timed(lambda: norm_cdf_vec(x), 5 * scale)
+
+def pin_expiry(days=12):
+    # Benchmarks price a fixed days-to-expiry, not whatever the instrument
+    # master lists relative to today
+    import server
+    from datetime import timedelta
+    server.watchlist.set_expiries(server.STOCKS, [(server.ist_now() + timedelta(days=days)).strftime('%Y-%m-%d')])
+
+def payload_builder(n):
+    def run(scale):
+        import server
+        blocks = synthetic_blocks(n)
+        return timed(lambda: server.build_pair_rows(blocks), 5 * scale)
+    return run
+
+def nifty_rebuild(n):
+    # rebuild_nifty_payload over n synthetic stocks, every stock dirty
+    def run(scale):
+        import server
+        pin_expiry()
+        server.nifty_meta.clear()
+        server.nifty_book.__init__()
+        updates = {}
+        for i, block in enumerate(synthetic_blocks(n)):
+            stock = f"BENCH{i:04d}"
+            strike_keys = {}
+            for leg in block["legs"]:
+                for side in ("ce", "pe"):
+                    sk = server.strike_key(leg[f"{side}_strike"])
+                    updates[f"BENCH|{stock}|{side}|{sk}"] = {"ltp": leg[f"{side}_ltp"], "oi": leg[f"{side}_oi"], "volume": leg[f"{side}_vol"]}
+                    strike_keys[sk] = (f"BENCH|{stock}|ce|{sk}", f"BENCH|{stock}|pe|{sk}")
+            step = (block["legs"][0]["pe_strike"] - block["legs"][0]["ce_strike"]) / 2
+            server.nifty_meta[stock] = {"stock": stock, "key": f"BENCH|{stock}", "interval": step, "strikes": [],
+                                        "strike_keys": strike_keys, "local_keys": set()}
+            updates[f"BENCH|{stock}"] = {"ltp": block["spot"]}
+        server.quote_store.update(updates)
+        stocks = list(server.nifty_meta)
+
+        def cycle():
+            server.nifty_book.invalidate()
+            server.nifty_book.blocks.clear()  # force fresh blocks so every row is rebuilt and diffed
+            server.rebuild_nifty_payload(stocks)
+        result = timed(cycle, 5 * scale)
+        server.nifty_meta.clear()
+        return result
+    return run
+
+for _n in (50, 200, 1000):
+    benchmark(f"payload.build_pair_rows[{_n}]")(payload_builder(_n))
+    benchmark(f"payload.rebuild_nifty_payload[{_n}]")(nifty_rebuild(_n))
+
+@benchmark("analytics.analyze_chain[250]")
+def bench_chain_analytics(scale):
+    # One index's full chain: IV, Greeks, OI profile, PCR and max pain
+    from chain_analytics import analyze_chain
+    from pricing import bs_price_vec
+    spot, T = 25482.5, 7 / 365.0
+    strikes = np.arange(19250.0, 31750.0, 50.0)
+    ce, pe = (np.round(bs_price_vec(spot, strikes, T, 0.1, 0.13, c), 2).tolist() for c in (True, False))
+    chain = [{"strike_price": k, "call_options": {"market_data": {"ltp": c, "oi": 1000 + i, "prev_oi": 900, "volume": 50}},
+              "put_options": {"market_data": {"ltp": p, "oi": 1500 - i, "prev_oi": 1400, "volume": 70}}}
+             for i, (k, c, p) in enumerate(zip(strikes.tolist(), ce, pe))]
+    return timed(lambda: analyze_chain(chain, spot, T, 0.14), 10 * scale)
+
+# --- 2. MACRO ---
+
+def synthetic_captures(stocks, ticks, strikes=15):
+    # Capture records for fake_upstox: one chain per stock at t=0 and a
+    # quotes snapshot of every key per tick, with prices drifting each tick
+    import server
+    records = []
+    rng = np.random.default_rng(7)
+    quotes = {}  # instrument key -> base price
+    for stock, key in stocks.items():
+        spot = float(rng.uniform(200, 5000))
+        step = 10.0 if spot > 1000 else 5.0
+        atm = round(spot / step) * step
+        chain = []
+        for k in range(-strikes, strikes + 1):
+            strike = atm + k * step
+            ce_key, pe_key = f"NSE_FO|{stock}{strike}CE", f"NSE_FO|{stock}{strike}PE"
+            quotes[ce_key] = max(spot - strike, 0) + 8.0
+            quotes[pe_key] = max(strike - spot, 0) + 7.5
+            chain.append({"strike_price": strike, "underlying_spot_price": spot,
+                          "call_options": {"instrument_key": ce_key}, "put_options": {"instrument_key": pe_key}})
+        quotes[key] = spot
+        records.append({"ts": 0.0, "path": "/v2/option/chain", "status": 200,
+                        "params": {"instrument_key": key, "expiry_date": server.stock_expiry()},
+                        "body": json.dumps({"status": "success", "data": chain})})
+    quotes[server.VIX_KEY] = 14.0
+    for t in range(ticks):
+        drift = 1.0 + 0.001 * t
+        data = {k.replace("|", ":"): {"instrument_token": k, "last_price": round(p * drift, 2), "volume": 100 + t,
+                                      "open_interest": 1000, "ohlc": {"close": p}} for k, p in quotes.items()}
+        records.append({"ts": float(t), "path": "/v2/market-quote/quotes", "status": 200, "params": {},
+                        "body": json.dumps({"status": "success", "data": data})})
+    return records
+
+@benchmark("macro.mega_quote_cycle[50]")
+def bench_mega_cycle(scale):
+    # One REST poll of every tracked key (400-key chunks through the pooled
+    # client and scheduler) plus re-pricing and publishing what moved
+    import httpx
+    import server
+    from fake_upstox import CaptureStore, create_app
+    from meta_cache import MetaCache
+    from rate_limit import RequestScheduler
+    server.configure()
+    pin_expiry()
+    cycles = 5 * scale
+    now = [0.0]
+    app = create_app(CaptureStore(synthetic_captures(server.NIFTY_KEYS, cycles + 2)), clock=lambda: now[0])
+    unlimited = {"quote": (1e6, 1e6), "option_chain": (1e6, 1e6), "default": (1e6, 1e6)}
+    api = server.UpstoxAPI("bench", transport=httpx.ASGITransport(app=app), scheduler=RequestScheduler(limits=unlimited))
+
+    async def run():
+        saved = server.upstox, server.meta_cache
+        server.upstox = api
+        server.meta_cache = MetaCache(os.path.join(root, "option_meta.json"))  # cold, and never the real cache
+        await api.start()
+        try:
+            server.nifty_meta.clear()
+            server.nifty_book.__init__()
+            await server.initialize_nifty_meta()
+            samples = []
+            for _ in range(cycles + 1):
+                now[0] += 1.0
+                t = time.perf_counter()
+                await server.poll_mega_quotes()
+                server.publish_dirty_nifty()
+                samples.append(time.perf_counter() - t)
+            return summarize(samples[1:])
+        finally:
+            await api.close()
+            server.upstox, server.meta_cache = saved
+            server.nifty_meta.clear()
+    with tempfile.TemporaryDirectory() as root:
+        return asyncio.run(run())
+
+def fanout(clients):
+    # Publish -> every subscriber's queue drained, through the broadcast hub
+    def run(scale):
+        from broadcast import BroadcastHub
+        blocks = [{"name": f"S{i}", "spot": 100.0 + i, "rows": [{"diff": 0.5}] * 6} for i in range(50)]
+
+        async def go():
+            hub = BroadcastHub(queue_size=64)
+            hub.publish({"timestamp": "0", "indices": blocks})
+            subs = [hub.subscribe() for _ in range(clients)]
+            for sub in subs:
+                sub.queue.get_nowait()  # initial snapshot
+            samples = []
+            for v in range(10 * scale):
+                payload = {"timestamp": str(v), "indices": [dict(blocks[0], spot=v)] + blocks[1:]}
+                t = time.perf_counter()
+                hub.publish(payload)
+                for sub in subs:
+                    await sub.queue.get()
+                samples.append(time.perf_counter() - t)
+            return summarize(samples)
+        return asyncio.run(go())
+    return run
+
+for _n in (10, 100, 1000):
+    benchmark(f"macro.ws_fanout[{_n}]")(fanout(_n))
+
+# --- 3. RESULTS ---
+
+def compare(results, baseline, tolerance):
+    # Benchmarks whose median got slower than baseline by more than tolerance
+    regressions = {}
+    for name, stats in results.items():
+        base = baseline.get(name)
+        if base and base["median"] > 0:
+            ratio = stats["median"] / base["median"]
+            stats["vs_baseline"] = round(ratio, 3)
+            if ratio > 1 + tolerance:
+                regressions[name] = ratio
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline latency/throughput benchmarks")
+    parser.add_argument("--out", default="bench_results.json")
+    parser.add_argument("--baseline", default="bench_baseline.json")
+    parser.add_argument("--save-baseline", metavar="PATH", help="write this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown vs baseline (0.25 = 25%%)")
+    parser.add_argument("--only", default="", help="run benchmarks whose name contains this")
+    parser.add_argument("--scale", type=int, default=1, help="multiply repetitions")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for name, fn in BENCHMARKS:
+        if args.only and args.only not in name:
+            continue
+        results[name] = fn(args.scale)
+        print(f"{name:40s} median {results[name]['median'] * 1e3:10.4f} ms   p95 {results[name]['p95'] * 1e3:10.4f} ms")
+
+    regressions = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f)["results"], args.tolerance)
+    report = {"meta": {"timestamp": time.time(), "python": platform.python_version(), "numpy": np.__version__,
+                       "platform": platform.platform(), "scale": args.scale},
+              "results": results, "regressions": regressions}
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(report, f, indent=2)
+    for name, ratio in regressions.items():
+        print(f"REGRESSION {name}: {ratio:.2f}x baseline")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
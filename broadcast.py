@@ -0,0 +1,91 @@
+import asyncio
+import json
+
+from ws_protocol import DeltaChannel
+
+# Publish/subscribe fan-out for the dashboard sockets. Fetcher threads
+# publish a payload once; the hub turns it into a DeltaChannel patch, encodes
+# that to JSON text once and pushes the same string onto every subscriber's
+# bounded queue on the event loop. A subscriber whose queue is full is a slow
+# consumer: its backlog is dropped and it is resynced with one snapshot.
+
+class Subscriber:
+    def __init__(self, queue_size):
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.seq = None  # last seq queued for this client
+        self.dropped = 0
+
+class BroadcastHub:
+    def __init__(self, history=64, queue_size=16):
+        self.channel = DeltaChannel(history=history)
+        self.queue_size = queue_size
+        self.subscribers = set()
+        self.loop = None
+        self.published = 0
+        self.slow_drops = 0
+        self.last_bytes = 0  # size of the last encoded patch
+        self._snapshot = (None, None)  # (seq, encoded text)
+
+    def publish(self, payload, changed=None, removed=None):
+        # Safe to call from any thread
+        seq = self.channel.seq
+        patch = self.channel.publish(payload, changed, removed)
+        if self.loop is None:
+            return patch
+        if patch is None:
+            if self.channel.seq != seq:
+                # First payload: clients that connected before it get it as a snapshot
+                snap_seq, text = self.snapshot()
+                self.loop.call_soon_threadsafe(self._fanout, snap_seq, None, text)
+            return patch
+        text = json.dumps(patch)
+        self.published += 1
+        self.last_bytes = len(text)
+        self.loop.call_soon_threadsafe(self._fanout, patch["seq"], patch["base"], text)
+        return patch
+
+    def snapshot(self):
+        # (seq, text) of the current full payload, encoded at most once per seq
+        message = self.channel.snapshot_message()
+        if message is None:
+            return None, None
+        if self._snapshot[0] != message["seq"]:
+            self._snapshot = (message["seq"], json.dumps(message))
+        return self._snapshot
+
+    def _offer(self, sub, seq, text):
+        try:
+            sub.queue.put_nowait(text)
+        except asyncio.QueueFull:
+            # Slow consumer: drop everything it has not sent yet and jump it
+            # straight to the latest snapshot.
+            while not sub.queue.empty():
+                sub.queue.get_nowait()
+            sub.dropped += 1
+            self.slow_drops += 1
+            seq, text = self.snapshot()
+            sub.queue.put_nowait(text)
+        sub.seq = seq
+
+    def _fanout(self, seq, base, text):
+        for sub in list(self.subscribers):
+            if sub.seq is not None and seq <= sub.seq:
+                continue  # already covered by the snapshot it started from
+            if sub.seq != base:
+                snap_seq, snap_text = self.snapshot()
+                self._offer(sub, snap_seq, snap_text)
+            else:
+                self._offer(sub, seq, text)
+
+    def subscribe(self):
+        # Must run on the event loop. Queues the current snapshot, if any.
+        self.loop = asyncio.get_running_loop()
+        sub = Subscriber(self.queue_size)
+        seq, text = self.snapshot()
+        if text is not None:
+            self._offer(sub, seq, text)
+        self.subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        self.subscribers.discard(sub)
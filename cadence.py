@@ -0,0 +1,119 @@
+import asyncio
+import json
+import time
+from datetime import datetime, timedelta, timezone
+
+# Market-hours aware pacing for the fetch loops. NSE and BSE share one
+# equity/F&O timetable (IST):
+#   09:00-09:15 pre-open, 09:15-15:30 continuous, 15:30-16:00 post-close
+# and are closed on weekends and on the dates in market_holidays.json. Each
+# loop owns a Ticker that fires on a fixed-rate clock (the next tick is due
+# one interval after the previous one was due, however long the cycle took),
+# scales its interval by session phase, runs faster on expiry days and when
+# VIX is high, and outside market hours takes one end-of-day snapshot and
+# then sleeps until the next pre-open.
+
+IST = timezone(timedelta(hours=5, minutes=30))
+
+CLOSED, PRE_OPEN, OPEN, POST_CLOSE = "closed", "pre_open", "open", "post_close"
+SESSION = ((9, 0, PRE_OPEN), (9, 15, OPEN), (15, 30, POST_CLOSE), (16, 0, CLOSED))
+
+# Interval multipliers by phase (None = dormant)
+PHASE_FACTORS = {PRE_OPEN: 3.0, OPEN: 1.0, POST_CLOSE: 6.0, CLOSED: None}
+FAST_FACTOR = 0.5  # expiry day or VIX above VIX_FAST
+VIX_FAST = 20.0
+MIN_INTERVAL = 2.0
+
+def load_holidays(path="market_holidays.json", year=None):
+    try:
+        with open(path) as f:
+            holidays = set(json.load(f).get("holidays", {}))
+    except FileNotFoundError:
+        print(f"No holiday calendar at {path}; only weekends count as closed")
+        return set()
+    year = str(year or datetime.now(IST).year)
+    if not any(day.startswith(year) for day in holidays):
+        print(f"{path} lists no holidays for {year}; exchange holidays will be treated as trading days")
+    return holidays
+
+class MarketCalendar:
+    def __init__(self, holidays=(), always_open=False):
+        self.holidays = set(holidays)
+        self.always_open = always_open  # e.g. running against a fake API at night
+
+    def is_trading_day(self, day):
+        return day.weekday() < 5 and day.strftime('%Y-%m-%d') not in self.holidays
+
+    def phase(self, ts):
+        if self.always_open:
+            return OPEN
+        now = datetime.fromtimestamp(ts, IST)
+        if not self.is_trading_day(now):
+            return CLOSED
+        phase = CLOSED
+        for hour, minute, name in SESSION:
+            if (now.hour, now.minute) >= (hour, minute):
+                phase = name
+        return phase
+
+    def next_open(self, ts):
+        # Epoch seconds of the next pre-open start after ts
+        now = datetime.fromtimestamp(ts, IST)
+        day = now.replace(hour=SESSION[0][0], minute=SESSION[0][1], second=0, microsecond=0)
+        if day <= now:
+            day += timedelta(days=1)
+        while not self.is_trading_day(day):
+            day += timedelta(days=1)
+        return day.timestamp()
+
+class Ticker:
+    def __init__(self, name, interval, calendar, expiries=None, vix=None, clock=time.time, sleep=asyncio.sleep):
+        self.name = name
+        self.interval = interval
+        self.calendar = calendar
+        self.expiries = expiries  # callable returning the tracked expiry dates
+        self.vix = vix  # callable returning the current India VIX
+        self.clock = clock
+        self.sleep = sleep
+        self.next_at = None
+        self.eod_done = False
+        self.skipped = 0
+        self.phase = None
+
+    def current_interval(self, ts):
+        # Seconds between cycles right now, or None when dormant
+        factor = PHASE_FACTORS[self.phase]
+        if factor is None:
+            return None
+        today = datetime.fromtimestamp(ts, IST).strftime('%Y-%m-%d')
+        fast = (self.expiries and today in self.expiries()) or (self.vix and self.vix() >= VIX_FAST)
+        if fast:
+            factor *= FAST_FACTOR
+        return max(MIN_INTERVAL, self.interval * factor) if fast else self.interval * factor
+
+    async def wait(self):
+        # Returns when the next cycle is due
+        while True:
+            now = self.clock()
+            self.phase = self.calendar.phase(now)
+            if self.phase != CLOSED:
+                break
+            if not self.eod_done:
+                # One snapshot after the close (or on a closed-hours start), then sleep
+                self.eod_done = True
+                self.next_at = None
+                return
+            wake = self.calendar.next_open(now)
+            print(f"{self.name}: market closed, sleeping until {datetime.fromtimestamp(wake, IST):%Y-%m-%d %H:%M}")
+            await self.sleep(wake - now)
+        self.eod_done = False
+        interval = self.current_interval(now)
+        if self.next_at is None:
+            self.next_at = now
+            return
+        self.next_at += interval
+        if self.next_at < now:
+            # The cycle overran: skip the missed ticks instead of bursting
+            self.skipped += int((now - self.next_at) // interval) + 1
+            self.next_at = now
+        await self.sleep(self.next_at - now)
@@ -0,0 +1,102 @@
+import numpy as np
+
+from pricing import bs_greeks_vec, implied_vol_vec
+
+# Whole-chain analytics for one index, computed from the /v2/option/chain
+# response the row builder already fetched: per-strike implied vol and
+# Greeks, OI-weighted Greek exposure, the OI/volume profile, put-call ratios,
+# max pain and the strikes with the largest change in open interest on the
+# day. Everything is a numpy pass over all listed strikes; only the profile
+# around ATM is published strike by strike.
+#
+# IV is solved once per strike from the out-of-the-money leg (the liquid one;
+# parity gives the ITM leg the same vol) and both legs' Greeks use it.
+
+PROFILE_STRIKES = 20  # strikes either side of ATM in the published profile
+TOP_OI_CHANGES = 5
+MIN_SOLVE_T = 1 / (365 * 24)  # under an hour to expiry IV is noise: use the fallback
+MIN_SOLVE_PRICE = 0.5
+
+def chain_arrays(chain):
+    # Column arrays (sorted by strike) for the fields the analytics use
+    rows = sorted(chain, key=lambda row: row["strike_price"])
+    out = {"strike": np.array([row["strike_price"] for row in rows], dtype=float)}
+    for side, field in (("ce", "call_options"), ("pe", "put_options")):
+        data = [row.get(field, {}).get("market_data", {}) for row in rows]
+        out[f"{side}_ltp"] = np.array([d.get("ltp") or d.get("close_price") or 0 for d in data], dtype=float)
+        out[f"{side}_oi"] = np.array([d.get("oi") or 0 for d in data], dtype=float)
+        out[f"{side}_prev_oi"] = np.array([d.get("prev_oi", d.get("oi")) or 0 for d in data], dtype=float)  # no prev_oi = no change
+        out[f"{side}_vol"] = np.array([d.get("volume") or 0 for d in data], dtype=float)
+    return out
+
+def max_pain(strikes, ce_oi, pe_oi):
+    # Expiry price at which option holders are paid the least in total
+    settle = strikes[:, None]
+    payout = (ce_oi * np.maximum(settle - strikes, 0)).sum(axis=1) + (pe_oi * np.maximum(strikes - settle, 0)).sum(axis=1)
+    return float(strikes[np.argmin(payout)])
+
+def analyze_chain(chain, spot, T, vol, r=0.1):
+    # T in years; vol is the fallback sigma for legs whose IV does not solve
+    if not chain or spot <= 0:
+        return None
+    c = chain_arrays(chain)
+    strikes = c["strike"]
+    n = len(strikes)
+
+    otm_call = strikes >= spot
+    otm_ltp = np.where(otm_call, c["ce_ltp"], c["pe_ltp"])
+    # Far wings quoted at a few ticks carry no vol information and cost the
+    # solver the most iterations
+    solve = otm_ltp >= MIN_SOLVE_PRICE if T >= MIN_SOLVE_T else np.zeros(n, dtype=bool)
+    ivs, converged = np.full(n, np.nan), np.zeros(n, dtype=bool)
+    if solve.any():
+        ivs[solve], converged[solve] = implied_vol_vec(otm_ltp[solve], spot, strikes[solve], T, r, otm_call[solve])
+    sigma = np.where(converged, ivs, vol)
+    # Greeks of every CE and PE leg as one 2 x n batch
+    is_call = np.array([[True], [False]])
+    greeks = bs_greeks_vec(spot, np.stack([strikes, strikes]), T, r, np.stack([sigma, sigma]), is_call)
+
+    ce_oi, pe_oi = c["ce_oi"], c["pe_oi"]
+    ce_chg, pe_chg = ce_oi - c["ce_prev_oi"], pe_oi - c["pe_prev_oi"]
+    total_ce_oi, total_pe_oi = float(ce_oi.sum()), float(pe_oi.sum())
+    total_ce_vol, total_pe_vol = float(c["ce_vol"].sum()), float(c["pe_vol"].sum())
+
+    # Largest absolute OI changes across both sides
+    changes = np.concatenate([ce_chg, pe_chg])
+    top = [i for i in np.argsort(-np.abs(changes))[:TOP_OI_CHANGES] if changes[i] != 0]
+    top_oi_change = [{"strike": float(strikes[i % n]), "side": "CE" if i < n else "PE",
+                      "oi": int((ce_oi if i < n else pe_oi)[i % n]), "change": int(changes[i])} for i in top]
+
+    atm = int(np.argmin(np.abs(strikes - spot)))
+    lo, hi = max(0, atm - PROFILE_STRIKES), min(n, atm + PROFILE_STRIKES + 1)
+    iv_pct = np.where(converged, np.round(ivs * 100, 2), np.nan)
+    oi = np.stack([ce_oi, pe_oi])
+    g = {k: np.round(v[:, lo:hi], 4).tolist() for k, v in greeks.items()}
+    profile = []
+    for j, i in enumerate(range(lo, hi)):
+        profile.append({
+            "strike": float(strikes[i]),
+            "ce_oi": int(ce_oi[i]), "pe_oi": int(pe_oi[i]), "ce_oi_chg": int(ce_chg[i]), "pe_oi_chg": int(pe_chg[i]),
+            "ce_vol": int(c["ce_vol"][i]), "pe_vol": int(c["pe_vol"][i]),
+            "iv": None if np.isnan(iv_pct[i]) else float(iv_pct[i]),
+            "ce_delta": g["delta"][0][j], "pe_delta": g["delta"][1][j],
+            "gamma": g["gamma"][0][j], "vega": g["vega"][0][j],  # same sigma, same for both legs
+            "ce_theta": g["theta"][0][j], "pe_theta": g["theta"][1][j],
+        })
+
+    return {
+        "spot": spot,
+        "atm": float(strikes[atm]),
+        "strikes_listed": n,
+        "total_ce_oi": int(total_ce_oi), "total_pe_oi": int(total_pe_oi),
+        "pcr": round(total_pe_oi / total_ce_oi, 3) if total_ce_oi else None,
+        "pcr_volume": round(total_pe_vol / total_ce_vol, 3) if total_ce_vol else None,
+        "max_pain": max_pain(strikes, ce_oi, pe_oi) if total_ce_oi + total_pe_oi else None,
+        "atm_iv": None if np.isnan(iv_pct[atm]) else float(iv_pct[atm]),
+        # Sum over all strikes of open interest x Greek, both sides
+        "oi_delta": round(float((oi * greeks["delta"]).sum()), 2),
+        "oi_gamma": round(float((oi * greeks["gamma"]).sum()), 4),
+        "oi_vega": round(float((oi * greeks["vega"]).sum()), 2),
+        "top_oi_change": top_oi_change,
+        "profile": profile,
+    }
@@ -0,0 +1,13 @@
+# Shared helpers for the tests; plain imports, so the test modules also run
+# as scripts.
+import csv
+import gzip
+
+# Columns of the Upstox instrument master (complete.csv.gz)
+MASTER_HEADER = ["instrument_key", "exchange_token", "tradingsymbol", "name", "last_price", "expiry", "strike", "tick_size",
+                 "lot_size", "instrument_type", "option_type", "exchange"]
+
+def write_master_rows(path, rows):
+    # A gzipped instrument master holding rows (lists in MASTER_HEADER order)
+    with gzip.open(path, "wt", encoding="utf-8", newline="") as f:
+        csv.writer(f).writerows([MASTER_HEADER] + rows)
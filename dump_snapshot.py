@@ -0,0 +1,72 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+from shared_snapshot import SnapshotReader
+
+# Dumps the latest published payload of a running server (any role but
+# "web") from its memory-mapped snapshot file: no socket, no network. The
+# payload is written straight from the mapping and kept only if the writer
+# did not overwrite it meanwhile.
+#   python dump_snapshot.py nifty50 -o ws_data_nifty.json
+#   python dump_snapshot.py indices --pretty
+
+def dump(reader, out, retries=8):
+    # seq of the payload written to out (a seekable file), 0 before the
+    # first publish, None if the writer kept lapping the copy
+    for _ in range(retries):
+        seq, view = reader.view()
+        if view is None:
+            return 0
+        with view:
+            start = out.tell()
+            out.write(view)
+        if reader.valid(seq):
+            return seq
+        out.seek(start)
+        out.truncate()
+    return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Dump the latest dashboard snapshot from shared memory")
+    parser.add_argument("channel", choices=("indices", "nifty50"))
+    parser.add_argument("-o", "--out", help="output file (default: stdout)")
+    parser.add_argument("--pretty", action="store_true", help="re-indent the JSON (parses it)")
+    parser.add_argument("--name", default=os.getenv("SNAPSHOT_SHM", "algo-dash"))
+    parser.add_argument("--dir", default=os.getenv("SNAPSHOT_DIR") or None)
+    args = parser.parse_args()
+
+    reader = SnapshotReader(f"{args.name}-{args.channel}", directory=args.dir)
+    if not reader.attach():
+        sys.exit(f"No snapshot at {reader.path}; is the server running?")
+    try:
+        if args.pretty:
+            data = reader.read()
+            if data is None:
+                sys.exit("Nothing published yet")
+            text = json.dumps(json.loads(data), indent=2)
+            if args.out:
+                with open(args.out, "w") as f:
+                    f.write(text)
+            else:
+                print(text)
+            return
+        started = time.perf_counter()
+        if args.out:
+            with open(args.out, "wb") as f:
+                seq = dump(reader, f)
+        else:
+            data = reader.read()  # a pipe cannot be rewound: copy first
+            seq = reader.seq if data is not None else (None if reader.torn else 0)
+            if data is not None:
+                sys.stdout.buffer.write(data)
+        if not seq:
+            sys.exit("Nothing published yet" if seq == 0 else "Snapshot kept changing; try again")
+        print(f"Snapshot {seq // 2} of {reader.path} in {(time.perf_counter() - started) * 1000:.2f} ms", file=sys.stderr)
+    finally:
+        reader.close()
+
+if __name__ == "__main__":
+    main()
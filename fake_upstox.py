@@ -0,0 +1,172 @@
+import argparse
+import asyncio
+import bisect
+import json
+import random
+import time
+
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+
+from http_capture import read_captures
+
+# Local Upstox stand-in serving captured responses (see http_capture.py) on
+# /v2/option/chain and /v2/market-quote/quotes, plus /v2/option/contract
+# rebuilt from the captured chains (the server's watchlist falls back to it
+# when there is no instrument master, as offline). The captures play back on
+# their own clock at `speed` x real time: a chain request gets the last
+# captured chain of that (instrument_key, expiry_date) at the current replay
+# time, and a quotes request is assembled per instrument from every captured
+# quote, so any chunking of the keys can be answered. Latency and error
+# injection make it usable for load and failure testing:
+#   python fake_upstox.py capture.jsonl.gz --port 8001 --latency 0.05 --error-rate 0.02
+#   UPSTOX_BASE_URL=http://127.0.0.1:8001 uvicorn server:app
+
+class Timeline:
+    # Values keyed by time; at(t) is the last one at or before t (else the first)
+    def __init__(self):
+        self.times = []
+        self.values = []
+
+    def add(self, ts, value):
+        i = bisect.bisect_right(self.times, ts)
+        self.times.insert(i, ts)
+        self.values.insert(i, value)
+
+    def at(self, ts):
+        return self.values[max(0, bisect.bisect_right(self.times, ts) - 1)]
+
+class CaptureStore:
+    def __init__(self, records=()):
+        self.chains = {}  # (instrument_key, expiry) -> Timeline of data lists
+        self.quotes = {}  # instrument_token -> Timeline of (response key, details)
+        self.start = None
+        self.end = None
+        for record in records:
+            self.add(record)
+
+    def add(self, record):
+        if record.get("status") != 200:
+            return
+        try:
+            payload = json.loads(record["body"])
+        except ValueError:
+            return
+        if payload.get("status") != "success":
+            return
+        ts, params = record["ts"], record.get("params", {})
+        if record["path"] == "/v2/option/chain":
+            key = (params.get("instrument_key"), params.get("expiry_date"))
+            self.chains.setdefault(key, Timeline()).add(ts, payload.get("data", []))
+        elif record["path"] == "/v2/market-quote/quotes":
+            for resp_key, details in payload.get("data", {}).items():
+                token = details.get("instrument_token") or resp_key.replace(":", "|")
+                self.quotes.setdefault(token, Timeline()).add(ts, (resp_key, details))
+        else:
+            return
+        self.start = ts if self.start is None else min(self.start, ts)
+        self.end = ts if self.end is None else max(self.end, ts)
+
+    def option_chain(self, instrument_key, expiry, ts):
+        timeline = self.chains.get((instrument_key, expiry))
+        return timeline.at(ts) if timeline else []
+
+    def option_contracts(self, instrument_key, ts):
+        # Every option listed in the captured chains of that underlying
+        contracts = []
+        for (key, expiry), timeline in self.chains.items():
+            if key != instrument_key:
+                continue
+            for row in timeline.at(ts):
+                for side, option_type in (("call_options", "CE"), ("put_options", "PE")):
+                    option_key = row.get(side, {}).get("instrument_key")
+                    if option_key:
+                        contracts.append({"instrument_key": option_key, "segment": option_key.split("|")[0], "expiry": expiry,
+                                          "strike_price": row.get("strike_price"), "instrument_type": option_type,
+                                          "underlying_key": key})
+        return contracts
+
+    def market_quotes(self, instrument_keys, ts):
+        data = {}
+        for token in instrument_keys:
+            timeline = self.quotes.get(token)
+            if timeline:
+                resp_key, details = timeline.at(ts)
+                data[resp_key] = details
+        return data
+
+def create_app(store, speed=1.0, latency=0.0, jitter=0.0, error_rate=0.0, error_status=503, seed=None, clock=time.monotonic):
+    app = FastAPI()
+    rng = random.Random(seed)
+    started = clock()
+    app.state.requests = 0
+    app.state.errors = 0
+
+    def replay_time():
+        # Capture time being served right now (frozen at the start when speed is 0)
+        if store.start is None:
+            return 0.0
+        return min(store.end, store.start + (clock() - started) * speed)
+
+    async def upstream():
+        app.state.requests += 1
+        delay = latency + (rng.uniform(0, jitter) if jitter else 0.0)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if error_rate and rng.random() < error_rate:
+            app.state.errors += 1
+            return JSONResponse({"status": "error", "errors": [{"message": "injected"}]}, status_code=error_status)
+        return None
+
+    @app.get("/v2/option/chain")
+    async def option_chain(instrument_key: str, expiry_date: str = ""):
+        error = await upstream()
+        if error is not None:
+            return error
+        return {"status": "success", "data": store.option_chain(instrument_key, expiry_date, replay_time())}
+
+    @app.get("/v2/option/contract")
+    async def option_contracts(instrument_key: str):
+        error = await upstream()
+        if error is not None:
+            return error
+        return {"status": "success", "data": store.option_contracts(instrument_key, replay_time())}
+
+    @app.get("/v2/market-quote/quotes")
+    async def market_quotes(instrument_key: str):
+        error = await upstream()
+        if error is not None:
+            return error
+        return {"status": "success", "data": store.market_quotes(instrument_key.split(","), replay_time())}
+
+    @app.get("/_fake/stats")
+    async def stats():
+        return {"requests": app.state.requests, "errors": app.state.errors, "replay_time": replay_time(),
+                "chains": len(store.chains), "instruments": len(store.quotes)}
+
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve captured Upstox responses locally")
+    parser.add_argument("captures", nargs="+", help="gzip JSONL files written via UPSTOX_CAPTURE_FILE")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--speed", type=float, default=1.0, help="capture seconds per second (0 = freeze at start)")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random latency, up to this many seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with an error")
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    store = CaptureStore()
+    for path in args.captures:
+        for record in read_captures(path):
+            store.add(record)
+    print(f"Loaded {len(store.chains)} chains and {len(store.quotes)} instruments")
+    import uvicorn
+    uvicorn.run(create_app(store, args.speed, args.latency, args.jitter, args.error_rate, args.error_status, args.seed),
+                host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,14 @@
 import csv
-import gzip
 import json
+import os
 import urllib.request
 import io
 
+from instruments import InstrumentMaster, refresh_master
+
+# Same cached instrument master as the server (see instruments.py)
+INSTRUMENTS_FILE = os.getenv("INSTRUMENTS_FILE", os.path.join("market_data_logs", "complete.csv.gz"))
+
 # 1. Fetch exact Nifty 50 list from NSE
 url = 'https://archives.nseindia.com/content/indices/ind_nifty50list.csv'
 req = urllib.request.Request(url, headers={'User-Agent': 'Mozilla/5.0'})
@@ -28,34 +33,28 @@ except Exception as e:
         'DRREDDY', 'BEL', 'SHRIRAMFIN', 'TATACONSUM', 'SBILIFE'
     ]
 
-# Keep a set for fast lookup
-symbols_set = set(nifty_50_symbols)
-
+# 2. Look every symbol up in the indexed master (parsed once, then cached)
+refresh_master(INSTRUMENTS_FILE)
+master = InstrumentMaster.load(INSTRUMENTS_FILE)
 keys_map = {}
-with gzip.open("../banknifty_updater/complete.csv.gz", "rt", encoding="utf-8") as f:
-    reader = csv.reader(f)
-    for row in reader:
-        if len(row) > 3 and "NSE_EQ" in row[0]:
-            sym = row[2]
-            # upstox sometimes has extra spaces or suffix, but usually matches exactly
-            if sym in symbols_set:
-                keys_map[sym] = row[0]
+for sym in nifty_50_symbols:
+    key = master.instrument_key(sym, "NSE_EQ", "EQ")
+    if key:
+        keys_map[sym] = key
 
 # Some edge cases like TATAMOTORS which could be TATAMTRDVR 
 # Let's check missing
-missing = symbols_set - set(keys_map.keys())
+missing = set(nifty_50_symbols) - set(keys_map.keys())
 print("Missing before fallback:", missing)
 
-# Fallback scan for missing
+# Fallback: first listed NSE equity whose symbol contains the missing one
 if missing:
-    with gzip.open("../banknifty_updater/complete.csv.gz", "rt", encoding="utf-8") as f:
-        reader = csv.reader(f)
-        for row in reader:
-            if len(row) > 3 and "NSE_EQ" in row[0]:
-                for m in list(missing):
-                    if m in row[2]:
-                        keys_map[m] = row[0]
-                        missing.remove(m)
+    listed = sorted(master.symbols("NSE_EQ", "EQ"))
+    for m in list(missing):
+        match = next((sym for sym in listed if m in sym), None)
+        if match:
+            keys_map[m] = master.instrument_key(match, "NSE_EQ", "EQ")
+            missing.remove(m)
                         
 print("Found keys for", len(keys_map), "stocks")
 print("Still missing:", missing)
@@ -1,8 +1,28 @@
 import asyncio
+import os
 import websockets
 import json
 
+from shared_snapshot import SnapshotReader
+
+def read_local():
+    # Same message the socket sends first, from a server running on this host
+    # (named and placed by SNAPSHOT_SHM / SNAPSHOT_DIR, as in server.py)
+    name = os.getenv("SNAPSHOT_SHM", "algo-dash")
+    reader = SnapshotReader(f"{name}-nifty50", directory=os.getenv("SNAPSHOT_DIR") or None)
+    try:
+        data = reader.read()
+        return json.loads(data) if data is not None else None
+    finally:
+        reader.close()
+
 async def fetch_data():
+    data = read_local()
+    if data is not None:
+        print("Read the local snapshot.")
+        with open("ws_data_nifty.json", "w") as f:
+            json.dump(data, f, indent=2)
+        return
     uri = "ws://65.1.147.104:8080/ws_nifty"
     try:
         async with websockets.connect(uri) as websocket:
@@ -0,0 +1,36 @@
+import gzip
+import json
+import threading
+
+# Raw Upstox HTTP capture. Every request/response pair UpstoxAPI sends is
+# appended, as it came off the wire, to a gzip JSONL file:
+#   {"ts", "path", "params", "status", "elapsed", "body"}
+# Each record is its own gzip member, so a capture cut short by a crash
+# stays readable up to the last complete record. fake_upstox.py serves these
+# files back as a local Upstox stand-in.
+
+class HttpCapture:
+    def __init__(self, path):
+        self.path = path
+        self.records = 0
+        self._lock = threading.Lock()
+
+    def record(self, ts, path, params, status, elapsed, body):
+        line = json.dumps({"ts": ts, "path": path, "params": params, "status": status,
+                           "elapsed": round(elapsed, 6), "body": body}) + "\n"
+        with self._lock:
+            with gzip.open(self.path, "ab") as f:
+                f.write(line.encode())
+            self.records += 1
+
+def read_captures(path):
+    # Captured records in file order; a torn last member is dropped
+    with gzip.open(path, "rt") as f:
+        try:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    return
+        except (EOFError, OSError):
+            return
@@ -0,0 +1,198 @@
+import csv
+import gzip
+import os
+import re
+import shutil
+import time
+import urllib.request
+from datetime import datetime
+
+import numpy as np
+
+from cadence import IST
+
+# Upstox instrument master: every tradable contract, one CSV row each
+# (instrument_key, exchange_token, tradingsymbol, name, last_price, expiry,
+# strike, tick_size, lot_size, instrument_type, option_type, exchange).
+# Upstox republishes it daily at MASTER_URL; a local copy is kept and
+# downloaded again once it is MAX_AGE old.
+#
+# InstrumentMaster parses the CSV once into columns sorted by (underlying,
+# exchange, instrument_type, expiry, strike), so every contract group is a
+# contiguous slice, and saves them as a binary sidecar (<path>.npz). Later
+# loads read the sidecar as long as the CSV's size and mtime still match,
+# and only parse the CSV again when it changes. Without a master file the
+# same index can be built from /v2/option/contract responses (from_contracts).
+
+MASTER_URL = "https://assets.upstox.com/market-quote/instruments/exchange/complete.csv.gz"
+MAX_AGE = 86400.0
+OPTION_TYPES = ("OPTIDX", "OPTSTK")
+SYMBOL_PREFIX = re.compile(r"[A-Z&\-]+")
+CACHE_SUFFIX = ".npz"
+
+# Strings are stored as fixed-width bytes: no pickle on load, and a quarter
+# the size of unicode columns
+TEXT_COLUMNS = ("instrument_key", "tradingsymbol", "underlying", "exchange", "instrument_type", "option_type", "expiry")
+NUMBER_COLUMNS = (("strike", "f8"), ("lot_size", "i4"))
+GROUP_COLUMNS = ("underlying", "exchange", "instrument_type", "expiry")
+
+def refresh_master(path, url=MASTER_URL, max_age=MAX_AGE, timeout=60):
+    # Downloads the master when path is missing or older than max_age. True
+    # when a usable copy is on disk (a stale one if the download failed).
+    try:
+        age = time.time() - os.path.getmtime(path)
+    except FileNotFoundError:
+        age = None
+    if age is not None and age < max_age:
+        return True
+    tmp = path + ".tmp"
+    try:
+        req = urllib.request.Request(url, headers={"User-Agent": "Mozilla/5.0"})
+        with urllib.request.urlopen(req, timeout=timeout) as response, open(tmp, "wb") as f:
+            shutil.copyfileobj(response, f)
+        os.replace(tmp, path)
+        return True
+    except OSError as e:
+        print(f"Could not download the instrument master: {e}")
+        return age is not None
+
+def parse_expiry(value):
+    # YYYY-MM-DD; some exports carry epoch milliseconds instead
+    value = value.strip()
+    if value.isdigit():
+        return datetime.fromtimestamp(int(value) / 1000, IST).strftime('%Y-%m-%d')
+    return value[:10]
+
+def underlying_of(row):
+    # Cash and index rows are their own underlying. F&O rows name theirs
+    # ("NIFTY", "RELIANCE"); older files only have it as the tradingsymbol
+    # prefix ("RELIANCE26OCT1400CE").
+    if not row.get("instrument_type", "").startswith(("OPT", "FUT")):
+        return row.get("tradingsymbol", "")
+    name = row.get("name", "").strip()
+    if name and " " not in name:
+        return name
+    match = SYMBOL_PREFIX.match(row.get("tradingsymbol", ""))
+    return match.group(0) if match else name
+
+def contract_row(underlying, instrument_type, contract):
+    # One /v2/option/contract entry in the master's CSV columns
+    key = contract.get("instrument_key", "")
+    return {"instrument_key": key, "tradingsymbol": contract.get("trading_symbol", ""), "name": underlying,
+            "exchange": contract.get("segment") or key.split("|")[0], "instrument_type": instrument_type,
+            "option_type": contract.get("instrument_type", ""), "expiry": contract.get("expiry", ""),
+            "strike": contract.get("strike_price"), "lot_size": contract.get("lot_size")}
+
+def source_stamp(path):
+    stat = os.stat(path)
+    return np.array([stat.st_size, stat.st_mtime_ns], dtype=np.int64)
+
+class InstrumentMaster:
+    def __init__(self, columns):
+        self.columns = columns
+        # (underlying, exchange, instrument_type) -> {expiry: (start, stop)}
+        self.groups = {}
+        keys = [columns[c] for c in GROUP_COLUMNS]
+        n = len(keys[0])
+        if n:
+            change = np.zeros(n, dtype=bool)
+            change[0] = True
+            for col in keys:
+                change[1:] |= col[1:] != col[:-1]
+            starts = np.flatnonzero(change)
+            stops = np.append(starts[1:], n)
+            heads = [np.char.decode(col[starts], "utf-8").tolist() for col in keys]
+            for u, e, t, x, start, stop in zip(*heads, starts.tolist(), stops.tolist()):
+                self.groups.setdefault((u, e, t), {})[x] = (start, stop)
+
+    def __len__(self):
+        return len(self.columns["instrument_key"])
+
+    @classmethod
+    def parse(cls, path):
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            return cls.from_rows(csv.DictReader(f))
+
+    @classmethod
+    def from_contracts(cls, contracts):
+        # contracts: (underlying, "OPTIDX"/"OPTSTK", /v2/option/contract data) per underlying
+        return cls.from_rows(contract_row(u, t, c) for u, t, rows in contracts for c in rows)
+
+    @classmethod
+    def from_rows(cls, rows):
+        # rows: dicts with the master's CSV columns
+        text = {c: [] for c in TEXT_COLUMNS}
+        numbers = {c: [] for c, _ in NUMBER_COLUMNS}
+        for row in rows:
+            text["instrument_key"].append(row["instrument_key"])
+            text["tradingsymbol"].append(row.get("tradingsymbol", ""))
+            text["underlying"].append(underlying_of(row))
+            text["exchange"].append(row.get("exchange", ""))
+            text["instrument_type"].append(row.get("instrument_type", ""))
+            text["option_type"].append(row.get("option_type", ""))
+            text["expiry"].append(parse_expiry(str(row.get("expiry") or "")))
+            numbers["strike"].append(float(row.get("strike") or 0))
+            numbers["lot_size"].append(int(float(row.get("lot_size") or 0)))
+        columns = {c: np.char.encode(np.array(v, dtype=str), "utf-8") if v else np.array([], dtype="S1")
+                   for c, v in text.items()}
+        columns.update((c, np.array(numbers[c], dtype=dtype)) for c, dtype in NUMBER_COLUMNS)
+        order = np.lexsort([columns["strike"]] + [columns[c] for c in reversed(GROUP_COLUMNS)])
+        return cls({c: v[order] for c, v in columns.items()})
+
+    @classmethod
+    def load(cls, path, cache_path=None):
+        # From the binary sidecar when it was built from this exact file
+        cache_path = cache_path or path + CACHE_SUFFIX
+        stamp = source_stamp(path)
+        try:
+            with np.load(cache_path) as z:
+                if np.array_equal(z["source"], stamp):
+                    return cls({c: z[c] for c in TEXT_COLUMNS + tuple(c for c, _ in NUMBER_COLUMNS)})
+        except (OSError, ValueError, KeyError):
+            pass
+        master = cls.parse(path)
+        try:
+            master.save(cache_path, stamp)
+        except OSError as e:
+            print(f"Could not save {cache_path}: {e}")
+        return master
+
+    def save(self, cache_path, stamp):
+        tmp = cache_path + ".tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, source=stamp, **self.columns)
+        os.replace(tmp, cache_path)
+
+    def rows(self, underlying, exchange, instrument_type, expiry=""):
+        start, stop = self.groups.get((underlying, exchange, instrument_type), {}).get(expiry, (0, 0))
+        return slice(start, stop)
+
+    def expiries(self, underlying, exchange, instrument_type):
+        return sorted(x for x in self.groups.get((underlying, exchange, instrument_type), {}) if x)
+
+    def symbols(self, exchange, instrument_type):
+        return [u for u, e, t in self.groups if e == exchange and t == instrument_type]
+
+    def instrument_key(self, symbol, exchange="NSE_EQ", instrument_type="EQ"):
+        rows = self.rows(symbol, exchange, instrument_type)
+        return self.columns["instrument_key"][rows.start].decode() if rows.stop > rows.start else None
+
+    def lot_size(self, underlying, exchange, instrument_type):
+        # Lot size of the nearest listed expiry
+        expiries = self.expiries(underlying, exchange, instrument_type)
+        if not expiries:
+            return None
+        return int(self.columns["lot_size"][self.rows(underlying, exchange, instrument_type, expiries[0]).start])
+
+    def options(self, underlying, exchange):
+        # {expiry: [{"strike", "ce_key", "pe_key"}] by strike} of every listed option
+        out = {}
+        for instrument_type in OPTION_TYPES:
+            for expiry, (start, stop) in self.groups.get((underlying, exchange, instrument_type), {}).items():
+                pairs = {}
+                for strike, side, key in zip(self.columns["strike"][start:stop].tolist(),
+                                             self.columns["option_type"][start:stop].tolist(),
+                                             self.columns["instrument_key"][start:stop].tolist()):
+                    pairs.setdefault(strike, ["", ""])[0 if side == b"CE" else 1] = key.decode()
+                out[expiry] = [{"strike": k, "ce_key": ce, "pe_key": pe} for k, (ce, pe) in pairs.items()]
+        return out
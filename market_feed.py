@@ -0,0 +1,299 @@
+import json
+import threading
+import time
+
+# Streaming market-data ingestion. MarketFeed wraps an Upstox
+# MarketDataStreamerV3 (or the offline ReplayStreamer below, which has the
+# same on/connect/subscribe interface), decodes every message into flat
+# per-instrument quote updates and hands them to a callback as they arrive.
+
+def _num(value):
+    # MessageToDict renders int64 fields (vtt, ltq) as strings
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+def parse_feed_message(message):
+    # Returns {instrument_key: {"ltp", "close", "oi", "volume"}} holding only the
+    # fields present in this tick (ltpc, full and option_greeks modes).
+    updates = {}
+    for key, feed in (message.get("feeds") or {}).items():
+        full = feed.get("fullFeed") or feed.get("ff") or {}
+        market = full.get("marketFF") or full.get("indexFF") or feed.get("firstLevelWithGreeks") or {}
+        ltpc = feed.get("ltpc") or market.get("ltpc") or {}
+        details = market.get("eFeedDetails") or market
+
+        quote = {}
+        for field, value in (("ltp", ltpc.get("ltp")), ("close", ltpc.get("cp")),
+                             ("oi", details.get("oi")), ("volume", details.get("vtt"))):
+            value = _num(value)
+            if value is not None:
+                quote[field] = value
+        if "volume" in quote:
+            quote["volume"] = int(quote["volume"])
+        if quote:
+            updates[key] = quote
+    return updates
+
+def make_upstox_streamer(access_token, keys, mode="full"):
+    # Imported lazily so the server still runs (REST only) without the SDK
+    import upstox_client
+    configuration = upstox_client.Configuration()
+    configuration.access_token = access_token
+    return upstox_client.MarketDataStreamerV3(upstox_client.ApiClient(configuration), list(keys), mode)
+
+class ReplayStreamer:
+    # Offline stand-in for MarketDataStreamerV3. Plays back a JSONL capture of
+    # {"ts": epoch_seconds, "message": <decoded feed message>} lines, paced by
+    # the recorded timestamps divided by speed (speed <= 0 plays as fast as
+    # possible). Only subscribed instruments are delivered.
+    def __init__(self, path, keys=(), speed=1.0, loop=False):
+        self.path = path
+        self.speed = speed
+        self.loop = loop
+        self.subscriptions = set(keys)
+        self.listeners = {event: [] for event in ("open", "close", "message", "error", "reconnecting", "autoReconnectStopped")}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def on(self, event, listener):
+        if event not in self.listeners:
+            raise ValueError(f"Unknown event: {event}")
+        self.listeners[event].append(listener)
+
+    def emit(self, event, *args):
+        for listener in self.listeners[event]:
+            listener(*args)
+
+    def auto_reconnect(self, enable, interval=1, retry_count=5):
+        pass
+
+    def subscribe(self, keys, mode="full"):
+        self.subscriptions.update(keys)
+
+    def unsubscribe(self, keys):
+        self.subscriptions.difference_update(keys)
+
+    def connect(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def disconnect(self):
+        self._stop.set()
+
+    def _run(self):
+        self.emit("open")
+        try:
+            while not self._stop.is_set():
+                self._play_once()
+                if not self.loop:
+                    break
+        except Exception as e:
+            self.emit("error", e)
+        self.emit("close", 1000, "replay finished")
+
+    def _play_once(self):
+        first_ts = None
+        started = time.monotonic()
+        with open(self.path) as f:
+            for line in f:
+                if self._stop.is_set():
+                    return
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if first_ts is None:
+                    first_ts = record["ts"]
+                if self.speed > 0:
+                    delay = (record["ts"] - first_ts) / self.speed - (time.monotonic() - started)
+                    if delay > 0:
+                        self._stop.wait(delay)
+                feeds = {k: v for k, v in record["message"].get("feeds", {}).items() if k in self.subscriptions}
+                if feeds:
+                    self.emit("message", dict(record["message"], feeds=feeds))
+
+class MarketFeed:
+    # Keeps one streamer connected and subscribed to the tracked keys.
+    # on_ticks(updates) is called on the streamer's thread for every message.
+    # needs_gapfill is raised on every (re)connect so the consumer can take a
+    # REST snapshot of whatever moved while the socket was down.
+    RECONNECT_AFTER = 30
+
+    def __init__(self, streamer_factory, on_ticks, record_path=None):
+        self.streamer_factory = streamer_factory
+        self.on_ticks = on_ticks
+        self.record_path = record_path
+        self.streamer = None
+        self.keys = set()
+        self.connected = False
+        self.needs_gapfill = False
+        self.last_tick = 0.0
+        self.last_connect_attempt = 0.0
+        self.connected_at = 0.0
+        self.tick_count = 0
+        self.seen = set()  # keys that ticked since the last connect
+        self._lock = threading.Lock()
+
+    def start(self, keys):
+        self.keys = set(keys)
+        self.last_connect_attempt = time.time()
+        self.streamer = self.streamer_factory(self.keys)
+        self.streamer.on("open", self._on_open)
+        self.streamer.on("close", self._on_close)
+        self.streamer.on("error", self._on_error)
+        self.streamer.on("autoReconnectStopped", self._on_close)
+        self.streamer.on("message", self._on_message)
+        self.streamer.connect()
+
+    def ensure_running(self, keys):
+        # Called from the polling loop: (re)starts a dead feed and keeps the
+        # subscription in step with the current instrument universe.
+        if self.streamer is None or (not self.connected and time.time() - self.last_connect_attempt > self.RECONNECT_AFTER):
+            if self.streamer is not None:
+                print("Market feed down, reconnecting...")
+                try:
+                    self.streamer.disconnect()
+                except Exception:
+                    pass
+            self.start(keys)
+            return
+        if self.connected:
+            self.sync_keys(keys)
+
+    def sync_keys(self, keys):
+        keys = set(keys)
+        added, removed = keys - self.keys, self.keys - keys
+        try:
+            if removed:
+                self.streamer.unsubscribe(list(removed))
+            if added:
+                self.streamer.subscribe(list(added), "full")
+            self.keys = keys
+        except Exception as e:
+            print(f"Market feed subscribe error: {e}")
+
+    def unseen(self):
+        # Subscribed keys with no tick since the connect. Upstox opens a full
+        # subscription with a snapshot of every key it accepted, so keys still
+        # missing once the others have ticked were most likely rejected.
+        with self._lock:
+            return self.keys - self.seen
+
+    def take_gapfill(self):
+        with self._lock:
+            needed, self.needs_gapfill = self.needs_gapfill, False
+        return needed
+
+    def stop(self):
+        if self.streamer is not None:
+            self.streamer.disconnect()
+        self.connected = False
+
+    def _on_open(self):
+        print(f"Market feed connected, {len(self.keys)} instruments subscribed")
+        with self._lock:
+            self.connected = True
+            self.connected_at = time.time()
+            self.needs_gapfill = True
+            self.seen = set()
+
+    def _on_close(self, *args):
+        if self.connected:
+            print("Market feed closed:", *args)
+        self.connected = False
+
+    def _on_error(self, error):
+        print(f"Market feed error: {error}")
+
+    def _on_message(self, message):
+        if self.record_path:
+            try:
+                with open(self.record_path, "a") as f:
+                    f.write(json.dumps({"ts": time.time(), "message": message}) + "\n")
+            except Exception as e:
+                print(f"Error recording feed: {e}")
+        updates = parse_feed_message(message)
+        if updates:
+            self.last_tick = time.time()
+            self.tick_count += 1
+            with self._lock:
+                self.seen.update(updates)
+            self.on_ticks(updates)
+
+class ShardedFeed:
+    # Spreads the tracked keys over up to max_connections MarketFeeds of at
+    # most max_keys each (Upstox V3 full mode: 2000 keys per connection, two
+    # connections for a regular account). Keys keep their connection while
+    # they stay tracked, so a changed universe only re-subscribes the
+    # difference. Keys that do not fit are left out and reported in dropped;
+    # earlier keys in the list given take priority. Same interface as
+    # MarketFeed for the polling loop.
+    MAX_KEYS = 2000
+    MAX_CONNECTIONS = 2
+
+    def __init__(self, streamer_factory, on_ticks, record_path=None, max_keys=MAX_KEYS, max_connections=MAX_CONNECTIONS):
+        self.max_keys = max_keys
+        self.shards = [MarketFeed(streamer_factory, on_ticks, record_path) for _ in range(max_connections)]
+        self.dropped = []
+        self.reported = set()  # connect times whose unseen keys were logged
+
+    def assign(self, keys):
+        wanted = list(dict.fromkeys(keys))
+        placed = [shard.keys & set(wanted) for shard in self.shards]
+        taken = set().union(*placed)
+        dropped = []
+        for key in wanted:
+            if key in taken:
+                continue
+            room = next((p for p in placed if len(p) < self.max_keys), None)
+            if room is None:
+                dropped.append(key)
+            else:
+                room.add(key)
+        if dropped and dropped != self.dropped:
+            print(f"Market feed full: {len(dropped)} of {len(wanted)} keys not subscribed "
+                  f"({len(self.shards)} x {self.max_keys} limit), e.g. {dropped[:3]}")
+        self.dropped = dropped
+        return placed
+
+    def ensure_running(self, keys):
+        for shard, shard_keys in zip(self.shards, self.assign(keys)):
+            if shard_keys or shard.streamer is not None:
+                shard.ensure_running(shard_keys)
+        self.report_unseen()
+
+    def report_unseen(self, after=30.0):
+        # Logs keys the exchange never ticked, once per connection
+        for shard in self.active():
+            if shard.connected and shard.connected_at not in self.reported and time.time() - shard.connected_at > after:
+                self.reported.add(shard.connected_at)
+                unseen = shard.unseen()
+                if unseen:
+                    print(f"Market feed: {len(unseen)} of {len(shard.keys)} subscribed keys have not ticked "
+                          f"(rejected?), e.g. {sorted(unseen)[:3]}")
+
+    def active(self):
+        return [shard for shard in self.shards if shard.keys]
+
+    @property
+    def connected(self):
+        active = self.active()
+        return bool(active) and all(shard.connected for shard in active)
+
+    @property
+    def last_tick(self):
+        # The stalest connection decides: its keys are not streaming
+        return min((shard.last_tick for shard in self.active()), default=0.0)
+
+    @property
+    def tick_count(self):
+        return sum(shard.tick_count for shard in self.shards)
+
+    def take_gapfill(self):
+        return any([shard.take_gapfill() for shard in self.shards])
+
+    def stop(self):
+        for shard in self.shards:
+            shard.stop()
@@ -0,0 +1,104 @@
+import json
+import os
+import time
+
+from strike_index import strike_key
+
+# On-disk cache of the option-chain metadata the Nifty 50 quote loop tracks
+# per stock: strike interval, the ATM +/- 15 strike window and its CE/PE
+# instrument keys. Entries are keyed by (underlying, expiry) and stamped
+# with the time they were fetched; entries for a past expiry or older than
+# max_age are dropped on load. A cached window stays usable until spot moves
+# near its edge (needs_recenter), so warm restarts need no chain calls.
+
+WINDOW = 15  # strikes kept either side of ATM
+MAX_AGE = 86400.0
+
+def build_meta(stock, key, expiry, interval, strikes, chain_range, fetched_at=None):
+    # strikes: [{"strike", "ce_key", "pe_key"}] inside the window; chain_range
+    # is the (lowest, highest) strike_key the full chain listed
+    strike_keys = {strike_key(s["strike"]): (s["ce_key"], s["pe_key"]) for s in strikes}
+    local_keys = {k for s in strikes for k in (s["ce_key"], s["pe_key"]) if k}
+    return {
+        "stock": stock,
+        "key": key,
+        "expiry": expiry,
+        "interval": interval,
+        "strikes": strikes,
+        "strike_keys": strike_keys,  # strike_key -> (ce_key, pe_key)
+        "local_keys": local_keys,
+        "chain_range": tuple(chain_range),
+        "fetched_at": time.time() if fetched_at is None else fetched_at,
+    }
+
+def meta_from_chain(stock, key, expiry, chain, interval):
+    # Metadata for the strikes within WINDOW intervals of the chain's spot
+    spot = chain[0].get("underlying_spot_price", 0)
+    atm_key = strike_key(round(spot / interval) * interval)
+    window = WINDOW * strike_key(interval)
+    strikes = []
+    for row in chain:
+        stk = row["strike_price"]
+        if abs(strike_key(stk) - atm_key) <= window:
+            strikes.append({"strike": stk,
+                            "ce_key": row.get("call_options", {}).get("instrument_key", ""),
+                            "pe_key": row.get("put_options", {}).get("instrument_key", "")})
+    listed = [strike_key(row["strike_price"]) for row in chain]
+    return build_meta(stock, key, expiry, interval, strikes, (min(listed), max(listed)))
+
+def needs_recenter(meta, spot, pairs=6, margin=2):
+    # True when the window no longer covers ATM +/- (pairs + margin)
+    # intervals. An edge that is also the end of the listed chain does not
+    # count: there is nothing further out to fetch.
+    if not meta["strike_keys"]:
+        return True
+    step = strike_key(meta["interval"])
+    atm = strike_key(round(spot / meta["interval"]) * meta["interval"])
+    need = (pairs + margin) * step
+    lo, hi = min(meta["strike_keys"]), max(meta["strike_keys"])
+    listed_lo, listed_hi = meta["chain_range"]
+    return (atm - need < lo and lo > listed_lo) or (atm + need > hi and hi < listed_hi)
+
+class MetaCache:
+    def __init__(self, path, max_age=MAX_AGE):
+        self.path = path
+        self.max_age = max_age
+        self.entries = {}  # "underlying|expiry" -> serializable entry
+        self.loaded = False
+        self.hits = 0
+        self.misses = 0
+
+    def load(self, today):
+        # today: IST date as YYYY-MM-DD; expired and old entries are dropped
+        self.loaded = True
+        try:
+            with open(self.path) as f:
+                entries = json.load(f)
+        except FileNotFoundError:
+            return 0
+        except (OSError, ValueError) as e:
+            print(f"Ignoring metadata cache {self.path}: {e}")
+            return 0
+        cutoff = time.time() - self.max_age
+        self.entries = {k: e for k, e in entries.items() if e["expiry"] >= today and e["fetched_at"] >= cutoff}
+        return len(self.entries)
+
+    def get(self, underlying, expiry):
+        entry = self.entries.get(f"{underlying}|{expiry}")
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return build_meta(underlying, entry["key"], expiry, entry["interval"], entry["strikes"],
+                          entry["chain_range"], entry["fetched_at"])
+
+    def put(self, meta):
+        self.entries[f"{meta['stock']}|{meta['expiry']}"] = {
+            "key": meta["key"], "expiry": meta["expiry"], "interval": meta["interval"], "strikes": meta["strikes"],
+            "chain_range": list(meta["chain_range"]), "fetched_at": meta["fetched_at"]}
+
+    def save(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.entries, f)
+        os.replace(tmp, self.path)
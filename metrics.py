@@ -0,0 +1,165 @@
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Minimal in-process metrics: counters, gauges and fixed-bucket histograms
+# with labels, rendered in the Prometheus text format for /metrics and as a
+# dict for /debug/stats. Observations are a lock plus a few dict/list
+# updates; with METRICS_ENABLED=0 they return immediately. Values that are
+# cheaper to read at scrape time (queue depths, client counts, data age) are
+# supplied by collector callbacks instead of being pushed.
+
+enabled = os.getenv("METRICS_ENABLED", "1") != "0"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (1, 10, 50, 100, 200, 400, 1000, 10_000, 100_000, 1_000_000)
+
+def _label_str(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}"
+
+class Metric:
+    kind = ""
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self.values = {}  # sorted label tuple -> value
+        self.lock = threading.Lock()
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        if not enabled:
+            return
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def lines(self):
+        return [f"{self.name}{_label_str(k)} {v}" for k, v in self.values.items()]
+
+    def stats(self):
+        return {_label_str(k) or "": v for k, v in self.values.items()}
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        if not enabled:
+            return
+        with self.lock:
+            self.values[tuple(sorted(labels.items()))] = value
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        if not enabled:
+            return
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            entry = self.values.get(key)
+            if entry is None:
+                # per-bucket counts (last = +Inf), sum, count, max
+                entry = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0, 0.0]
+            entry[0][bisect.bisect_left(self.buckets, value)] += 1
+            entry[1] += value
+            entry[2] += 1
+            entry[3] = max(entry[3], value)
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def lines(self):
+        out = []
+        for key, (counts, total, count, _) in self.values.items():
+            cumulative = 0
+            for bound, n in zip(self.buckets + ("+Inf",), counts):
+                cumulative += n
+                out.append(f"{self.name}_bucket{_label_str(key + (('le', bound),))} {cumulative}")
+            out.append(f"{self.name}_sum{_label_str(key)} {total}")
+            out.append(f"{self.name}_count{_label_str(key)} {count}")
+        return out
+
+    def stats(self):
+        out = {}
+        for key, (counts, total, count, peak) in self.values.items():
+            out[_label_str(key) or ""] = {"count": count, "sum": round(total, 6), "avg": round(total / count, 6) if count else 0.0,
+                                          "max": round(peak, 6), "p95_le": self._quantile_bound(counts, count, 0.95)}
+        return out
+
+    def _quantile_bound(self, counts, count, q):
+        # Upper bucket bound holding the q-quantile (None = beyond the last bucket)
+        seen = 0
+        for bound, n in zip(self.buckets, counts):
+            seen += n
+            if seen >= q * count:
+                return bound
+        return None
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def _add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text):
+        return self._add(Counter(name, help_text))
+
+    def gauge(self, name, help_text):
+        return self._add(Gauge(name, help_text))
+
+    def histogram(self, name, help_text, buckets=LATENCY_BUCKETS):
+        return self._add(Histogram(name, help_text, buckets))
+
+    def collector(self, fn):
+        # fn() refreshes gauges right before each scrape
+        self.collectors.append(fn)
+        return fn
+
+    def _collect(self):
+        for fn in self.collectors:
+            try:
+                fn()
+            except Exception as e:
+                print(f"Metrics collector error: {e}")
+
+    def render(self):
+        self._collect()
+        out = []
+        for m in self.metrics:
+            with m.lock:
+                lines = m.lines()
+            out += [f"# HELP {m.name} {m.help}", f"# TYPE {m.name} {m.kind}"] + lines
+        return "\n".join(out) + "\n"
+
+    def stats(self):
+        self._collect()
+        out = {}
+        for m in self.metrics:
+            with m.lock:
+                out[m.name] = m.stats()
+        return out
+
+registry = Registry()
+
+# --- Shared metrics ---
+HTTP_SECONDS = registry.histogram("upstox_http_seconds", "Upstox REST request latency by endpoint class")
+HTTP_RESPONSES = registry.counter("upstox_http_responses_total", "Upstox REST responses by endpoint class and status")
@@ -1,32 +1,42 @@
-import csv, gzip, json
+import json
+import os
+
+from instruments import InstrumentMaster, refresh_master
+
+# Lot sizes of the watchlist indices and the Nifty 50 stock options, from the
+# same cached instrument master as the server (see instruments.py)
+INSTRUMENTS_FILE = os.getenv("INSTRUMENTS_FILE", os.path.join("market_data_logs", "complete.csv.gz"))
 
 with open("nifty50_keys.json", "r") as f:
     nifty_keys = json.load(f)
+with open("watchlist.json", "r") as f:
+    watchlist = json.load(f)
 
-lot_sizes = {
-    "NIFTY 50": 65, # NIFTY is 65 in 2026? Actually upstox gave 65 earlier for OPTIDX NIFTY! No wait, NIFTY 50 is 75. No it is 75 now? Wait.
-    "SENSEX": 20,
-    "BANKNIFTY": 30,
-    "MIDCAP": 120
-}
+refresh_master(INSTRUMENTS_FILE)
+master = InstrumentMaster.load(INSTRUMENTS_FILE)
 
-with gzip.open("../banknifty_updater/complete.csv.gz", "rt", encoding="utf-8") as f:
-    reader = csv.reader(f)
-    for row in reader:
-        if len(row) > 10:
-            if row[9] == "OPTSTK":
-                symbol = row[2] 
-                lot = int(row[8])
-                for k in nifty_keys:
-                    if symbol.startswith(k):
-                        if k not in lot_sizes:
-                            lot_sizes[k] = lot
-                        elif lot > lot_sizes[k]: # ensure standard
-                            pass
-            elif row[9] == "OPTIDX":
-                if "NIFTY" in row[2] and "MIDCP" not in row[2] and "BANK" not in row[2]:
-                    lot_sizes["NIFTY 50"] = int(row[8]) # Use upstox's real lot size for NIFTY
+# Anything the master does not list keeps its previous lot size
+try:
+    with open("lot_sizes.json", "r") as f:
+        lot_sizes = json.load(f)
+except FileNotFoundError:
+    lot_sizes = {}
+missing = []
+for idx in watchlist["indices"]:
+    lot = master.lot_size(idx["symbol"], idx["exchange"], "OPTIDX")
+    if lot:
+        lot_sizes[idx["name"]] = lot
+    else:
+        missing.append(idx["name"])
+for stock in nifty_keys:
+    lot = master.lot_size(stock, "NSE_FO", "OPTSTK")
+    if lot:
+        lot_sizes[stock] = lot
+    else:
+        missing.append(stock)
+
+print("Lot sizes updated for", len(watchlist["indices"]) + len(nifty_keys) - len(missing), "underlyings")
+print("No options listed for:", missing)
 
 with open("lot_sizes.json", "w") as f:
     json.dump(lot_sizes, f)
-
@@ -0,0 +1,295 @@
+import math
+
+import numpy as np
+
+# --- 0. SCALAR MODELS (reference implementation) ---
+def norm_cdf(x):
+    return (1.0 + math.erf(x / math.sqrt(2.0))) / 2.0
+
+def norm_pdf(x):
+    return math.exp(-0.5 * x * x) / math.sqrt(2.0 * math.pi)
+
+def bs_call_price(S, K, T, r, sigma):
+    try:
+        d1 = (math.log(S / K) + (r + 0.5 * sigma**2) * T) / (sigma * math.sqrt(T))
+        d2 = d1 - sigma * math.sqrt(T)
+        return S * norm_cdf(d1) - K * math.exp(-r * T) * norm_cdf(d2)
+    except: return 0.0
+
+def bs_put_price(S, K, T, r, sigma):
+    try:
+        d1 = (math.log(S / K) + (r + 0.5 * sigma**2) * T) / (sigma * math.sqrt(T))
+        d2 = d1 - sigma * math.sqrt(T)
+        return K * math.exp(-r * T) * norm_cdf(-d2) - S * norm_cdf(-d1)
+    except: return 0.0
+
+def mjd_call_price(S, K, T, r, sigma, lambda_j=1.0, mu_j=-0.05, sigma_j=0.15, N=15):
+    try:
+        price = 0.0
+        lam_prime = lambda_j * (1 + mu_j)
+        for k in range(N):
+            poisson_prob = math.exp(-lam_prime * T) * ((lam_prime * T)**k) / math.factorial(k)
+            r_k = r - lambda_j * mu_j + (k * math.log(1 + mu_j)) / T
+            sigma_k = math.sqrt(sigma**2 + (k * sigma_j**2) / T)
+            price += poisson_prob * bs_call_price(S, K, T, r_k, sigma_k)
+        return price
+    except: return 0.0
+
+def mjd_put_price(S, K, T, r, sigma, lambda_j=1.0, mu_j=-0.05, sigma_j=0.15, N=15):
+    try:
+        price = 0.0
+        lam_prime = lambda_j * (1 + mu_j)
+        for k in range(N):
+            poisson_prob = math.exp(-lam_prime * T) * ((lam_prime * T)**k) / math.factorial(k)
+            r_k = r - lambda_j * mu_j + (k * math.log(1 + mu_j)) / T
+            sigma_k = math.sqrt(sigma**2 + (k * sigma_j**2) / T)
+            price += poisson_prob * bs_put_price(S, K, T, r_k, sigma_k)
+        return price
+    except: return 0.0
+
+def cs_call_price(S, K, T, r, sigma, skew=-1.5, kurt=4.0):
+    try:
+        bs_price = bs_call_price(S, K, T, r, sigma)
+        d1 = (math.log(S / K) + (r + 0.5 * sigma**2) * T) / (sigma * math.sqrt(T))
+        d2 = d1 - sigma * math.sqrt(T)
+        term1 = (skew / 6.0) * S * sigma * math.sqrt(T) * (d2) * norm_pdf(d1)
+        term2 = (kurt / 24.0) * S * sigma * math.sqrt(T) * (d2**2 - 1) * norm_pdf(d1)
+        return max(0.0, bs_price + term1 + term2)
+    except: return 0.0
+
+def cs_put_price(S, K, T, r, sigma, skew=-1.5, kurt=4.0):
+    try:
+        bs_price = bs_put_price(S, K, T, r, sigma)
+        d1 = (math.log(S / K) + (r + 0.5 * sigma**2) * T) / (sigma * math.sqrt(T))
+        d2 = d1 - sigma * math.sqrt(T)
+        term1 = (skew / 6.0) * S * sigma * math.sqrt(T) * (d2) * norm_pdf(d1)
+        term2 = (kurt / 24.0) * S * sigma * math.sqrt(T) * (d2**2 - 1) * norm_pdf(d1)
+        return max(0.0, bs_price + term1 + term2)
+    except: return 0.0
+
+def bs_vega(S, K, T, r, sigma):
+    try:
+        d1 = (math.log(S / K) + (r + 0.5 * sigma**2) * T) / (sigma * math.sqrt(T))
+        return S * norm_pdf(d1) * math.sqrt(T)
+    except: return 0.0
+
+def calculate_iv(market_price, S, K, T_days, r, opt_type):
+    # Scalar Newton solve for one option; arrays go through implied_vol_vec
+    if T_days <= 0 or market_price <= 0 or S <= 0 or K <= 0:
+        return 0.0
+    T = T_days / 365.0
+    sigma = 0.5 # 50% initial guess
+    for _ in range(50):
+        price = bs_call_price(S,K,T,r,sigma) if opt_type == 'CE' else bs_put_price(S,K,T,r,sigma)
+        diff = market_price - price
+        if abs(diff) < 0.001: return round(sigma * 100, 2)
+        vega = bs_vega(S,K,T,r,sigma)
+        if vega == 0.0: break
+        sigma += diff / vega
+        if sigma <= 0.0: sigma = 0.01
+    return round(sigma * 100, 2)
+
+# --- 1. VECTORIZED MODELS ---
+# Array versions of the models above. Every argument broadcasts against the
+# others, so a whole universe of strikes is priced in one pass. Elements the
+# scalar versions would fail on (S/K/T/sigma <= 0) price to 0.0, matching
+# their try/except fallback.
+SQRT_2PI = math.sqrt(2.0 * math.pi)
+
+# Phi from erf / erfc rational approximations (Cody 1969, the coefficients of
+# Cephes ndtr), good to about 1e-16 absolute. numpy has no erf, and a fixed
+# number of polynomial passes keeps the cost independent of how far out in
+# the tails the inputs are.
+ERF_P = (9.60497373987051638749E0, 9.00260197203842689217E1, 2.23200534594684319226E3,
+         7.00332514112805075473E3, 5.55923013010394962768E4)
+ERF_Q = (1.0, 3.35617141647503099647E1, 5.21357949780152679795E2, 4.59432382970980127987E3,
+         2.26290000613890934246E4, 4.92673942608635921086E4)
+ERFC_P = (2.46196981473530512524E-10, 5.64189564831068821977E-1, 7.46321056442269912687E0,
+          4.86371970985681366614E1, 1.96520832956077098242E2, 5.26445194995477358631E2,
+          9.34528527171957607540E2, 1.02755188689515710272E3, 5.57535335369399327526E2)
+ERFC_Q = (1.0, 1.32281951154744992508E1, 8.67072140885989742329E1, 3.54937778887819891062E2,
+          9.75708501743205489753E2, 1.82390916687909736289E3, 2.24633760818710981792E3,
+          1.65666309194161350182E3, 5.57535340817727675546E2)
+ERFC_R = (5.64189583547755073984E-1, 1.27536670759978104416E0, 5.01905042251180477414E0,
+          6.16021097993053585195E0, 7.40974269950448939160E0, 2.97886665372100240670E0)
+ERFC_S = (1.0, 2.26052863220117276590E0, 9.39603524938001434673E0, 1.20489539808096656605E1,
+          1.70814450747565897222E1, 9.60896809063285878198E0, 3.36907645100081516050E0)
+
+def polevl(x, coefs):
+    # Horner's rule, highest power first
+    out = np.full_like(x, coefs[0])
+    for c in coefs[1:]:
+        out = out * x + c
+    return out
+
+def norm_cdf_vec(x):
+    x = np.asarray(x, dtype=float)
+    z = np.abs(x) * math.sqrt(0.5)
+    # erf below z = 1, erfc above (two fits split at z = 8); beyond z = 40
+    # the tail underflows to 0 anyway
+    small = z < 1.0
+    zs = np.where(small, z, 0.0)
+    erf = zs * polevl(zs * zs, ERF_P) / polevl(zs * zs, ERF_Q)
+    zt = np.minimum(z, 40.0)
+    ratio = np.where(zt < 8.0, polevl(zt, ERFC_P) / polevl(zt, ERFC_Q), polevl(zt, ERFC_R) / polevl(zt, ERFC_S))
+    lower = np.where(small, 0.5 - 0.5 * erf, 0.5 * np.exp(-zt * zt) * ratio)  # Phi(-|x|)
+    return np.where(x > 0, 1.0 - lower, lower)
+
+def norm_pdf_vec(x):
+    return np.exp(-0.5 * x * x) / SQRT_2PI
+
+def _valid(S, K, T, sigma):
+    return (S > 0) & (K > 0) & (T > 0) & (sigma > 0)
+
+def _d1_d2(S, K, T, r, sigma):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        vol_t = sigma * np.sqrt(T)
+        d1 = (np.log(S / K) + (r + 0.5 * sigma**2) * T) / vol_t
+    return d1, d1 - vol_t
+
+def bs_price_vec(S, K, T, r, sigma, is_call):
+    S, K, T, r, sigma = np.broadcast_arrays(*(np.asarray(a, dtype=float) for a in (S, K, T, r, sigma)))
+    ok = _valid(S, K, T, sigma)
+    d1, d2 = _d1_d2(S, K, T, r, sigma)
+    disc = K * np.exp(-r * T)
+    call = S * norm_cdf_vec(d1) - disc * norm_cdf_vec(d2)
+    put = disc * norm_cdf_vec(-d2) - S * norm_cdf_vec(-d1)
+    price = np.where(is_call, call, put)
+    return np.where(ok & np.isfinite(price), price, 0.0)
+
+def bs_vega_vec(S, K, T, r, sigma):
+    S, K, T, r, sigma = np.broadcast_arrays(*(np.asarray(a, dtype=float) for a in (S, K, T, r, sigma)))
+    ok = _valid(S, K, T, sigma)
+    d1, _ = _d1_d2(S, K, T, r, sigma)
+    vega = S * norm_pdf_vec(d1) * np.sqrt(np.maximum(T, 0.0))
+    return np.where(ok & np.isfinite(vega), vega, 0.0)
+
+def bs_greeks_vec(S, K, T, r, sigma, is_call):
+    # Black-Scholes delta, gamma, theta (per calendar day) and vega (per 1
+    # vol point) for every element; zeros where the inputs are invalid.
+    S, K, T, r, sigma, is_call = np.broadcast_arrays(
+        *(np.asarray(a, dtype=float) for a in (S, K, T, r, sigma)), np.asarray(is_call, dtype=bool))
+    ok = _valid(S, K, T, sigma)
+    d1, d2 = _d1_d2(S, K, T, r, sigma)
+    pdf = norm_pdf_vec(d1)
+    sqrt_t = np.sqrt(np.maximum(T, 0.0))
+    disc = K * np.exp(-r * T)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        gamma = pdf / (S * sigma * sqrt_t)
+        decay = -S * pdf * sigma / (2 * sqrt_t)
+    greeks = {
+        "delta": np.where(is_call, norm_cdf_vec(d1), norm_cdf_vec(d1) - 1.0),
+        "gamma": gamma,
+        "theta": np.where(is_call, decay - r * disc * norm_cdf_vec(d2), decay + r * disc * norm_cdf_vec(-d2)) / 365.0,
+        "vega": S * pdf * sqrt_t / 100.0,
+    }
+    return {k: np.where(ok & np.isfinite(v), v, 0.0) for k, v in greeks.items()}
+
+def mjd_price_vec(S, K, T, r, sigma, is_call, lambda_j=1.0, mu_j=-0.05, sigma_j=0.15, N=15):
+    S, K, T, r, sigma, is_call = np.broadcast_arrays(
+        *(np.asarray(a, dtype=float) for a in (S, K, T, r, sigma)), np.asarray(is_call, dtype=bool))
+    ok = _valid(S, K, T, sigma)
+    T_safe = np.where(T > 0, T, 1.0)
+    lam_t = lambda_j * (1 + mu_j) * T_safe
+    # Stack the N Poisson terms on a leading axis and price them all at once.
+    k = np.arange(N, dtype=float).reshape((N,) + (1,) * S.ndim)
+    log_fact = np.array([math.lgamma(i + 1) for i in range(N)]).reshape(k.shape)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        poisson_prob = np.exp(-lam_t + k * np.log(lam_t) - log_fact)
+    poisson_prob = np.where(k == 0, np.exp(-lam_t), poisson_prob)
+    r_k = r - lambda_j * mu_j + (k * math.log(1 + mu_j)) / T_safe
+    sigma_k = np.sqrt(sigma**2 + (k * sigma_j**2) / T_safe)
+    price = (poisson_prob * bs_price_vec(S, K, T_safe, r_k, sigma_k, is_call)).sum(axis=0)
+    return np.where(ok & np.isfinite(price), price, 0.0)
+
+def cs_price_vec(S, K, T, r, sigma, is_call, skew=-1.5, kurt=4.0):
+    S, K, T, r, sigma = np.broadcast_arrays(*(np.asarray(a, dtype=float) for a in (S, K, T, r, sigma)))
+    ok = _valid(S, K, T, sigma)
+    bs_price = bs_price_vec(S, K, T, r, sigma, is_call)
+    d1, d2 = _d1_d2(S, K, T, r, sigma)
+    with np.errstate(invalid="ignore", over="ignore"):
+        scale = S * sigma * np.sqrt(np.maximum(T, 0.0)) * norm_pdf_vec(d1)
+        price = bs_price + (skew / 6.0) * scale * d2 + (kurt / 24.0) * scale * (d2**2 - 1)
+    return np.where(ok & np.isfinite(price), np.maximum(0.0, price), 0.0)
+
+def price_pairs(spot, ce_strike, pe_strike, T, sigma, r=0.1, bs_sigma=0.14):
+    # Fair values for every CE/PE pair of the dashboard rows in one pass:
+    # MJD and Corrado-Su at the VIX-derived sigma, plain BS at the fixed
+    # reference vol. Returns a dict of arrays named like the row fields.
+    spot, ce_strike, pe_strike, T, sigma = np.broadcast_arrays(
+        *(np.asarray(a, dtype=float) for a in (spot, ce_strike, pe_strike, T, sigma)))
+    # Price CE legs and PE legs side by side as one 2xN batch.
+    S2 = np.stack([spot, spot])
+    K2 = np.stack([ce_strike, pe_strike])
+    T2 = np.stack([T, T])
+    sig2 = np.stack([sigma, sigma])
+    is_call = np.stack([np.ones(spot.shape, dtype=bool), np.zeros(spot.shape, dtype=bool)])
+    mjd = mjd_price_vec(S2, K2, T2, r, sig2, is_call)
+    bs = bs_price_vec(S2, K2, T2, r, bs_sigma, is_call)
+    cs = cs_price_vec(S2, K2, T2, r, sig2, is_call)
+    return {
+        "ce_fv": mjd[0], "pe_fv": mjd[1],
+        "bs_ce_fv": bs[0], "bs_pe_fv": bs[1],
+        "cs_ce_fv": cs[0], "cs_pe_fv": cs[1],
+    }
+
+# --- 2. IMPLIED VOLATILITY ---
+IV_MIN = 1e-4
+IV_MAX = 5.0
+
+def iv_initial_guess(price, S, K, T, r, is_call):
+    # Corrado-Miller rational approximation (puts mapped to calls by parity),
+    # falling back to Brenner-Subrahmanyam where its discriminant goes negative.
+    disc_K = K * np.exp(-r * T)
+    call = np.where(is_call, price, price + S - disc_K)
+    half_gap = (S - disc_K) / 2.0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        root = np.sqrt(np.maximum((call - half_gap)**2 - (S - disc_K)**2 / math.pi, 0.0))
+        cm = math.sqrt(2.0 * math.pi) / (np.sqrt(T) * (S + disc_K)) * (call - half_gap + root)
+        bs = np.sqrt(2.0 * math.pi / T) * call / S
+    guess = np.where(np.isfinite(cm) & (cm > IV_MIN), cm, bs)
+    return np.clip(np.where(np.isfinite(guess), guess, 0.3), 2 * IV_MIN, IV_MAX / 2)
+
+def implied_vol_vec(price, S, K, T, r, is_call, tol=1e-6, max_iter=100):
+    # Solves Black-Scholes IV for a whole array of options at once (T in years).
+    # Newton steps are kept inside a per-element [lo, hi] bracket that shrinks
+    # every iteration; a step leaving the bracket (or a vanishing vega) falls
+    # back to bisection. Returns (sigma, converged); sigma is NaN wherever the
+    # price is outside the no-arbitrage bounds or the solve did not converge.
+    price, S, K, T, r, is_call = np.broadcast_arrays(
+        *(np.asarray(a, dtype=float) for a in (price, S, K, T, r)), np.asarray(is_call, dtype=bool))
+    disc_K = K * np.exp(-r * T)
+    lower = np.where(is_call, np.maximum(S - disc_K, 0.0), np.maximum(disc_K - S, 0.0))
+    upper = np.where(is_call, S, disc_K)
+    # Absolute price tolerance, relative to the option price with a 1 paisa floor
+    price_tol = tol * np.maximum(price, 0.01)
+    # With no time value left the price carries no information about sigma
+    solvable = _valid(S, K, T, 1.0) & (price - lower > price_tol) & (price < upper)
+
+    lo = np.full(price.shape, IV_MIN)
+    hi = np.full(price.shape, IV_MAX)
+    sigma = iv_initial_guess(price, S, K, T, r, is_call)
+    converged = np.zeros(price.shape, dtype=bool)
+    active = solvable.copy()
+
+    for _ in range(max_iter):
+        if not active.any():
+            break
+        diff = bs_price_vec(S, K, T, r, sigma, is_call) - price
+        done = active & (np.abs(diff) < price_tol)
+        converged |= done
+        active &= ~done
+        # Price is increasing in sigma, so the sign of diff tightens the bracket
+        hi = np.where(active & (diff > 0), sigma, hi)
+        lo = np.where(active & (diff < 0), sigma, lo)
+        vega = bs_vega_vec(S, K, T, r, sigma)
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            newton = sigma - diff / vega
+        use_newton = (vega > 1e-12) & (newton > lo) & (newton < hi)
+        sigma = np.where(active, np.where(use_newton, newton, 0.5 * (lo + hi)), sigma)
+        # A bracket collapsed to the float grid will not get any tighter
+        stuck = active & (hi - lo < 1e-12 * hi)
+        converged |= stuck & (np.abs(diff) < 1e3 * price_tol)
+        active &= ~stuck
+
+    return np.where(converged, sigma, np.nan), converged
@@ -0,0 +1,102 @@
+import threading
+import time
+
+import numpy as np
+
+# Columnar quote store: one slot per instrument key and contiguous arrays per
+# field, so a whole cycle's legs can be read with a single gather and handed
+# straight to the vectorized pricing code. All reads and writes go through one
+# lock, which keeps ltp/oi/volume of a snapshot consistent with each other.
+FIELDS = ("ltp", "close", "oi", "volume")
+
+class QuoteStore:
+    def __init__(self, capacity=4096):
+        self.index = {}
+        self.keys = []
+        self.lock = threading.Lock()
+        self.ltp = np.zeros(capacity)
+        self.close = np.zeros(capacity)
+        self.oi = np.zeros(capacity)
+        self.volume = np.zeros(capacity, dtype=np.int64)
+        self.ts = np.zeros(capacity)  # epoch seconds of the last update, 0 = never
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _grow(self):
+        capacity = 2 * len(self.ltp)
+        for name in FIELDS + ("ts",):
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def _slot(self, key):
+        slot = self.index.get(key)
+        if slot is None:
+            slot = len(self.keys)
+            if slot == len(self.ltp):
+                self._grow()
+            self.index[key] = slot
+            self.keys.append(key)
+        return slot
+
+    def lookup(self, keys):
+        # Slot per key, -1 for keys never seen
+        index = self.index
+        return np.fromiter((index.get(k, -1) for k in keys), dtype=np.int64, count=len(keys))
+
+    def update(self, updates, as_of=None, now=None):
+        # updates: {key: {"ltp", "close", "oi", "volume"}}, any subset of fields.
+        # With as_of, keys updated after that time are left alone (a slow REST
+        # snapshot must not overwrite newer streamed ticks). Returns the keys
+        # whose values actually changed.
+        now = time.time() if now is None else now
+        with self.lock:
+            keys = list(updates)
+            slots = np.fromiter((self._slot(k) for k in keys), dtype=np.int64, count=len(keys))
+            if as_of is not None:
+                fresh = self.ts[slots] <= as_of
+                keys = [k for k, f in zip(keys, fresh) if f]
+                slots = slots[fresh]
+            changed = np.zeros(len(keys), dtype=bool)
+            for field in FIELDS:
+                mask = np.fromiter((field in updates[k] for k in keys), dtype=bool, count=len(keys))
+                if not mask.any():
+                    continue
+                column = getattr(self, field)
+                values = np.array([updates[k][field] for k, m in zip(keys, mask) if m], dtype=column.dtype)
+                target = slots[mask]
+                changed[mask] |= column[target] != values
+                column[target] = values
+            self.ts[slots] = now
+            return [k for k, c in zip(keys, changed) if c]
+
+    def update_from_quotes(self, data, as_of=None):
+        # Bulk update from the "data" dict of a /v2/market-quote/quotes response
+        updates = {}
+        for details in data.values():
+            instr_token = details.get("instrument_token", "")
+            if instr_token:
+                updates[instr_token] = {
+                    "ltp": details.get("last_price", 0) or 0,
+                    "close": details.get("ohlc", {}).get("close", 0) or 0,
+                    "oi": details.get("open_interest", 0) or 0,
+                    "volume": details.get("volume", 0) or 0,
+                }
+        return self.update(updates, as_of=as_of)
+
+    def gather(self, slots):
+        # Consistent copy of every field for the given slots. "price" is the
+        # LTP, falling back to the previous close when nothing has traded.
+        # Missing slots (-1) read as zeros.
+        slots = np.asarray(slots, dtype=np.int64)
+        known = slots >= 0
+        safe = np.where(known, slots, 0)
+        with self.lock:
+            out = {name: np.where(known, getattr(self, name)[safe], 0) for name in FIELDS + ("ts",)}
+        out["price"] = np.where(out["ltp"] != 0, out["ltp"], out["close"])
+        return out
+
+    def price(self, key):
+        return float(self.gather(self.lookup([key]))["price"][0])
@@ -0,0 +1,144 @@
+import asyncio
+import heapq
+import itertools
+import random
+import time
+
+# Central scheduler for Upstox REST calls. Each endpoint class has a token
+# bucket; callers queue for a token in priority lanes (lower number first, so
+# live quotes overtake a metadata refresh), responses with 429/5xx are retried
+# with jittered exponential backoff, and identical requests already in flight
+# are coalesced onto one call.
+
+PRIORITY_LIVE = 0
+PRIORITY_META = 1
+
+# endpoint class -> (tokens per second, burst). Upstox allows 50 req/s per
+# user across the standard APIs; stay well under it.
+DEFAULT_LIMITS = {
+    "quote": (20.0, 20),
+    "option_chain": (10.0, 10),
+    "default": (5.0, 5),
+}
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+class TokenBucket:
+    def __init__(self, rate, burst, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.clock = clock
+        self.stamp = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+    def take(self):
+        # Takes a token and returns 0, or returns the seconds until one is due
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def drain(self):
+        # The server pushed back: spend whatever burst is left
+        self._refill()
+        self.tokens = min(self.tokens, 0.0)
+
+class RequestScheduler:
+    def __init__(self, limits=None, retries=3, backoff=0.5, max_backoff=8.0):
+        self.limits = dict(DEFAULT_LIMITS if limits is None else limits)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.buckets = {}
+        self.counters = {"requests": 0, "delayed": 0, "throttled": 0, "retried": 0, "failed": 0, "coalesced": 0}
+        self._waiting = {}  # endpoint -> heap of (priority, n, future)
+        self._pumps = {}
+        self._inflight = {}
+        self._tie = itertools.count()
+
+    def _bucket(self, endpoint):
+        if endpoint not in self.buckets:
+            rate, burst = self.limits.get(endpoint) or self.limits["default"]
+            self.buckets[endpoint] = TokenBucket(rate, burst)
+        return self.buckets[endpoint]
+
+    async def acquire(self, endpoint, priority=PRIORITY_LIVE):
+        # Waits for a token of this endpoint class, in priority order
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiting.setdefault(endpoint, []), (priority, next(self._tie), fut))
+        pump = self._pumps.get(endpoint)
+        if pump is None or pump.done():
+            self._pumps[endpoint] = asyncio.create_task(self._pump(endpoint))
+        await fut
+
+    async def _pump(self, endpoint):
+        bucket, heap = self._bucket(endpoint), self._waiting[endpoint]
+        while heap:
+            if heap[0][2].done():  # caller gave up (cancelled)
+                heapq.heappop(heap)
+                continue
+            wait = bucket.take()
+            if wait:
+                self.counters["delayed"] += 1
+                await asyncio.sleep(wait)
+                continue
+            heapq.heappop(heap)[2].set_result(None)
+
+    def _retry_delay(self, attempt, response=None):
+        if response is not None:
+            try:
+                return float(response.headers.get("Retry-After"))
+            except (TypeError, ValueError):
+                pass
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    async def _run(self, endpoint, send, priority):
+        attempt = 0
+        while True:
+            await self.acquire(endpoint, priority)
+            self.counters["requests"] += 1
+            try:
+                response = await send()
+            except Exception:
+                if attempt >= self.retries:
+                    self.counters["failed"] += 1
+                    raise
+                response = None
+            else:
+                if response.status_code not in RETRY_STATUSES:
+                    return response
+                if response.status_code == 429:
+                    self.counters["throttled"] += 1
+                    self._bucket(endpoint).drain()
+                if attempt >= self.retries:
+                    self.counters["failed"] += 1
+                    return response
+            self.counters["retried"] += 1
+            await asyncio.sleep(self._retry_delay(attempt, response))
+            attempt += 1
+
+    async def submit(self, endpoint, send, priority=PRIORITY_LIVE, key=None):
+        # Runs send() (a coroutine factory returning an httpx.Response) under
+        # the endpoint's rate limit. Callers passing the same key while one
+        # is in flight share its result.
+        if key is None:
+            return await self._run(endpoint, send, priority)
+        task = self._inflight.get(key)
+        if task is not None:
+            self.counters["coalesced"] += 1
+        else:
+            task = asyncio.ensure_future(self._run(endpoint, send, priority))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+        return await asyncio.shield(task)
+
+    def _forget(self, key, task):
+        self._inflight.pop(key, None)
+        if not task.cancelled():
+            task.exception()  # retrieved here in case every caller went away
@@ -0,0 +1,107 @@
+import asyncio
+import time
+
+import numpy as np
+
+from archive import iter_range, segment_paths, segment_index
+
+# Offline replay of the columnar archive. Archived rows are regrouped into
+# per-timestamp snapshots of raw inputs (spot and the CE/PE leg quotes of
+# every underlying) in time order across sources, and handed to a callback
+# that pushes them through the live pricing/publishing path. speed is a
+# multiple of real time; 0 replays as fast as possible.
+
+LEG_FIELDS = ("ce_strike", "ce_ltp", "ce_vol", "ce_oi", "pe_strike", "pe_ltp", "pe_vol", "pe_oi")
+FIELDS = ("underlying", "spot", "expiry", "lot", "weight", "vix", "pair_index") + LEG_FIELDS
+
+def time_bounds(root, sources, start=None, end=None):
+    # (first, last) archived ts across sources, clipped to start/end
+    lo, hi = None, None
+    for source in sources:
+        for path in segment_paths(root, source, start, end):
+            for entry in segment_index(path):
+                lo = entry["ts_min"] if lo is None else min(lo, entry["ts_min"])
+                hi = entry["ts_max"] if hi is None else max(hi, entry["ts_max"])
+    if lo is None:
+        return None, None
+    return max(lo, start) if start is not None else lo, min(hi, end) if end is not None else hi
+
+def group_snapshots(cols):
+    # {column: array} rows -> [(ts, [block, ...])], one entry per timestamp
+    out = []
+    if not len(cols["ts"]):
+        return out
+    records = {n: cols[n].tolist() for n in cols}
+    ts = cols["ts"]
+    cuts = np.flatnonzero(np.diff(ts)) + 1
+    for lo, hi in zip(np.r_[0, cuts], np.r_[cuts, len(ts)]):
+        blocks = {}
+        for i in range(lo, hi):
+            name = records["underlying"][i]
+            block = blocks.get(name)
+            if block is None:
+                block = blocks[name] = {k: records[k][i] for k in ("spot", "expiry", "lot", "weight", "vix")}
+                block["name"] = name
+                block["legs"] = []
+            block["legs"].append((records["pair_index"][i], {k: records[k][i] for k in LEG_FIELDS}))
+        for block in blocks.values():
+            block["legs"] = [leg for _, leg in sorted(block["legs"], key=lambda item: item[0])]
+            for k in ("weight", "vix"):
+                if block[k] != block[k]:
+                    block[k] = None  # NaN: not recorded
+        out.append((float(ts[lo]), list(blocks.values())))
+    return out
+
+class ArchiveReplay:
+    def __init__(self, root, sources=("indices", "nifty50_chain"), start=None, end=None, speed=1.0, window=300.0):
+        self.root = root
+        self.sources = sources
+        self.start = start
+        self.end = end
+        self.speed = speed
+        self.window = window  # seconds of archive loaded at a time
+        self.replayed = 0
+
+    def snapshots(self):
+        # Yields (ts, source, blocks) in time order
+        first, last = time_bounds(self.root, self.sources, self.start, self.end)
+        if first is None:
+            return
+        lo = first
+        while lo <= last:
+            hi = min(lo + self.window, last)
+            events = []
+            for source in self.sources:
+                cols = {}
+                for batch in iter_range(self.root, source, lo, hi, FIELDS):
+                    for n, v in batch.items():
+                        cols.setdefault(n, []).append(v)
+                if not cols:
+                    continue
+                cols = {n: np.concatenate(v) for n, v in cols.items()}
+                order = np.argsort(cols["ts"], kind="stable")
+                cols = {n: v[order] for n, v in cols.items()}
+                # Window edges are inclusive; skip what the previous window had
+                if lo > first:
+                    keep = cols["ts"] > lo
+                    cols = {n: v[keep] for n, v in cols.items()}
+                events += [(ts, source, blocks) for ts, blocks in group_snapshots(cols)]
+            events.sort(key=lambda e: e[0])
+            yield from events
+            if hi >= last:
+                break
+            lo = hi
+
+    async def run(self, handler):
+        # Calls handler(ts, source, blocks) for every snapshot, paced by speed
+        wall0, ts0 = time.monotonic(), None
+        for ts, source, blocks in self.snapshots():
+            if ts0 is None:
+                ts0 = ts
+            if self.speed > 0:
+                await asyncio.sleep(max(0.0, wall0 + (ts - ts0) / self.speed - time.monotonic()))
+            else:
+                await asyncio.sleep(0)  # let the sockets drain
+            handler(ts, source, blocks)
+            self.replayed += 1
+        return self.replayed
@@ -0,0 +1,93 @@
+# Memoized per-underlying row blocks for the Nifty 50 payload. Each block is
+# stored with the signature of the inputs it was priced from (spot, leg
+# quotes, VIX, days-to-expiry bucket); the fetcher skips re-pricing while the
+# signature holds. The summary counts/weights are patched as blocks come and
+# go instead of being re-summed, and every change is stamped with a version
+# so consumers can ask what moved since the last one they saw.
+
+STATUS_FIELDS = {"POSITIVE": "pos", "NEGATIVE": "neg"}
+
+class RowBook:
+    def __init__(self):
+        self.blocks = {}
+        self.signatures = {}
+        self.version = 0
+        self.changed_at = {}  # name -> version of its last change
+        self.removed_at = {}  # name -> version it was dropped in
+        self._pending = set()
+        self._order = None
+        # Weights are kept in hundredths so add/subtract never drifts
+        self._counts = {"pos": 0, "neg": 0, "neu": 0}
+        self._weights = {"pos": 0, "neg": 0, "neu": 0}
+
+    def is_fresh(self, name, signature):
+        return name in self.blocks and self.signatures.get(name) == signature
+
+    def _account(self, block, sign):
+        field = STATUS_FIELDS.get(block["status"], "neu")
+        self._counts[field] += sign
+        self._weights[field] += sign * int(round(block["weight"] * 100))
+
+    def put(self, name, signature, block):
+        self.signatures[name] = signature
+        old = self.blocks.get(name)
+        if old == block:
+            return False
+        if old is not None:
+            self._account(old, -1)
+        else:
+            self._order = None
+        self._account(block, +1)
+        self.blocks[name] = block
+        self._pending.add(name)
+        return True
+
+    def remove(self, name):
+        self.signatures.pop(name, None)
+        old = self.blocks.pop(name, None)
+        if old is None:
+            return False
+        self._account(old, -1)
+        self._order = None
+        self._pending.add(name)
+        return True
+
+    def invalidate(self, name=None):
+        # Forget one block's signature (or all of them), e.g. after a
+        # metadata refresh
+        if name is None:
+            self.signatures.clear()
+        else:
+            self.signatures.pop(name, None)
+
+    def commit(self):
+        # Closes one recompute cycle. Returns (changed, removed) names and
+        # bumps the version if anything moved.
+        if not self._pending:
+            return [], []
+        self.version += 1
+        changed, removed = [], []
+        for name in self._pending:
+            if name in self.blocks:
+                self.changed_at[name] = self.version
+                self.removed_at.pop(name, None)
+                changed.append(name)
+            else:
+                self.removed_at[name] = self.version
+                self.changed_at.pop(name, None)
+                removed.append(name)
+        self._pending.clear()
+        return changed, removed
+
+    def summary(self):
+        out = {}
+        for field in ("pos", "neg", "neu"):
+            out[f"{field}_count"] = self._counts[field]
+            out[f"{field}_weight"] = round(self._weights[field] / 100.0, 2)
+        return out
+
+    def results(self):
+        # Blocks by descending index weight; only re-sorted when membership changes
+        if self._order is None:
+            self._order = sorted(self.blocks, key=lambda n: self.blocks[n]["weight"], reverse=True)
+        return [self.blocks[n] for n in self._order]
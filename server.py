@@ -1,49 +1,85 @@
 import asyncio
 import os
-import requests
 import json
 import time
-import threading
-import concurrent.futures
 import math
-from datetime import datetime, timezone, timedelta
+from datetime import datetime
+import numpy as np
 import nifty_weights
+from pricing import price_pairs, implied_vol_vec
+from quote_store import QuoteStore
+from row_book import RowBook
+from strike_index import strike_key, atm_pairs, strike_interval
+from broadcast import BroadcastHub
+from upstox_api import UpstoxAPI
+from http_capture import HttpCapture
+from rate_limit import PRIORITY_META
+from archive import ArchiveWriter, iter_range, batch_records, IST
+import metrics
+from cadence import MarketCalendar, Ticker, load_holidays, CLOSED
+from shared_snapshot import SnapshotWriter, SnapshotReader
+from meta_cache import MetaCache, build_meta, meta_from_chain, needs_recenter
+from chain_analytics import analyze_chain
+from instruments import InstrumentMaster, refresh_master, MAX_AGE as MASTER_MAX_AGE
+from watchlist import Watchlist, STOCKS
 
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
-from fastapi.responses import HTMLResponse
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Query
+from fastapi.responses import HTMLResponse, StreamingResponse, PlainTextResponse
 from dotenv import load_dotenv
 
 import json
 import os
 
 LOG_DIR = "market_data_logs"
-if not os.path.exists(LOG_DIR):
-    os.makedirs(LOG_DIR)
+# Published payloads are archived off the hot path as compressed columnar
+# segments (see archive.py), rotated per day and every ARCHIVE_MAX_MB
+ARCHIVE_MAX_MB = int(os.getenv("ARCHIVE_MAX_MB", "64"))
+index_archive = ArchiveWriter(LOG_DIR, "indices", max_bytes=ARCHIVE_MAX_MB << 20)
+nifty_archive = ArchiveWriter(LOG_DIR, "nifty50_chain", max_bytes=ARCHIVE_MAX_MB << 20)
+# Importing this module has no side effects: credentials, reference data and
+# the Upstox client are loaded by configure() when the app starts (or when a
+# tool calls it), and nothing touches the network before startup.
+LOT_SIZES = {}
+NIFTY_KEYS = {}
+ACCESS_TOKEN = None
+configured = False
+# Shared keep-alive client for all Upstox REST calls, opened on app startup
+UPSTOX_HTTP_CONCURRENCY = int(os.getenv("UPSTOX_HTTP_CONCURRENCY", "8"))
+# Point at a local fake_upstox.py to run offline; record raw responses with
+# UPSTOX_CAPTURE_FILE (gzip JSONL) to feed that fake later
+UPSTOX_BASE_URL = os.getenv("UPSTOX_BASE_URL", "https://api.upstox.com")
+UPSTOX_CAPTURE_FILE = os.getenv("UPSTOX_CAPTURE_FILE", "")
+upstox = None
+# Indices and expiries to track (watchlist.py); the Upstox instrument master
+# they are resolved from is cached next to the archives
+WATCHLIST_FILE = os.getenv("WATCHLIST_FILE", "watchlist.json")
+INSTRUMENTS_FILE = os.getenv("INSTRUMENTS_FILE", os.path.join(LOG_DIR, "complete.csv.gz"))
+watchlist = Watchlist({})
 
-def log_market_data(data, prefix):
-    if not data: return
-    today_str = datetime.now(timezone(timedelta(hours=5, minutes=30))).strftime('%Y-%m-%d')
-    filepath = os.path.join(LOG_DIR, f"{prefix}_{today_str}.jsonl")
+def load_json(path, default):
     try:
-        with open(filepath, "a") as f:
-            f.write(json.dumps(data) + "\n")
-    except Exception as e:
-        print(f"Error logging data: {e}")
-try:
-    with open("lot_sizes.json", "r") as f:
-        LOT_SIZES = json.load(f)
-except:
-    LOT_SIZES = {}
-
-load_dotenv("keys.env", override=True)
-ACCESS_TOKEN = os.getenv("UPSTOX_ACCESS_TOKEN")
-HEADERS = {"Authorization": f"Bearer {ACCESS_TOKEN}", "Accept": "application/json"}
-
-EXPIRY_NIFTY = "2026-03-02"
-EXPIRY_SENSEX = "2026-03-05"
-EXPIRY_BANKNIFTY = "2026-03-30"
-EXPIRY_MIDCAP = "2026-03-30"
-EXPIRY_STOCKS = "2026-03-30"
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Could not load {path}: {e}")
+        return default
+
+def configure():
+    # Loads keys.env, the reference data files and the holiday calendar and
+    # builds the Upstox client. Idempotent.
+    global LOT_SIZES, NIFTY_KEYS, ACCESS_TOKEN, upstox, watchlist, configured
+    if configured:
+        return
+    load_dotenv("keys.env", override=True)
+    ACCESS_TOKEN = os.getenv("UPSTOX_ACCESS_TOKEN")
+    LOT_SIZES = load_json("lot_sizes.json", {})
+    NIFTY_KEYS = load_json("nifty50_keys.json", {})
+    watchlist = Watchlist(load_json(WATCHLIST_FILE, {}))
+    market_calendar.holidays = load_holidays()
+    if upstox is None:
+        upstox = UpstoxAPI(ACCESS_TOKEN, concurrency=UPSTOX_HTTP_CONCURRENCY, base_url=UPSTOX_BASE_URL,
+                           capture=HttpCapture(UPSTOX_CAPTURE_FILE) if UPSTOX_CAPTURE_FILE else None)
+    configured = True
 
 app = FastAPI()
 
@@ -52,113 +88,72 @@ latest_data = {}
 latest_nifty_data = {}
 connected_clients = set()
 connected_nifty_clients = set()
+# Versioned snapshot + patch streams behind /ws and /ws_nifty, encoded once
+# per update and fanned out to every connected socket
+index_hub = BroadcastHub()
+nifty_hub = BroadcastHub()
 
-with open("nifty50_keys.json", "r") as f:
-    NIFTY_KEYS = json.load(f)
+# Process split. "all" runs everything in one process. "ingest" runs the
+# fetch loops and pricing. Both write every published payload to a
+# memory-mapped snapshot file (SNAPSHOT_SHM-indices / -nifty50 .snap in
+# SNAPSHOT_DIR, see shared_snapshot.py) that any local process can read,
+# e.g. dump_snapshot.py. "web" runs no fetchers: it reads those files and
+# serves the sockets, so it can run as many uvicorn workers as needed
+# without the pricing bursts stalling their fan-out:
+#   SERVER_ROLE=ingest uvicorn server:app --port 8001
+#   SERVER_ROLE=web uvicorn server:app --port 8000 --workers 4
+SERVER_ROLE = os.getenv("SERVER_ROLE", "all")  # all | ingest | web
+SNAPSHOT_SHM = os.getenv("SNAPSHOT_SHM", "algo-dash")
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR") or None  # None: /dev/shm, or the temp dir without it
+SNAPSHOT_SHM_MB = int(os.getenv("SNAPSHOT_SHM_MB", "8"))  # per slot; each file holds two
+SNAPSHOT_POLL_INTERVAL = 0.05
+snapshot_writers = {}  # channel -> SnapshotWriter (all and ingest roles)
+snapshot_readers = {}  # channel -> SnapshotReader (web role)
 
-# --- 0. BLACK SCHOLES LOGIC ---
-def norm_cdf(x):
-    return (1.0 + math.erf(x / math.sqrt(2.0))) / 2.0
+# Hot-path instrumentation, exposed on /metrics and /debug/stats
+CYCLE_BUDGET = 5.0  # seconds both fetch loops aim to stay within
+STAGE_SECONDS = metrics.registry.histogram("stage_seconds", "Duration of each pipeline stage by loop")
+CYCLE_SECONDS = metrics.registry.histogram("cycle_seconds", "Duration of one fetch loop cycle")
+CYCLE_OVERRUNS = metrics.registry.counter("cycle_overruns_total", "Cycles that took longer than the 5 s budget")
+CHUNK_KEYS = metrics.registry.histogram("mega_quote_chunk_keys", "Instrument keys per quotes request", metrics.SIZE_BUCKETS)
+index_updated_at = {}  # index name -> time of its last published block
 
-def norm_pdf(x):
-    return math.exp(-0.5 * x * x) / math.sqrt(2.0 * math.pi)
+# Loop pacing follows NSE/BSE session phases (see cadence.py); CADENCE_MODE=always
+# keeps the open-market cadence around the clock, e.g. against a fake API
+CADENCE_MODE = os.getenv("CADENCE_MODE", "market")  # market | always
+market_calendar = MarketCalendar(always_open=CADENCE_MODE == "always")  # holidays loaded by configure()
 
-def bs_call_price(S, K, T, r, sigma):
-    try:
-        d1 = (math.log(S / K) + (r + 0.5 * sigma**2) * T) / (sigma * math.sqrt(T))
-        d2 = d1 - sigma * math.sqrt(T)
-        return S * norm_cdf(d1) - K * math.exp(-r * T) * norm_cdf(d2)
-    except: return 0.0
+def tracked_expiries():
+    return watchlist.tracked_expiries(time.time())
 
-def bs_put_price(S, K, T, r, sigma):
-    try:
-        d1 = (math.log(S / K) + (r + 0.5 * sigma**2) * T) / (sigma * math.sqrt(T))
-        d2 = d1 - sigma * math.sqrt(T)
-        return K * math.exp(-r * T) * norm_cdf(-d2) - S * norm_cdf(-d1)
-    except: return 0.0
+def make_ticker(name, interval):
+    return Ticker(name, interval, market_calendar, expiries=tracked_expiries, vix=lambda: current_vix)
 
-def mjd_call_price(S, K, T, r, sigma, lambda_j=1.0, mu_j=-0.05, sigma_j=0.15, N=15):
-    try:
-        price = 0.0
-        lam_prime = lambda_j * (1 + mu_j)
-        for k in range(N):
-            poisson_prob = math.exp(-lam_prime * T) * ((lam_prime * T)**k) / math.factorial(k)
-            r_k = r - lambda_j * mu_j + (k * math.log(1 + mu_j)) / T
-            sigma_k = math.sqrt(sigma**2 + (k * sigma_j**2) / T)
-            price += poisson_prob * bs_call_price(S, K, T, r_k, sigma_k)
-        return price
-    except: return 0.0
-
-def mjd_put_price(S, K, T, r, sigma, lambda_j=1.0, mu_j=-0.05, sigma_j=0.15, N=15):
-    try:
-        price = 0.0
-        lam_prime = lambda_j * (1 + mu_j)
-        for k in range(N):
-            poisson_prob = math.exp(-lam_prime * T) * ((lam_prime * T)**k) / math.factorial(k)
-            r_k = r - lambda_j * mu_j + (k * math.log(1 + mu_j)) / T
-            sigma_k = math.sqrt(sigma**2 + (k * sigma_j**2) / T)
-            price += poisson_prob * bs_put_price(S, K, T, r_k, sigma_k)
-        return price
-    except: return 0.0
-
-def cs_call_price(S, K, T, r, sigma, skew=-1.5, kurt=4.0):
-    try:
-        bs_price = bs_call_price(S, K, T, r, sigma)
-        d1 = (math.log(S / K) + (r + 0.5 * sigma**2) * T) / (sigma * math.sqrt(T))
-        d2 = d1 - sigma * math.sqrt(T)
-        term1 = (skew / 6.0) * S * sigma * math.sqrt(T) * (d2) * norm_pdf(d1)
-        term2 = (kurt / 24.0) * S * sigma * math.sqrt(T) * (d2**2 - 1) * norm_pdf(d1)
-        return max(0.0, bs_price + term1 + term2)
-    except: return 0.0
-
-def cs_put_price(S, K, T, r, sigma, skew=-1.5, kurt=4.0):
-    try:
-        bs_price = bs_put_price(S, K, T, r, sigma)
-        d1 = (math.log(S / K) + (r + 0.5 * sigma**2) * T) / (sigma * math.sqrt(T))
-        d2 = d1 - sigma * math.sqrt(T)
-        term1 = (skew / 6.0) * S * sigma * math.sqrt(T) * (d2) * norm_pdf(d1)
-        term2 = (kurt / 24.0) * S * sigma * math.sqrt(T) * (d2**2 - 1) * norm_pdf(d1)
-        return max(0.0, bs_price + term1 + term2)
-    except: return 0.0
-
-def bs_vega(S, K, T, r, sigma):
-    try:
-        d1 = (math.log(S / K) + (r + 0.5 * sigma**2) * T) / (sigma * math.sqrt(T))
-        return S * norm_pdf(d1) * math.sqrt(T)
-    except: return 0.0
-
-def calculate_iv(market_price, S, K, T_days, r, opt_type):
-    if T_days <= 0 or market_price <= 0 or S <= 0 or K <= 0:
-        return 0.0
-    T = T_days / 365.0
-    sigma = 0.5 # 50% initial guess
-    for _ in range(50):
-        price = bs_call_price(S,K,T,r,sigma) if opt_type == 'CE' else bs_put_price(S,K,T,r,sigma)
-        diff = market_price - price
-        if abs(diff) < 0.001: return round(sigma * 100, 2)
-        vega = bs_vega(S,K,T,r,sigma)
-        if vega == 0.0: break
-        sigma += diff / vega
-        if sigma <= 0.0: sigma = 0.01
-    return round(sigma * 100, 2)
+index_ticker = make_ticker("indices", 5)
+vix_ticker = make_ticker("vix", 15)
+nifty_ticker = make_ticker("nifty50", 5)
+
+# Replay pins "now" to the archived time so expiry maths matches the recording
+clock_override = None
+
+def ist_now():
+    if clock_override is not None:
+        return datetime.fromtimestamp(clock_override, IST)
+    return datetime.now(IST)
 
 def get_days_to_expiry(expiry_str):
     try:
         exp_date = datetime.strptime(expiry_str + " 15:30:00", "%Y-%m-%d %H:%M:%S")
-        now = datetime.now(timezone(timedelta(hours=5, minutes=30))).replace(tzinfo=None)
+        now = ist_now().replace(tzinfo=None)
         diff = (exp_date - now).total_seconds() / 86400.0
         return max(0.001, diff)
     except: return 1.0
 
 
 # --- 1. INDEX LOGIC ---
-def get_option_chain(instrument_key, expiry):
-    url = f"https://api.upstox.com/v2/option/chain?instrument_key={instrument_key}&expiry_date={expiry}"
+async def get_option_chain(instrument_key, expiry):
     try:
-        r = requests.get(url, headers=HEADERS, timeout=10)
-        data = r.json()
-        if data.get("status") == "success":
-            return data.get("data", [])
+        return await upstox.option_chain(instrument_key, expiry)
     except Exception as e:
         print(f"Network error parsing {instrument_key}: {e}")
     return []
@@ -175,362 +170,889 @@ def get_interval(chain):
         if diffs: return max(diffs, key=diffs.get)
     return 1
 
-def get_opt_data(chain, strike, side):
-    for row in chain:
-        if row["strike_price"] == strike:
-            key = "call_options" if side == "CE" else "put_options"
-            mkt_data = row.get(key, {}).get("market_data", {})
-            ltp = mkt_data.get("ltp", 0)
-            if ltp == 0:
-                ltp = mkt_data.get("close_price", 0)
-            vol = mkt_data.get("volume", 0)
-            oi = mkt_data.get("oi", 0)
-            return ltp, vol, oi
-    return 0, 0, 0
-
-def process_index(name, key, expiry):
-    chain = get_option_chain(key, expiry)
+def vix_vol():
+    # India VIX as a model sigma, capped for stability
+    return max(0.05, min(0.35, current_vix / 100.0))
+
+def build_pair_rows(blocks):
+    # Each block is one underlying: {"spot", "days_to_expiry", "lot", "legs"} where
+    # legs are the raw CE/PE quotes per pair. All legs of all blocks are priced
+    # in a single vectorized pass; returns the row list for each block.
+    dynamic_vol = vix_vol()
+    spots, ce_strikes, pe_strikes, ce_ltps, pe_ltps, T = [], [], [], [], [], []
+    for block in blocks:
+        for leg in block["legs"]:
+            spots.append(block["spot"])
+            ce_strikes.append(leg["ce_strike"])
+            pe_strikes.append(leg["pe_strike"])
+            ce_ltps.append(leg["ce_ltp"])
+            pe_ltps.append(leg["pe_ltp"])
+            T.append(block["days_to_expiry"] / 365.0)
+    if not spots:
+        return [[] for _ in blocks]
+
+    # MJD (ce_fv/pe_fv) and Corrado-Su use the live India VIX (capped for
+    # stability), plain Black-Scholes uses a fixed 14% vol for ML reference.
+    fvs = {k: np.round(v, 2).tolist() for k, v in price_pairs(spots, ce_strikes, pe_strikes, T, dynamic_vol).items()}
+
+    # Implied vol of every CE and PE leg in one solve; legs that do not
+    # converge are published as null rather than a garbage number.
+    ivs, converged = implied_vol_vec([ce_ltps, pe_ltps], [spots, spots], [ce_strikes, pe_strikes], [T, T], 0.1, [[True], [False]])
+    impv = np.where(converged, np.round(ivs * 100, 2), np.nan).tolist()
+    ce_impv = [None if math.isnan(v) else v for v in impv[0]]
+    pe_impv = [None if math.isnan(v) else v for v in impv[1]]
+
+    all_rows = []
+    i = 0
+    for block in blocks:
+        spot = block["spot"]
+        rows = []
+        for leg in block["legs"]:
+            ce_strike, pe_strike = leg["ce_strike"], leg["pe_strike"]
+            ce_iv = max(0, spot - ce_strike)  # Intrinsic Value
+            pe_iv = max(0, pe_strike - spot)
+
+            ce_tv = round(leg["ce_ltp"] - ce_iv, 2)
+            pe_tv = round(leg["pe_ltp"] - pe_iv, 2)
+
+            ce_fv, pe_fv = fvs["ce_fv"][i], fvs["pe_fv"][i]
+            diff = round(ce_tv - pe_tv, 2)
+            fv_diff = round(ce_fv - pe_fv, 2)
+
+            tv_bias = "BUY PE" if diff > 0 else "BUY CE" if diff < 0 else ""
+            fv_bias = "BUY PE" if fv_diff > 0 else "BUY CE" if fv_diff < 0 else ""
+
+            bias = tv_bias
+            if tv_bias != "" and tv_bias == fv_bias:
+                bias += " ⭐️"
+
+            rows.append({
+                "pair": f"{ce_strike} / {pe_strike}",
+                "ce_strike": ce_strike, "ce_ltp": round(leg["ce_ltp"], 2), "ce_fv": ce_fv, "ce_iv": round(ce_iv, 2), "ce_tv": ce_tv, "bs_ce_fv": fvs["bs_ce_fv"][i], "cs_ce_fv": fvs["cs_ce_fv"][i], "ce_vol": leg["ce_vol"], "ce_oi": leg["ce_oi"], "ce_impv": ce_impv[i],
+                "pe_strike": pe_strike, "pe_ltp": round(leg["pe_ltp"], 2), "pe_fv": pe_fv, "pe_iv": round(pe_iv, 2), "pe_tv": pe_tv, "bs_pe_fv": fvs["bs_pe_fv"][i], "cs_pe_fv": fvs["cs_pe_fv"][i], "pe_vol": leg["pe_vol"], "pe_oi": leg["pe_oi"], "pe_impv": pe_impv[i],
+                "diff": diff, "fv_diff": fv_diff, "bias": bias, "lot": block["lot"]
+            })
+            i += 1
+        all_rows.append(rows)
+    return all_rows
+
+# Watchlist: the expiries of every index and of the stock options, with their
+# strikes and option keys, come from the instrument master. Without one (no
+# download and no cached copy) they are read from the option contracts API
+# instead, one call per underlying. It is reloaded once a day (after a failed
+# load, every WATCHLIST_RETRY s); expiries roll over by themselves at each
+# expiry day's close.
+WATCHLIST_RETRY = 300
+watchlist_task = None
+watchlist_attempt_at = 0.0
+
+def load_watchlist(config):
+    # Runs in a thread: builds a new Watchlist for ensure_watchlist to put in
+    # place on the event loop, or None when there is no master to load
+    if not refresh_master(INSTRUMENTS_FILE, max_age=MASTER_MAX_AGE):
+        print(f"No instrument master at {INSTRUMENTS_FILE}; trying the option contracts API")
+        return None
+    fresh = Watchlist(config)
+    try:
+        count = fresh.load(InstrumentMaster.load(INSTRUMENTS_FILE), list(NIFTY_KEYS), time.time())
+    except Exception as e:
+        print(f"Watchlist load failed: {e}")
+        return None
+    print(f"Watchlist: {count} expiries listed, tracking {len(fresh.entries(time.time()))} index expiries")
+    return fresh
+
+async def load_watchlist_from_contracts(config):
+    targets = [(idx["symbol"], "OPTIDX", idx["key"]) for idx in config["indices"]]
+    targets += [(symbol, "OPTSTK", key) for symbol, key in NIFTY_KEYS.items()]
+    results = await asyncio.gather(*(upstox.option_contracts(key, priority=PRIORITY_META) for _, _, key in targets),
+                                   return_exceptions=True)
+    contracts = [(symbol, kind, rows) for (symbol, kind, _), rows in zip(targets, results) if isinstance(rows, list) and rows]
+    if not contracts:
+        return None
+    fresh = Watchlist(config)
+    count = fresh.load(await asyncio.to_thread(InstrumentMaster.from_contracts, contracts), list(NIFTY_KEYS), time.time())
+    print(f"Watchlist from option contracts ({len(contracts)} of {len(targets)} underlyings): {count} expiries listed, "
+          f"tracking {len(fresh.entries(time.time()))} index expiries")
+    return fresh
+
+async def reload_watchlist(config):
+    fresh = await asyncio.to_thread(load_watchlist, config)
+    if fresh is None:
+        fresh = await load_watchlist_from_contracts(config)
+    if fresh is None:
+        print(f"WATCHLIST UNAVAILABLE: no instrument master and no option contracts; index and Nifty 50 "
+              f"loops publish nothing until it loads (next try in {WATCHLIST_RETRY}s)")
+    return fresh
+
+async def ensure_watchlist():
+    # Both fetch loops wait on the same load
+    global watchlist, watchlist_task, watchlist_attempt_at
+    now = time.time()
+    due = MASTER_MAX_AGE if watchlist.loaded_at >= watchlist_attempt_at else WATCHLIST_RETRY
+    if watchlist_task is None or (watchlist_task.done() and now - watchlist_attempt_at >= due):
+        watchlist_attempt_at = now
+        watchlist_task = asyncio.ensure_future(reload_watchlist({"indices": watchlist.indices}))
+    fresh = await asyncio.shield(watchlist_task)
+    if fresh is not None and fresh.loaded_at > watchlist.loaded_at:
+        watchlist = fresh
+        index_meta.clear()  # rebuilt from the new strike lists
+
+def stock_expiry():
+    return watchlist.stock_expiry(ist_now().timestamp())
+
+# Index rows are priced from a window of quotes around ATM rather than the
+# full chain. Every tracked expiry of every index (see watchlist.py) is
+# resolved from the instrument master into strike keys, and each cycle one
+# batched quotes call fetches the spots plus the CE/PE keys within
+# INDEX_WINDOW strikes of ATM for all of them, so a further expiry costs
+# quote slots, not chain calls. The full chain is fetched only for the
+# nearest expiry's analytics, every INDEX_CHAIN_INTERVAL s.
+INDEX_WINDOW = 8  # strikes either side of ATM: the 6 row pairs plus 2 spare
+INDEX_CHAIN_INTERVAL = float(os.getenv("INDEX_CHAIN_INTERVAL", "60"))
+index_meta = {}  # block name -> build_meta() of all strikes listed for its expiry
+index_chain_at = {}  # block name -> (expiry, time) of its last chain fetch
+index_analytics = {}  # block name -> analyze_chain() of that chain
+
+def index_watchlist():
+    # One entry per index and tracked expiry, nearest first (Watchlist.entries)
+    return [entry for entry in watchlist.entries(ist_now().timestamp()) if entry["strikes"]]
+
+def index_of(name):
+    # Watchlist index a block belongs to ("NIFTY 50 03NOV" -> "NIFTY 50")
+    for idx in watchlist.indices:
+        if name == idx["name"] or name.startswith(idx["name"] + " "):
+            return idx["name"]
+    return None
+
+def entry_meta(entry, spot):
+    # Strike keys of one index expiry; the interval is read around spot
+    meta = index_meta.get(entry["name"])
+    if meta is None or meta["expiry"] != entry["expiry"]:
+        strikes = entry["strikes"]
+        interval = strike_interval([s["strike"] for s in strikes], spot)
+        listed = (strike_key(strikes[0]["strike"]), strike_key(strikes[-1]["strike"]))
+        meta = index_meta[entry["name"]] = build_meta(entry["name"], entry["key"], entry["expiry"], interval, strikes, listed)
+    return meta
+
+def index_window_keys(entry):
+    # CE/PE keys within INDEX_WINDOW strikes of the current ATM
+    spot = quote_store.price(entry["key"])
+    if not spot:
+        return []
+    meta = entry_meta(entry, spot)
+    step = strike_key(meta["interval"])
+    atm = strike_key(round(spot / meta["interval"]) * meta["interval"])
+    keys = []
+    for sk, pair in meta["strike_keys"].items():
+        if abs(sk - atm) <= INDEX_WINDOW * step:
+            keys += [k for k in pair if k]
+    return keys
+
+async def fetch_quotes(keys):
+    # Batched quotes for keys in 400-key chunks, all in flight at once
+    started = time.time()
+    chunks = [keys[i:i + 400] for i in range(0, len(keys), 400)]
+    for chunk in chunks:
+        CHUNK_KEYS.observe(len(chunk))
+    data = {}
+    for res in await asyncio.gather(*(upstox.quotes(chunk) for chunk in chunks)):
+        data.update(res)
+    if data:
+        quote_store.update_from_quotes(data, as_of=started)
+
+async def poll_index_quotes(entries):
+    # Spots and windows of every entry in one batch. An index whose spot was
+    # not known yet, or moved past its window meanwhile, gets one follow-up
+    # call for just the keys it is missing.
+    asked = set()
+    for _ in range(2):
+        keys = list(dict.fromkeys([e["key"] for e in entries] + [k for e in entries for k in index_window_keys(e)]))
+        keys = [k for k in keys if k not in asked]
+        if not keys:
+            break
+        await fetch_quotes(keys)
+        asked.update(keys)
+
+async def refresh_index_analytics(entry):
+    with STAGE_SECONDS.time(loop="indices", stage="chain"):
+        chain = await get_option_chain(entry["key"], entry["expiry"])
+    index_chain_at[entry["name"]] = (entry["expiry"], time.time())
     spot = get_spot(chain)
-    if spot == 0 or not chain: return None
-    
-    interval = get_interval(chain)
-    atm = round(round(spot / interval) * interval, 2)
-    days_to_expiry = get_days_to_expiry(expiry)
-    
-    rows = []
-    for n in range(1, 7):
-        ce_strike = atm - n * interval
-        pe_strike = atm + n * interval
-        
-        ce_ltp, ce_vol, ce_oi = get_opt_data(chain, ce_strike, "CE")
-        pe_ltp, pe_vol, pe_oi = get_opt_data(chain, pe_strike, "PE")
-        
-        if ce_ltp == 0 or pe_ltp == 0: break
-            
-        ce_iv = max(0, spot - ce_strike)  # Intrinsic Value
-        pe_iv = max(0, pe_strike - spot)
-        
-        ce_tv = round(ce_ltp - ce_iv, 2)
-        pe_tv = round(pe_ltp - pe_iv, 2)
-        
-        # Calculate Theoretical Fair Value using Merton Jump-Diffusion Volatility Model
-        # Using the live India VIX percentage (capped locally for stability)
-        dynamic_vol = max(0.05, min(0.35, current_vix / 100.0))
-        
-        ce_fv = round(mjd_call_price(spot, ce_strike, days_to_expiry / 365.0, 0.1, dynamic_vol), 2)
-        pe_fv = round(mjd_put_price(spot, pe_strike, days_to_expiry / 365.0, 0.1, dynamic_vol), 2)
-        
-        # Calculate standard Black-Scholes for ML reference
-        bs_ce_fv = round(bs_call_price(spot, ce_strike, days_to_expiry / 365.0, 0.1, 0.14), 2)
-        bs_pe_fv = round(bs_put_price(spot, pe_strike, days_to_expiry / 365.0, 0.1, 0.14), 2)
-        
-        # Calculate Skewness-Kurtosis Corrado-Su Model
-        cs_ce_fv = round(cs_call_price(spot, ce_strike, days_to_expiry / 365.0, 0.1, dynamic_vol), 2)
-        cs_pe_fv = round(cs_put_price(spot, pe_strike, days_to_expiry / 365.0, 0.1, dynamic_vol), 2)
-        
-        diff = round(ce_tv - pe_tv, 2)
-        fv_diff = round(ce_fv - pe_fv, 2)
-        
-        tv_bias = "BUY PE" if diff > 0 else "BUY CE" if diff < 0 else ""
-        fv_bias = "BUY PE" if fv_diff > 0 else "BUY CE" if fv_diff < 0 else ""
-        
-        bias = tv_bias
-        if tv_bias != "" and tv_bias == fv_bias:
-             bias += " ⭐️"
-        
-        lot = LOT_SIZES.get(name, 1)
-
-        rows.append({
-            "pair": f"{ce_strike} / {pe_strike}",
-            "ce_strike": ce_strike, "ce_ltp": round(ce_ltp, 2), "ce_fv": ce_fv, "ce_iv": round(ce_iv, 2), "ce_tv": ce_tv, "bs_ce_fv": bs_ce_fv, "cs_ce_fv": cs_ce_fv, "ce_vol": ce_vol, "ce_oi": ce_oi,
-            "pe_strike": pe_strike, "pe_ltp": round(pe_ltp, 2), "pe_fv": pe_fv, "pe_iv": round(pe_iv, 2), "pe_tv": pe_tv, "bs_pe_fv": bs_pe_fv, "cs_pe_fv": cs_pe_fv, "pe_vol": pe_vol, "pe_oi": pe_oi,
-            "diff": diff, "fv_diff": fv_diff, "bias": bias, "lot": lot
-        })
-        
-    return {"name": name, "spot": spot, "expiry": expiry, "lot": LOT_SIZES.get(name, 1), "rows": rows}
-
-def data_fetcher_loop():
-    global latest_data
+    if not spot:
+        return
+    with STAGE_SECONDS.time(loop="indices", stage="analytics"):
+        index_analytics[entry["name"]] = await asyncio.to_thread(
+            analyze_chain, chain, spot, get_days_to_expiry(entry["expiry"]) / 365.0, vix_vol())
+
+def analytics_due(entry, now):
+    # Nearest expiry only, once per INDEX_CHAIN_INTERVAL and on every roll
+    if entry["rank"] != 0:
+        return False
+    expiry, fetched_at = index_chain_at.get(entry["name"], (None, 0))
+    return expiry != entry["expiry"] or now - fetched_at >= INDEX_CHAIN_INTERVAL
+
+def index_blocks(entries):
+    # Row blocks of the given index expiries, read from the quote store in one
+    # gather and priced in one batch
+    plans = []
+    leg_keys = []
+    for entry in entries:
+        spot = quote_store.price(entry["key"])
+        if not spot:
+            continue
+        meta = entry_meta(entry, spot)
+        pairs = atm_pairs(spot, meta["interval"])
+        for ce_strike, pe_strike in pairs:
+            leg_keys += [meta["strike_keys"].get(strike_key(ce_strike), ("", ""))[0],
+                         meta["strike_keys"].get(strike_key(pe_strike), ("", ""))[1]]
+        plans.append((entry, spot, pairs))
+    quotes = quote_store.gather(quote_store.lookup(leg_keys))
+    price, oi, vol = quotes["price"].tolist(), quotes["oi"].astype(np.int64).tolist(), quotes["volume"].tolist()
+
+    blocks = []
+    i = 0
+    for entry, spot, pairs in plans:
+        legs = []
+        for n, (ce_strike, pe_strike) in enumerate(pairs):
+            j = i + 2 * n
+            if price[j] == 0 or price[j + 1] == 0: break
+            legs.append({"ce_strike": ce_strike, "ce_ltp": price[j], "ce_vol": vol[j], "ce_oi": oi[j],
+                         "pe_strike": pe_strike, "pe_ltp": price[j + 1], "pe_vol": vol[j + 1], "pe_oi": oi[j + 1]})
+        i += 2 * len(pairs)
+        blocks.append({"name": entry["name"], "spot": spot, "expiry": entry["expiry"], "days_to_expiry": get_days_to_expiry(entry["expiry"]),
+                       "lot": LOT_SIZES.get(entry["index"], 1), "legs": legs})
+    with STAGE_SECONDS.time(loop="indices", stage="price"):
+        rows = build_pair_rows(blocks)
+    return [{"name": b["name"], "spot": b["spot"], "expiry": b["expiry"], "lot": b["lot"], "rows": r} for b, r in zip(blocks, rows)]
+
+async def data_fetcher_loop():
     print("Background Fetcher Started...")
     while True:
+        await index_ticker.wait()
+        started = time.perf_counter()
         try:
-            with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
-                futures = [
-                    executor.submit(process_index, "NIFTY 50", "NSE_INDEX|Nifty 50", EXPIRY_NIFTY),
-                    executor.submit(process_index, "SENSEX", "BSE_INDEX|SENSEX", EXPIRY_SENSEX),
-                    executor.submit(process_index, "BANKNIFTY", "NSE_INDEX|Nifty Bank", EXPIRY_BANKNIFTY),
-                    executor.submit(process_index, "MIDCAP", "NSE_INDEX|NIFTY MID SELECT", EXPIRY_MIDCAP)
-                ]
-                
-                results = []
-                for f in futures:
-                    res = f.result()
-                    if res: results.append(res)
-                    
-            if results:
-                latest_data = {
-                    "timestamp": datetime.now(timezone(timedelta(hours=5, minutes=30))).strftime('%H:%M:%S'),
-                    "indices": results
-                }
-                # Save to disk
-                log_market_data(latest_data, "indices")
+            await ensure_watchlist()
+            entries = index_watchlist()
+            if entries:
+                now = time.time()
+                due = [entry for entry in entries if analytics_due(entry, now)]
+                with STAGE_SECONDS.time(loop="indices", stage="fetch"):
+                    # The analytics chains download next to the quote batch
+                    await asyncio.gather(poll_index_quotes(entries), *(refresh_index_analytics(entry) for entry in due))
+                names = {entry["name"] for entry in entries}
+                publish_indices(index_blocks(entries), analytics={n: a for n, a in index_analytics.items() if n in names})
         except Exception as e:
             print(f"Fetch loop error: {e}")
-            
-        time.sleep(5)
+        observe_cycle("indices", time.perf_counter() - started)
+
+def observe_cycle(loop, seconds):
+    CYCLE_SECONDS.observe(seconds, loop=loop)
+    if seconds > CYCLE_BUDGET:
+        CYCLE_OVERRUNS.inc(loop=loop)
 
-threading.Thread(target=data_fetcher_loop, daemon=True).start()
+# Last published payload per channel, kept on disk so a restart serves it
+# immediately while live data warms up
+SNAPSHOT_SAVE_INTERVAL = 5.0
+
+def snapshot_path(channel):
+    return os.path.join(LOG_DIR, f"latest_{channel}.json")
+
+def save_snapshot(channel, hub):
+    # Writes the hub's already-encoded snapshot; replaced atomically
+    _, text = hub.snapshot()
+    if text is None:
+        return
+    path = snapshot_path(channel)
+    try:
+        with open(path + ".tmp", "w") as f:
+            f.write(text)
+        os.replace(path + ".tmp", path)
+    except OSError as e:
+        print(f"Could not save {path}: {e}")
+
+def restore_snapshots():
+    global latest_data, latest_nifty_data
+    for channel, hub in (("indices", index_hub), ("nifty50", nifty_hub)):
+        if not os.path.exists(snapshot_path(channel)):
+            continue
+        payload = load_json(snapshot_path(channel), {}).get("data")
+        if not payload:
+            continue
+        if channel == "indices":
+            latest_data = payload
+            hub.publish(payload)
+        else:
+            # Seed the row book so live blocks replace the restored ones one by one
+            for block in payload.get("indices", []):
+                nifty_book.put(block["name"], None, block)
+                restored_stocks.add(block["name"])
+            nifty_book.commit()
+            latest_nifty_data = {"timestamp": payload.get("timestamp"), "summary": nifty_book.summary(), "indices": nifty_book.results()}
+            hub.publish(latest_nifty_data)
+        share_snapshot(channel, hub)
+        print(f"Serving cached {channel} snapshot from {payload.get('timestamp')}")
+
+def share_snapshot(channel, hub):
+    # Publishes the hub's encoded snapshot to the local snapshot file
+    writer = snapshot_writers.get(channel)
+    if writer is None:
+        return
+    _, text = hub.snapshot()
+    try:
+        writer.write(text.encode())
+    except ValueError as e:
+        print(f"Shared snapshot error: {e}")
+
+def publish_indices(results, archive=True, analytics=None):
+    global latest_data
+    if results:
+        latest_data = {
+            "timestamp": ist_now().strftime('%H:%M:%S'),
+            "indices": results,
+            # Whole-chain stats per index, a section of its own next to the
+            # rows. Always present: patches never remove a key, so an empty
+            # section is how clients learn the previous stats are gone.
+            "analytics": analytics or {},
+        }
+        with STAGE_SECONDS.time(loop="indices", stage="publish"):
+            index_hub.publish(latest_data)
+            share_snapshot("indices", index_hub)
+        now = time.time()
+        index_updated_at.update((res["name"], now) for res in results)
+        if archive:
+            index_archive.append(latest_data, vix=current_vix)
+            save_snapshot("indices", index_hub)
 
 # --- 2. MEGA-QUOTE NIFTY 50 LOGIC ---
-mega_cache = {}
-mega_cache_oi = {}
-mega_cache_vol = {}
+quote_store = QuoteStore()
 nifty_meta = {}
 all_instrument_keys = []
 current_vix = 14.0  # Default VIX baseline 14%
+VIX_KEY = "NSE_INDEX|India VIX"
 
-def fetch_india_vix():
-    global current_vix
+# Streaming ingestion: ticks from the market feed land in the mega caches as
+# they arrive and mark their underlying dirty; the quote loop only re-prices
+# dirty stocks. REST polling remains the fallback and the post-reconnect gap fill.
+MARKET_FEED = os.getenv("MARKET_FEED", "upstox")  # upstox | replay | off
+MARKET_FEED_REPLAY_FILE = os.getenv("MARKET_FEED_REPLAY_FILE", "")
+MARKET_FEED_REPLAY_SPEED = float(os.getenv("MARKET_FEED_REPLAY_SPEED", "1"))
+MARKET_FEED_RECORD_FILE = os.getenv("MARKET_FEED_RECORD_FILE", "")
+FEED_BATCH_INTERVAL = 0.25  # seconds of ticks coalesced into one recompute
+# A connected feed silent for this long is treated as down and REST polling
+# takes over until ticks resume
+FEED_STALE_AFTER = float(os.getenv("FEED_STALE_AFTER", "10"))
+FEED_MAX_KEYS = int(os.getenv("FEED_MAX_KEYS", "2000"))  # full-mode keys per connection
+FEED_CONNECTIONS = int(os.getenv("FEED_CONNECTIONS", "2"))
+key_to_stock = {}
+dirty_stocks = set()
+# Option-chain metadata survives restarts; windows are re-fetched per stock
+# when spot drifts toward their edge (checked every META_CHECK_INTERVAL s)
+meta_cache = MetaCache(os.path.join(LOG_DIR, "option_meta.json"))
+META_CHECK_INTERVAL = 60.0
+# Row blocks are memoized on their inputs; days-to-expiry only invalidates
+# them when it crosses one of these buckets (5 minutes).
+DTE_BUCKETS_PER_DAY = 288
+nifty_book = RowBook()
+nifty_dte_bucket = None
+latest_nifty_changes = {}
+market_feed = None
+restored_stocks = set()  # blocks from the snapshot cache, kept until metadata is warm
+
+async def fetch_india_vix():
     while True:
+        await vix_ticker.wait()  # every 15 s in session
         try:
-            url = "https://api.upstox.com/v2/market-quote/quotes?instrument_key=NSE_INDEX|India VIX"
-            r = requests.get(url, headers=HEADERS, timeout=10)
-            data = r.json()
-            if data.get("status") == "success":
-                vix_data = data["data"].get("NSE_INDEX|India VIX", {})
-                current_vix = vix_data.get("last_price", 14.0)
+            data = await upstox.quotes([VIX_KEY])
+            # Response keys use "NSE_INDEX:India VIX"; match on instrument_token instead
+            for vix_data in data.values():
+                if vix_data.get("instrument_token") == VIX_KEY:
+                    apply_quotes({VIX_KEY: {"ltp": vix_data.get("last_price", 14.0)}})
         except Exception as e:
             print(f"Error fetching VIX: {e}")
-        time.sleep(15)  # Update VIX every 15 seconds
 
-threading.Thread(target=fetch_india_vix, daemon=True).start()
-
-def initialize_nifty_meta():
+def register_meta(meta):
+    # Puts one stock's strike window live: its keys are polled/streamed from
+    # the next cycle on and the stock is re-priced
     global all_instrument_keys
-    print("Initializing Nifty 50 Options Metadata...")
-    all_keys_set = set(NIFTY_KEYS.values())
+    stock = meta["stock"]
+    old = nifty_meta.get(stock)
+    if old is not None:
+        for key in old["local_keys"] - meta["local_keys"]:
+            key_to_stock.pop(key, None)
+    nifty_meta[stock] = meta
+    key_to_stock[meta["key"]] = stock
+    for key in meta["local_keys"]:
+        key_to_stock[key] = stock
+    keys = set(NIFTY_KEYS.values())
+    for m in nifty_meta.values():
+        keys.update(m["local_keys"])
+    all_instrument_keys = list(keys)
+    nifty_book.invalidate(stock)
+    dirty_stocks.add(stock)
+
+async def initialize_nifty_meta(refresh=None):
+    # With refresh=None every stock is loaded: from the metadata cache when it
+    # has an entry for the current expiry, from the chain API otherwise. With
+    # a list of stocks only those are re-fetched. Stocks are registered as
+    # they arrive, so the first ones are priced while the rest download.
+    expiry = stock_expiry()
+    if refresh is None:
+        if not meta_cache.loaded:
+            await asyncio.to_thread(meta_cache.load, ist_now().strftime('%Y-%m-%d'))
+        refresh = []
+        for stock, key in NIFTY_KEYS.items():
+            cached = meta_cache.get(stock, expiry)
+            if cached is not None and cached["key"] == key:
+                register_meta(cached)
+            else:
+                refresh.append(stock)
+        print(f"Nifty 50 option metadata: {len(NIFTY_KEYS) - len(refresh)} cached, fetching {len(refresh)}...")
+    else:
+        print(f"Refreshing option metadata for {', '.join(refresh)}...")
+    # At most 5 chain downloads at a time; the scheduler also queues them
+    # behind live quote and index requests
+    meta_sem = asyncio.Semaphore(5)
     
-    def fetch_meta_for_stock(stock_name, stock_key):
-        url = f"https://api.upstox.com/v2/option/chain?instrument_key={stock_key}&expiry_date={EXPIRY_STOCKS}"
+    async def fetch_meta_for_stock(stock_name, stock_key):
         try:
-            r = requests.get(url, headers=HEADERS, timeout=10)
-            data = r.json()
-            if data.get("status") == "success" and data.get("data"):
-                chain = data.get("data")
-                spot = chain[0].get("underlying_spot_price", 0)
-                if spot == 0: return None
-                
-                # Determine interval
-                strikes = sorted(list(set(x["strike_price"] for x in chain)))
-                diffs = {}
-                for i in range(1, len(strikes)):
-                    diff = strikes[i] - strikes[i-1]
-                    if diff > 0: diffs[diff] = diffs.get(diff, 0) + 1
-                interval = max(diffs, key=diffs.get) if diffs else 1
-                
-                atm = round(round(spot / interval) * interval, 2)
-                min_strike = atm - (15 * interval)
-                max_strike = atm + (15 * interval)
-                
-                valid_strikes = []
-                local_keys = set()
-                
-                for row in chain:
-                    stk = row["strike_price"]
-                    if min_strike <= stk <= max_strike:
-                        valid_strikes.append({
-                            "strike": stk,
-                            "ce_key": row.get("call_options", {}).get("instrument_key", ""),
-                            "pe_key": row.get("put_options", {}).get("instrument_key", "")
-                        })
-                        if row.get("call_options", {}).get("instrument_key"):
-                            local_keys.add(row["call_options"]["instrument_key"])
-                        if row.get("put_options", {}).get("instrument_key"):
-                            local_keys.add(row["put_options"]["instrument_key"])
-                
-                return {
-                    "stock": stock_name,
-                    "key": stock_key,
-                    "interval": interval,
-                    "strikes": valid_strikes,
-                    "local_keys": local_keys
-                }
+            async with meta_sem:
+                chain = await upstox.option_chain(stock_key, expiry, priority=PRIORITY_META)
+            if chain and get_spot(chain):
+                return meta_from_chain(stock_name, stock_key, expiry, chain, get_interval(chain))
         except Exception as e:
             print(f"Error fetching meta for {stock_name}: {e}")
         return None
 
-    with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
-        futures = {executor.submit(fetch_meta_for_stock, stock, key): stock for stock, key in NIFTY_KEYS.items()}
-        for f in concurrent.futures.as_completed(futures):
-            res = f.result()
+    fetched = 0
+    with STAGE_SECONDS.time(loop="nifty50", stage="meta"):
+        for result in asyncio.as_completed([fetch_meta_for_stock(stock, NIFTY_KEYS[stock]) for stock in refresh]):
+            res = await result
             if res:
-                nifty_meta[res["stock"]] = res
-                all_keys_set.update(res["local_keys"])
-    
-    all_instrument_keys = list(all_keys_set)
+                register_meta(res)
+                meta_cache.put(res)
+                fetched += 1
+    if fetched:
+        try:
+            await asyncio.to_thread(meta_cache.save)
+        except OSError as e:
+            print(f"Could not save metadata cache: {e}")
+    # Restored blocks of stocks that got no metadata are dropped from here on
+    restored_stocks.clear()
     print(f"Total Cached Option Instrument Keys to track: {len(all_instrument_keys)}")
 
+def stale_meta_stocks():
+    # Stocks with no metadata for the current expiry, or whose spot has moved
+    # near the edge of their strike window
+    expiry = stock_expiry()
+    stocks = list(NIFTY_KEYS)
+    spots = quote_store.gather(quote_store.lookup([NIFTY_KEYS[st] for st in stocks]))["price"].tolist()
+    stale = []
+    for stock, spot in zip(stocks, spots):
+        meta = nifty_meta.get(stock)
+        if meta is None or meta.get("expiry") != expiry or (spot and needs_recenter(meta, spot)):
+            stale.append(stock)
+    return stale
 
-def mega_quote_loop():
-    global mega_cache, latest_nifty_data
-    print("Starting Mega Quote Fetcher for Nifty 50...")
-    last_meta_refresh = 0
+def apply_quotes(updates, as_of=None):
+    # updates: {instrument_key: {"ltp", "close", "oi", "volume"}}, any subset of
+    # fields. Runs on the event loop only (feed ticks are handed over with
+    # call_soon_threadsafe). A REST snapshot passes the time its request
+    # started (as_of) so it never overwrites a tick that streamed in while it
+    # was in flight.
+    global current_vix
+    updates = dict(updates)
+    vix = updates.pop(VIX_KEY, None)
+    changed = quote_store.update(updates, as_of=as_of) if updates else []
+    if vix:
+        vix_ltp = vix.get("ltp") or vix.get("close", 0)
+        if vix_ltp and vix_ltp != current_vix:
+            current_vix = vix_ltp
+            # VIX drives every fair value
+            dirty_stocks.update(nifty_meta.keys())
+    for key in changed:
+        if key in key_to_stock:
+            dirty_stocks.add(key_to_stock[key])
+
+async def poll_mega_quotes():
+    # REST snapshot of every tracked key in 400-key chunks, all in flight at once
+    chunk_size = 400
+    chunks = [all_instrument_keys[i:i + chunk_size] for i in range(0, len(all_instrument_keys), chunk_size)]
     
-    while True:
+    async def fetch_chunk(chunk):
         try:
-            now = time.time()
-            if now - last_meta_refresh > 3600 or not all_instrument_keys:
-                initialize_nifty_meta()
-                last_meta_refresh = now
-                
-            if not all_instrument_keys:
-                time.sleep(10)
-                continue
-                
-            # Chunk keys into batches of 400
-            chunk_size = 400
-            chunks = [all_instrument_keys[i:i + chunk_size] for i in range(0, len(all_instrument_keys), chunk_size)]
-            
-            def fetch_chunk(chunk):
-                url = f"https://api.upstox.com/v2/market-quote/quotes?instrument_key={','.join(chunk)}"
-                try:
-                    r = requests.get(url, headers=HEADERS, timeout=10)
-                    data = r.json()
-                    if data.get("status") == "success":
-                        return data.get("data", {})
-                except Exception as e:
-                    print("Mega Quote Fetch Chunk Error:", e)
-                return {}
-
-            with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
-                futures = [executor.submit(fetch_chunk, ch) for ch in chunks]
-                new_mega_cache = {}
-                new_mega_oi = {}
-                new_mega_vol = {}
-                for f in futures:
-                    res = f.result()
-                    if res:
-                        for details in res.values():
-                            instr_token = details.get("instrument_token", "")
-                            ltp = details.get("last_price", 0)
-                            oi = details.get("open_interest", 0)
-                            vol = details.get("volume", 0)
-                            if ltp == 0:
-                                ltp = details.get("ohlc", {}).get("close", 0)
-                            if instr_token:
-                                new_mega_cache[instr_token] = ltp
-                                new_mega_oi[instr_token] = oi
-                                new_mega_vol[instr_token] = vol
-                
-                if new_mega_cache:
-                    mega_cache.update(new_mega_cache)
-                    mega_cache_oi.update(new_mega_oi)
-                    mega_cache_vol.update(new_mega_vol)
-                    
-                    # Generate the frontend payload
-                    results = []
-                    for stock, meta in nifty_meta.items():
-                        spot = mega_cache.get(meta["key"], 0)
-                        if spot == 0: continue
-                        
-                        interval = meta["interval"]
-                        atm = round(round(spot / interval) * interval, 2)
-                        days_to_expiry = get_days_to_expiry(EXPIRY_STOCKS)
-                        
-                        rows = []
-                        stock_status = "NEUTRAL"
-                        for n in range(1, 7):
-                            ce_strike = atm - n * interval
-                            pe_strike = atm + n * interval
-                            
-                            ce_key = next((s["ce_key"] for s in meta["strikes"] if s["strike"] == ce_strike), "")
-                            pe_key = next((s["pe_key"] for s in meta["strikes"] if s["strike"] == pe_strike), "")
-                            
-                            ce_ltp = mega_cache.get(ce_key, 0)
-                            pe_ltp = mega_cache.get(pe_key, 0)
-                            ce_oi = mega_cache_oi.get(ce_key, 0)
-                            pe_oi = mega_cache_oi.get(pe_key, 0)
-                            ce_vol = mega_cache_vol.get(ce_key, 0)
-                            pe_vol = mega_cache_vol.get(pe_key, 0)
-                            
-                            if ce_ltp == 0 or pe_ltp == 0: break
-                                
-                            ce_iv = max(0, spot - ce_strike) # Intrinsic
-                            pe_iv = max(0, pe_strike - spot) # Intrinsic
-                            
-                            ce_tv = round(ce_ltp - ce_iv, 2)
-                            pe_tv = round(pe_ltp - pe_iv, 2)
-                            dynamic_vol = max(0.05, min(0.35, current_vix / 100.0))
-                            
-                            ce_fv = round(mjd_call_price(spot, ce_strike, days_to_expiry / 365.0, 0.1, dynamic_vol), 2)
-                            pe_fv = round(mjd_put_price(spot, pe_strike, days_to_expiry / 365.0, 0.1, dynamic_vol), 2)
-                            
-                            bs_ce_fv = round(bs_call_price(spot, ce_strike, days_to_expiry / 365.0, 0.1, 0.14), 2)
-                            bs_pe_fv = round(bs_put_price(spot, pe_strike, days_to_expiry / 365.0, 0.1, 0.14), 2)
-                            
-                            cs_ce_fv = round(cs_call_price(spot, ce_strike, days_to_expiry / 365.0, 0.1, dynamic_vol), 2)
-                            cs_pe_fv = round(cs_put_price(spot, pe_strike, days_to_expiry / 365.0, 0.1, dynamic_vol), 2)
-
-                            diff = round(ce_tv - pe_tv, 2)
-                            fv_diff = round(ce_fv - pe_fv, 2)
-                            
-                            tv_bias = "BUY PE" if diff > 0 else "BUY CE" if diff < 0 else ""
-                            fv_bias = "BUY PE" if fv_diff > 0 else "BUY CE" if fv_diff < 0 else ""
-                            
-                            bias = tv_bias
-                            if tv_bias != "" and tv_bias == fv_bias:
-                                bias += " ⭐️"
-                            
-                            if n == 2:
-                                if diff > 0:
-                                    stock_status = "NEGATIVE"
-                                elif diff < 0:
-                                    stock_status = "POSITIVE"
-                                else:
-                                    stock_status = "NEUTRAL"
-                            
-                            rows.append({
-                                "pair": f"{ce_strike} / {pe_strike}",
-                                "ce_strike": ce_strike, "ce_ltp": round(ce_ltp, 2), "ce_fv": ce_fv, "ce_iv": round(ce_iv, 2), "ce_tv": ce_tv, "bs_ce_fv": bs_ce_fv, "cs_ce_fv": cs_ce_fv, "ce_vol": ce_vol, "ce_oi": ce_oi,
-                                "pe_strike": pe_strike, "pe_ltp": round(pe_ltp, 2), "pe_fv": pe_fv, "pe_iv": round(pe_iv, 2), "pe_tv": pe_tv, "bs_pe_fv": bs_pe_fv, "cs_pe_fv": cs_pe_fv, "pe_vol": pe_vol, "pe_oi": pe_oi,
-                                "diff": diff, "fv_diff": fv_diff, "bias": bias, "lot": LOT_SIZES.get(stock, 1)
-                            })
-                            
-                        if rows:
-                            w = nifty_weights.get_weight(stock)
-                            results.append({"name": stock, "weight": w, "status": stock_status, "spot": spot, "expiry": EXPIRY_STOCKS, "lot": LOT_SIZES.get(stock, 1), "rows": rows})
-                    
-                    summary = {"pos_count": 0, "pos_weight": 0.0, "neg_count": 0, "neg_weight": 0.0, "neu_count": 0, "neu_weight": 0.0}
-                    for r in results:
-                        st = r["status"]
-                        w = r["weight"]
-                        if st == "POSITIVE":
-                            summary["pos_count"] += 1; summary["pos_weight"] += w
-                        elif st == "NEGATIVE":
-                            summary["neg_count"] += 1; summary["neg_weight"] += w
-                        else:
-                            summary["neu_count"] += 1; summary["neu_weight"] += w
-                            
-                    summary["pos_weight"] = round(summary["pos_weight"], 2)
-                    summary["neg_weight"] = round(summary["neg_weight"], 2)
-                    summary["neu_weight"] = round(summary["neu_weight"], 2)
-                    
-                    results.sort(key=lambda x: x["weight"], reverse=True)
-                    latest_nifty_data = {
-                        "timestamp": datetime.now(timezone(timedelta(hours=5, minutes=30))).strftime('%H:%M:%S'),
-                        "summary": summary,
-                        "indices": results
-                    }
-                    
-                    # Save Nifty 50 data to disk
-                    log_market_data(latest_nifty_data, "nifty50_chain")
-                    
+            return await upstox.quotes(chunk)
         except Exception as e:
-            print("Mega quote outer exception:", e)
-            
-        time.sleep(5)
+            print("Mega Quote Fetch Chunk Error:", e)
+        return {}
+
+    started = time.time()
+    data = {}
+    for chunk in chunks:
+        CHUNK_KEYS.observe(len(chunk))
+    for res in await asyncio.gather(*(fetch_chunk(chunk) for chunk in chunks)):
+        data.update(res)
+    if data:
+        changed = quote_store.update_from_quotes(data, as_of=started)
+        dirty_stocks.update(key_to_stock[k] for k in changed if k in key_to_stock)
+    return bool(data)
+
+def drop_block(stock):
+    # A restored block stays up until its stock has live quotes
+    if stock not in restored_stocks:
+        nifty_book.remove(stock)
+
+def rebuild_nifty_payload(stocks):
+    # Re-prices the given stocks and republishes latest_nifty_data if any row
+    # block changed. Returns (changed, removed) stock names.
+    global latest_nifty_data, latest_nifty_changes
+    # Resolve the spot and the 6 CE/PE leg keys of every dirty stock, read them
+    # all from the quote store in one gather, then price them in one batch.
+    expiry = stock_expiry()
+    days_to_expiry = get_days_to_expiry(expiry)
+    dte_bucket = int(days_to_expiry * DTE_BUCKETS_PER_DAY)
+    stocks = [st for st in stocks if st in nifty_meta]
+    for stock in set(nifty_book.blocks) - set(nifty_meta) - restored_stocks:
+        nifty_book.remove(stock)
+    spots = quote_store.gather(quote_store.lookup([nifty_meta[st]["key"] for st in stocks]))["price"]
+
+    plans = []
+    leg_keys = []
+    for stock, spot in zip(stocks, spots.tolist()):
+        if spot == 0:
+            drop_block(stock)
+            continue
+        strike_keys = nifty_meta[stock]["strike_keys"]
+        pairs = atm_pairs(spot, nifty_meta[stock]["interval"])
+        for ce_strike, pe_strike in pairs:
+            leg_keys += [strike_keys.get(strike_key(ce_strike), ("", ""))[0],
+                         strike_keys.get(strike_key(pe_strike), ("", ""))[1]]
+        plans.append((stock, spot, pairs))
+
+    quotes = quote_store.gather(quote_store.lookup(leg_keys))
+    price, oi, vol = quotes["price"].tolist(), quotes["oi"].astype(np.int64).tolist(), quotes["volume"].tolist()
+
+    blocks = []
+    for p, (stock, spot, pairs) in enumerate(plans):
+        i = 2 * len(pairs) * p
+        # Everything the block is priced from; skip it while nothing moved
+        j = i + 2 * len(pairs)
+        signature = (spot, tuple(price[i:j]), tuple(oi[i:j]), tuple(vol[i:j]), current_vix, dte_bucket)
+        if nifty_book.is_fresh(stock, signature):
+            continue
+        legs = []
+        for ce_strike, pe_strike in pairs:
+            ce_ltp, pe_ltp = price[i], price[i + 1]
+            if ce_ltp == 0 or pe_ltp == 0: break
+            legs.append({"ce_strike": ce_strike, "ce_ltp": ce_ltp, "ce_vol": vol[i], "ce_oi": oi[i],
+                         "pe_strike": pe_strike, "pe_ltp": pe_ltp, "pe_vol": vol[i + 1], "pe_oi": oi[i + 1]})
+            i += 2
+        if legs:
+            blocks.append({"name": stock, "spot": spot, "days_to_expiry": days_to_expiry, "lot": LOT_SIZES.get(stock, 1), "legs": legs, "signature": signature})
+        else:
+            drop_block(stock)
+
+    for block, rows in zip(blocks, build_pair_rows(blocks)):
+        # Stock status follows the second pair's TV diff
+        stock_status = "NEUTRAL"
+        if len(rows) >= 2:
+            if rows[1]["diff"] > 0:
+                stock_status = "NEGATIVE"
+            elif rows[1]["diff"] < 0:
+                stock_status = "POSITIVE"
+        w = nifty_weights.get_weight(block["name"])
+        restored_stocks.discard(block["name"])
+        nifty_book.put(block["name"], block["signature"], {"name": block["name"], "weight": w, "status": stock_status, "spot": block["spot"], "expiry": expiry, "lot": block["lot"], "rows": rows})
+
+    changed, removed = nifty_book.commit()
+    if changed or removed:
+        latest_nifty_changes = {"version": nifty_book.version, "changed": changed, "removed": removed}
+        latest_nifty_data = {
+            "timestamp": ist_now().strftime('%H:%M:%S'),
+            "summary": nifty_book.summary(),
+            "indices": nifty_book.results()
+        }
+    return changed, removed
+
+def start_market_feed(loop):
+    global market_feed
+    if MARKET_FEED == "off":
+        return None
+    if MARKET_FEED == "replay":
+        from market_feed import ReplayStreamer
+        factory = lambda keys: ReplayStreamer(MARKET_FEED_REPLAY_FILE, keys, speed=MARKET_FEED_REPLAY_SPEED)
+    else:
+        from market_feed import make_upstox_streamer
+        factory = lambda keys: make_upstox_streamer(ACCESS_TOKEN, keys)
+    from market_feed import ShardedFeed
+    # Ticks arrive on the streamers' threads; apply them on the event loop
+    on_ticks = lambda updates: loop.call_soon_threadsafe(apply_quotes, updates)
+    market_feed = ShardedFeed(factory, on_ticks, record_path=MARKET_FEED_RECORD_FILE or None,
+                              max_keys=FEED_MAX_KEYS, max_connections=FEED_CONNECTIONS)
+    return market_feed
+
+def publish_dirty_nifty():
+    # Re-prices the dirty stocks (all of them when days-to-expiry crosses a
+    # bucket) and publishes whatever changed. Returns (changed, removed).
+    global nifty_dte_bucket
+    dte_bucket = int(get_days_to_expiry(stock_expiry()) * DTE_BUCKETS_PER_DAY)
+    if dte_bucket != nifty_dte_bucket:
+        dirty_stocks.update(nifty_meta.keys())
+        nifty_dte_bucket = dte_bucket
+    stocks = set(dirty_stocks)
+    dirty_stocks.clear()
+    with STAGE_SECONDS.time(loop="nifty50", stage="price"):
+        changed, removed = rebuild_nifty_payload(stocks) if stocks else ([], [])
+    if changed or removed:
+        with STAGE_SECONDS.time(loop="nifty50", stage="publish"):
+            nifty_hub.publish(latest_nifty_data, changed, removed)
+            share_snapshot("nifty50", nifty_hub)
+    return changed, removed
+
+async def mega_quote_loop():
+    print("Starting Mega Quote Fetcher for Nifty 50...")
+    last_meta_check = 0
+    last_log = 0
+    last_save = 0
+    feed = None
+    streaming = False
+    meta_task = None
+
+    try:
+        while True:
+            if streaming and market_calendar.phase(time.time()) != CLOSED:
+                await asyncio.sleep(FEED_BATCH_INTERVAL)
+            else:
+                if feed and feed.connected and market_calendar.phase(time.time()) == CLOSED:
+                    feed.stop()  # no socket overnight; ensure_running reconnects at the open
+                await nifty_ticker.wait()
+            started = time.perf_counter()
+            try:
+                await ensure_watchlist()
+                if stock_expiry() is None:
+                    continue
+                now = time.time()
+                # Metadata loads in the background; cycles run on whatever has
+                # arrived so far
+                if meta_task is None:
+                    meta_task = asyncio.create_task(initialize_nifty_meta())
+                    last_meta_check = now
+                elif meta_task.done() and now - last_meta_check >= META_CHECK_INTERVAL:
+                    last_meta_check = now
+                    stale = stale_meta_stocks()
+                    if stale:
+                        meta_task = asyncio.create_task(initialize_nifty_meta(stale))
+
+                if not nifty_meta:
+                    continue
+
+                if feed is None:
+                    try:
+                        feed = start_market_feed(asyncio.get_running_loop())
+                    except Exception as e:
+                        print(f"Market feed unavailable, using REST polling: {e}")
+                        feed = False
+                if feed:
+                    # Underlyings first, so they are the last to be left out
+                    # when the universe outgrows the subscription limit
+                    feed.ensure_running([VIX_KEY] + list(NIFTY_KEYS.values()) + all_instrument_keys)
+
+                was_streaming = streaming
+                # Streaming only while every key is subscribed and ticks keep
+                # arriving; a connected but silent socket falls back to REST
+                streaming = (bool(feed) and feed.connected and not feed.dropped
+                             and time.time() - feed.last_tick < FEED_STALE_AFTER)
+                if was_streaming and feed and feed.connected and time.time() - feed.last_tick >= FEED_STALE_AFTER:
+                    print(f"Market feed silent for {time.time() - feed.last_tick:.0f}s, polling REST")
+                # Poll when the feed is down, and once after every (re)connect to
+                # fill whatever moved while it was disconnected.
+                if not streaming or feed.take_gapfill():
+                    with STAGE_SECONDS.time(loop="nifty50", stage="poll"):
+                        await poll_mega_quotes()
+
+                changed, removed = publish_dirty_nifty()
+                if changed or removed:
+                    # Archive Nifty 50 data at most once per 5 s cycle
+                    if time.time() - last_log >= 5:
+                        nifty_archive.append(latest_nifty_data, vix=current_vix)
+                        last_log = time.time()
+                    if time.time() - last_save >= SNAPSHOT_SAVE_INTERVAL:
+                        save_snapshot("nifty50", nifty_hub)
+                        last_save = time.time()
+
+            except Exception as e:
+                print("Mega quote outer exception:", e)
+                streaming = False
+            finally:
+                observe_cycle("nifty50", time.perf_counter() - started)
+    finally:
+        if meta_task is not None:
+            meta_task.cancel()
+
+# --- 2b. OFFLINE REPLAY ---
+# With MARKET_REPLAY_DIR set, nothing talks to Upstox: archived snapshots are
+# fed back through the quote store and the live row builders and published to
+# the same sockets, at MARKET_REPLAY_SPEED x real time (0 = as fast as possible).
+MARKET_REPLAY_DIR = os.getenv("MARKET_REPLAY_DIR", "")
+MARKET_REPLAY_SPEED = float(os.getenv("MARKET_REPLAY_SPEED", "1"))
+MARKET_REPLAY_FROM = os.getenv("MARKET_REPLAY_FROM")
+MARKET_REPLAY_TO = os.getenv("MARKET_REPLAY_TO")
+
+def replay_step(legs):
+    # The archived pairs are ATM -/+ n intervals, so the first one spans 2 steps
+    return round((legs[0]["pe_strike"] - legs[0]["ce_strike"]) / 2, 2)
+
+def replay_index_entries(blocks):
+    # Index entries (as Watchlist.entries) over replay instrument keys for
+    # the archived blocks, pinned to their recorded expiries, and the quotes
+    # that fill them
+    entries, updates = [], {}
+    for block in blocks:
+        name = block["name"]
+        spot_key = f"REPLAY|{name}"
+        updates[spot_key] = {"ltp": block["spot"]}
+        # ATM is listed too, so the interval is inferred right
+        listed = {strike_key(block["legs"][0]["ce_strike"] + replay_step(block["legs"]))}
+        for leg in block["legs"]:
+            for side in ("ce", "pe"):
+                sk = strike_key(leg[f"{side}_strike"])
+                listed.add(sk)
+                updates[f"REPLAY|{name}|{side.upper()}|{sk}"] = {"ltp": leg[f"{side}_ltp"], "volume": leg[f"{side}_vol"], "oi": leg[f"{side}_oi"]}
+        strikes = [{"strike": sk / 100, "ce_key": f"REPLAY|{name}|CE|{sk}", "pe_key": f"REPLAY|{name}|PE|{sk}"} for sk in sorted(listed)]
+        index_meta.pop(name, None)  # the archived window moves with ATM
+        index = index_of(name) or name
+        entries.append({"name": name, "index": index, "key": spot_key, "expiry": block["expiry"],
+                        "rank": 0 if name == index else 1, "strikes": strikes})
+    return entries, updates
+
+def replay_nifty_quotes(blocks):
+    # Registers replay instrument keys for each stock and returns their quotes
+    updates = {}
+    for block in blocks:
+        stock = block["name"]
+        spot_key = f"REPLAY|{stock}"
+        meta = nifty_meta.get(stock)
+        if meta is None or meta["key"] != spot_key:
+            meta = nifty_meta[stock] = {"stock": stock, "key": spot_key, "interval": replay_step(block["legs"]),
+                                        "strikes": [], "strike_keys": {}, "local_keys": set()}
+            key_to_stock[spot_key] = stock
+        updates[spot_key] = {"ltp": block["spot"]}
+        for leg in block["legs"]:
+            for side in ("ce", "pe"):
+                sk = strike_key(leg[f"{side}_strike"])
+                key = f"REPLAY|{stock}|{side.upper()}|{sk}"
+                if key not in key_to_stock:
+                    key_to_stock[key] = stock
+                    meta["local_keys"].add(key)
+                    meta["strike_keys"][sk] = (f"REPLAY|{stock}|CE|{sk}", f"REPLAY|{stock}|PE|{sk}")
+                updates[key] = {"ltp": leg[f"{side}_ltp"], "volume": leg[f"{side}_vol"], "oi": leg[f"{side}_oi"]}
+    return updates
+
+def replay_snapshot(ts, source, blocks):
+    global clock_override
+    clock_override = ts
+    vix = next((b["vix"] for b in blocks if b["vix"]), None)
+    if vix:
+        apply_quotes({VIX_KEY: {"ltp": vix}})
+    if source == "indices":
+        # Same path as live: quotes into the store, rows from index_blocks
+        entries, updates = replay_index_entries([b for b in blocks if b["legs"]])
+        apply_quotes(updates)
+        publish_indices(index_blocks(entries), archive=False)
+    else:
+        # Price against the recorded expiry, whatever the instrument master says today
+        watchlist.set_expiries(STOCKS, {b["expiry"] for b in blocks if b["expiry"]})
+        apply_quotes(replay_nifty_quotes([b for b in blocks if b["legs"]]))
+        publish_dirty_nifty()
+
+async def replay_loop():
+    from replay import ArchiveReplay
+    replay = ArchiveReplay(MARKET_REPLAY_DIR, start=parse_history_time(MARKET_REPLAY_FROM),
+                           end=parse_history_time(MARKET_REPLAY_TO), speed=MARKET_REPLAY_SPEED)
+    print(f"Replaying {MARKET_REPLAY_DIR} at {MARKET_REPLAY_SPEED or 'max'}x...")
+    started = time.time()
+    try:
+        count = await replay.run(replay_snapshot)
+        print(f"Replay finished: {count} snapshots in {time.time() - started:.1f}s")
+    except Exception as e:
+        print(f"Replay error: {e}")
+
+async def shared_snapshot_loop():
+    # Web role: republish whatever the ingest process last wrote. Each worker
+    # diffs against its own previous payload, so missed intermediate versions
+    # still produce a correct patch.
+    global latest_data, latest_nifty_data
+    print(f"Serving shared snapshots from {SNAPSHOT_SHM}...")
+    hubs = {"indices": index_hub, "nifty50": nifty_hub}
+    for channel in hubs:
+        snapshot_readers[channel] = SnapshotReader(f"{SNAPSHOT_SHM}-{channel}", directory=SNAPSHOT_DIR)
+    while True:
+        for channel, reader in snapshot_readers.items():
+            try:
+                data = reader.read()
+                if data is None:
+                    continue
+                payload = json.loads(data)["data"]
+                if channel == "indices":
+                    latest_data = payload
+                else:
+                    latest_nifty_data = payload
+                hubs[channel].publish(payload)
+            except Exception as e:
+                print(f"Shared snapshot read error on {channel}: {e}")
+        await asyncio.sleep(SNAPSHOT_POLL_INTERVAL)
 
-threading.Thread(target=mega_quote_loop, daemon=True).start()
+background_tasks = []
+
+@app.on_event("startup")
+async def start_background_tasks():
+    # Web workers only read the snapshot files; everything else is built
+    # here, not at import. The last cached snapshots go out before the first
+    # fetch.
+    if SERVER_ROLE == "web":
+        background_tasks.append(asyncio.create_task(shared_snapshot_loop()))
+        return
+    configure()
+    for channel in ("indices", "nifty50"):
+        try:
+            snapshot_writers[channel] = SnapshotWriter(f"{SNAPSHOT_SHM}-{channel}", size=SNAPSHOT_SHM_MB << 20, directory=SNAPSHOT_DIR)
+        except OSError as e:
+            if SERVER_ROLE == "ingest":
+                raise  # the web workers have nothing else to read
+            print(f"Shared snapshot {channel} unavailable: {e}")
+    if MARKET_REPLAY_DIR:
+        background_tasks.append(asyncio.create_task(replay_loop()))
+        return
+    restore_snapshots()
+    await upstox.start()
+    index_archive.start()
+    nifty_archive.start()
+    for loop_fn in (data_fetcher_loop, fetch_india_vix, mega_quote_loop):
+        background_tasks.append(asyncio.create_task(loop_fn()))
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    background_tasks.clear()
+    # Snapshot files stay in place so a restarted ingest process resumes them
+    # and the web workers and local tools keep reading the last payload
+    for writer in snapshot_writers.values():
+        writer.close(unlink=False)
+    snapshot_writers.clear()
+    for reader in snapshot_readers.values():
+        reader.close()
+    snapshot_readers.clear()
+    if SERVER_ROLE == "web":
+        return
+    if not MARKET_REPLAY_DIR:
+        save_snapshot("indices", index_hub)
+        save_snapshot("nifty50", nifty_hub)
+    if market_feed is not None:
+        market_feed.stop()
+    await upstox.close()
+    await asyncio.to_thread(index_archive.close)
+    await asyncio.to_thread(nifty_archive.close)
 
 # --- 3. FASTAPI ENDPOINTS ---
 @app.get("/")
@@ -543,30 +1065,135 @@ async def get_nifty50_html():
     with open("nifty50.html") as f:
         return HTMLResponse(f.read())
 
-@app.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket):
-    await websocket.accept()
-    connected_clients.add(websocket)
+# --- 4. METRICS ---
+DATA_AGE = metrics.registry.gauge("data_age_seconds", "Seconds since each underlying's data last changed")
+WS_CLIENTS = metrics.registry.gauge("ws_clients", "Connected WebSocket clients")
+WS_STATS = metrics.registry.gauge("ws_channel", "Broadcast hub counters and last patch/snapshot size in bytes")
+ARCHIVE_STATS = metrics.registry.gauge("archive", "Archive writer rows/bytes written, dropped payloads and queue depth")
+SCHEDULER_EVENTS = metrics.registry.gauge("upstox_scheduler_events", "Request scheduler counters")
+FEED_STATS = metrics.registry.gauge("market_feed", "Streaming feed state and tick count")
+CADENCE_STATS = metrics.registry.gauge("cadence", "Loop tick interval in seconds and ticks skipped after overruns")
+SHARED_STATS = metrics.registry.gauge("shared_snapshot", "Shared-memory snapshot sequence, size in bytes and torn reads")
+
+@metrics.registry.collector
+def collect_metrics():
+    now = time.time()
+    with DATA_AGE.lock:
+        DATA_AGE.values.clear()  # rebuilt each scrape so dropped stocks and blocks disappear
+    for block in latest_data.get("indices", []):
+        updated = index_updated_at.get(block.get("name"))
+        if updated:
+            DATA_AGE.set(round(now - updated, 3), underlying=block["name"], source="indices")
+    stocks = list(nifty_meta)
+    ts = quote_store.gather(quote_store.lookup([nifty_meta[st]["key"] for st in stocks]))["ts"].tolist()
+    for stock, t in zip(stocks, ts):
+        if t:
+            DATA_AGE.set(round(now - t, 3), underlying=stock, source="nifty50_chain")
+    for channel, hub, clients in (("ws", index_hub, connected_clients), ("ws_nifty", nifty_hub, connected_nifty_clients)):
+        WS_CLIENTS.set(len(clients), channel=channel)
+        WS_STATS.set(hub.published, channel=channel, stat="published")
+        WS_STATS.set(hub.slow_drops, channel=channel, stat="slow_drops")
+        WS_STATS.set(hub.last_bytes, channel=channel, stat="patch_bytes")
+        _, snapshot = hub.snapshot()
+        WS_STATS.set(len(snapshot or ""), channel=channel, stat="snapshot_bytes")
+    for writer in (index_archive, nifty_archive):
+        for stat in ("rows_written", "bytes_written", "dropped"):
+            ARCHIVE_STATS.set(getattr(writer, stat), prefix=writer.prefix, stat=stat)
+        ARCHIVE_STATS.set(writer.queue.qsize(), prefix=writer.prefix, stat="queue_depth")
+    if upstox is not None:
+        for kind, value in upstox.scheduler.counters.items():
+            SCHEDULER_EVENTS.set(value, kind=kind)
+    for ticker in (index_ticker, vix_ticker, nifty_ticker):
+        if ticker.phase is not None:
+            CADENCE_STATS.set(ticker.current_interval(now) or 0, loop=ticker.name, stat="interval")
+        CADENCE_STATS.set(ticker.skipped, loop=ticker.name, stat="skipped")
+    for role, handles in (("writer", snapshot_writers), ("reader", snapshot_readers)):
+        for channel, handle in handles.items():
+            SHARED_STATS.set(handle.seq, channel=channel, role=role, stat="seq")
+            SHARED_STATS.set(handle.bytes, channel=channel, role=role, stat="bytes")
+            if role == "reader":
+                SHARED_STATS.set(handle.torn, channel=channel, role=role, stat="torn")
+    if market_feed is not None:
+        FEED_STATS.set(int(market_feed.connected), stat="connected")
+        FEED_STATS.set(market_feed.tick_count, stat="ticks")
+        FEED_STATS.set(len(market_feed.dropped), stat="dropped")
+
+@app.get("/metrics")
+async def get_metrics():
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/debug/stats")
+async def get_debug_stats():
+    return metrics.registry.stats()
+
+def parse_history_time(value):
+    # Epoch seconds, or an ISO date/time (IST when no offset is given)
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
     try:
-        last_sent = None
+        t = datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Bad time: {value}")
+    if t.tzinfo is None:
+        t = t.replace(tzinfo=IST)
+    return t.timestamp()
+
+@app.get("/history/{underlying}")
+async def get_history(underlying: str, start: str = Query(None, alias="from"), end: str = Query(None, alias="to"),
+                      fields: str = None, source: str = None):
+    # Archived per-strike rows of one underlying as NDJSON, streamed frame by
+    # frame from the columnar archive, e.g.
+    #   /history/RELIANCE?from=2026-03-02T09:15&to=2026-03-02T10:00&fields=diff,bias
+    if source is None:
+        # Index blocks, including dated ones ("NIFTY 50 03NOV"), are archived under indices
+        source = "indices" if index_of(underlying) else "nifty50_chain"
+    if source not in ("indices", "nifty50_chain"):
+        raise HTTPException(status_code=400, detail=f"Unknown source: {source}")
+    field_list = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+    batches = iter_range(LOG_DIR, source, parse_history_time(start), parse_history_time(end), field_list, underlying)
+    try:
+        first = await asyncio.to_thread(next, batches, None)  # surfaces a bad field list as a 400
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    def lines():
+        batch = first
+        while batch is not None:
+            yield "".join(json.dumps(row) + "\n" for row in batch_records(batch))
+            batch = next(batches, None)
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+async def stream_channel(websocket, hub, clients):
+    # Snapshot on connect, then whatever the hub queues for this client. The
+    # handler itself only waits for the disconnect so idle sockets are dropped.
+    await websocket.accept()
+    sub = hub.subscribe()
+    clients.add(websocket)
+
+    async def pump():
         while True:
-            if latest_data and latest_data != last_sent:
-                await websocket.send_json(latest_data)
-                last_sent = latest_data.copy()
-            await asyncio.sleep(0.5)
-    except WebSocketDisconnect:
-        connected_clients.remove(websocket)
+            await websocket.send_text(await sub.queue.get())
+
+    sender = asyncio.create_task(pump())
+    try:
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        sender.cancel()
+        hub.unsubscribe(sub)
+        clients.discard(websocket)
+
+@app.websocket("/ws")
+async def websocket_endpoint(websocket: WebSocket):
+    await stream_channel(websocket, index_hub, connected_clients)
 
 @app.websocket("/ws_nifty")
 async def websocket_nifty_endpoint(websocket: WebSocket):
-    await websocket.accept()
-    connected_nifty_clients.add(websocket)
-    try:
-        last_sent = None
-        while True:
-            if latest_nifty_data and latest_nifty_data != last_sent:
-                await websocket.send_json(latest_nifty_data)
-                last_sent = latest_nifty_data.copy()
-            await asyncio.sleep(0.5)
-    except WebSocketDisconnect:
-        connected_nifty_clients.remove(websocket)
+    await stream_channel(websocket, nifty_hub, connected_nifty_clients)
@@ -0,0 +1,156 @@
+import mmap
+import os
+import struct
+import tempfile
+
+# Latest-snapshot hand-off between local processes through a memory-mapped
+# file, <dir>/<name>.snap (dir is /dev/shm where it exists, so nothing goes
+# to disk). The ingestion process writes each encoded payload; web workers,
+# dump_snapshot.py and any other local reader map the same file and pick up
+# a new payload whenever the sequence number moves. Layout:
+#   [magic][seq: uint64][slot size: uint64][length 0][length 1][slot 0][slot 1]
+# Payloads alternate between the two slots. Write n goes to slot n % 2 with
+# seq odd (2n - 1) while it is copied in and 2n once it is complete, so the
+# last complete payload stays readable while the next one is written. A
+# reader takes slot (seq // 2) % 2 and keeps what it read if seq has not
+# reached the start of the write after next, the first one to reuse that slot.
+
+MAGIC = b"SNP2"
+HEADER = struct.Struct("<4s4xQQQQ")  # magic, seq, slot size, length of slot 0, length of slot 1
+SEQ = struct.Struct("<Q")
+SEQ_OFFSET = 8
+LENGTH_OFFSET = 24
+DEFAULT_SIZE = 8 << 20
+DEFAULT_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+
+def snapshot_path(name, directory=None):
+    return os.path.join(directory or DEFAULT_DIR, f"{name}.snap")
+
+class SnapshotWriter:
+    def __init__(self, name, size=DEFAULT_SIZE, directory=None):
+        self.name = name
+        self.path = snapshot_path(name, directory)
+        self.map = self._open_existing(size) or self._create(size)
+        _, seq, self.capacity, _, _ = HEADER.unpack_from(self.map, 0)
+        self.seq = seq + (seq & 1)  # carry on from where the last writer stopped
+        self.bytes = 0
+
+    def _open_existing(self, size):
+        # Left behind by a previous writer; reused if it is big enough
+        try:
+            with open(self.path, "r+b") as f:
+                m = mmap.mmap(f.fileno(), 0)
+        except (FileNotFoundError, ValueError):
+            return None
+        if len(m) < HEADER.size or HEADER.unpack_from(m, 0)[0] != MAGIC or HEADER.unpack_from(m, 0)[2] < size:
+            m.close()
+            return None
+        return m
+
+    def _create(self, size):
+        # Built under a temporary name and renamed into place, so no reader
+        # maps a half-initialised file; readers of a replaced file re-map
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w+b") as f:
+            f.truncate(HEADER.size + 2 * size)
+            m = mmap.mmap(f.fileno(), 0)
+        HEADER.pack_into(m, 0, MAGIC, 0, size, 0, 0)
+        os.replace(tmp, self.path)
+        return m
+
+    def write(self, data):
+        if len(data) > self.capacity:
+            raise ValueError(f"Snapshot of {len(data)} bytes does not fit {self.name} ({self.capacity} bytes)")
+        slot = (self.seq // 2 + 1) % 2
+        start = HEADER.size + slot * self.capacity
+        m = self.map
+        SEQ.pack_into(m, SEQ_OFFSET, self.seq + 1)
+        m[start:start + len(data)] = data
+        SEQ.pack_into(m, LENGTH_OFFSET + 8 * slot, len(data))
+        self.seq += 2
+        SEQ.pack_into(m, SEQ_OFFSET, self.seq)
+        self.bytes = len(data)
+        return self.seq
+
+    def close(self, unlink=True):
+        # unlink=False leaves the file for readers and the next writer
+        self.map.close()
+        if unlink:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+
+class SnapshotReader:
+    def __init__(self, name, retries=8, directory=None):
+        self.name = name
+        self.path = snapshot_path(name, directory)
+        self.retries = retries
+        self.map = None
+        self.inode = None
+        self.capacity = 0
+        self.seq = 0
+        self.bytes = 0
+        self.torn = 0  # reads abandoned because the writer kept lapping them
+
+    def attach(self):
+        # Maps the file, again if a new writer replaced it. False until it exists.
+        try:
+            inode = os.stat(self.path).st_ino
+        except FileNotFoundError:
+            return False  # writer not up yet
+        if self.map is not None and inode == self.inode:
+            return True
+        self.close()
+        try:
+            with open(self.path, "rb") as f:
+                m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):
+            return False
+        if len(m) < HEADER.size or HEADER.unpack_from(m, 0)[0] != MAGIC:
+            m.close()
+            return False
+        self.map, self.inode, self.capacity = m, inode, HEADER.unpack_from(m, 0)[2]
+        self.seq = 0
+        return True
+
+    def view(self):
+        # (seq, memoryview of the newest complete payload) straight from the
+        # mapping, or (seq, None) before the first write. The caller checks
+        # valid(seq) once done with the view and releases it.
+        seq = SEQ.unpack_from(self.map, SEQ_OFFSET)[0]
+        n = seq // 2
+        if n == 0:
+            return seq, None
+        slot = n % 2
+        length = SEQ.unpack_from(self.map, LENGTH_OFFSET + 8 * slot)[0]
+        start = HEADER.size + slot * self.capacity
+        return seq, memoryview(self.map)[start:start + length]
+
+    def valid(self, seq):
+        # True while the writer has not started reusing the slot seq pointed at
+        return SEQ.unpack_from(self.map, SEQ_OFFSET)[0] - (seq - (seq & 1)) <= 2
+
+    def read(self):
+        # The newest payload as bytes, or None when nothing new was published
+        if not self.attach():
+            return None
+        for _ in range(self.retries):
+            seq, view = self.view()
+            if view is None or seq // 2 == self.seq // 2:
+                if view is not None:
+                    view.release()
+                return None
+            with view:
+                data = bytes(view)
+            if self.valid(seq):
+                self.seq = seq - (seq & 1)
+                self.bytes = len(data)
+                return data
+        self.torn += 1
+        return None
+
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+            self.map = None
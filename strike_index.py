@@ -0,0 +1,24 @@
+# Strike lookups keyed on integer paise (strike * 100) instead of raw floats,
+# so odd intervals like 2.5 or 12.5 never miss on float representation and
+# every ATM-relative leg is a single dict hit.
+
+def strike_key(strike):
+    return int(round(strike * 100))
+
+def atm_pairs(spot, interval, count=6):
+    # The (ce_strike, pe_strike) pairs n = 1..count intervals below/above ATM,
+    # as clean floats (905.0, 1002.5) rather than accumulated float error.
+    step = strike_key(interval)
+    atm = strike_key(round(spot / interval) * interval)
+    return [((atm - n * step) / 100, (atm + n * step) / 100) for n in range(1, count + 1)]
+
+def strike_interval(strikes, spot, count=20):
+    # Most common gap between the count listed strikes nearest spot; far
+    # strikes are often listed at wider intervals than those around ATM
+    near = sorted(sorted(strikes, key=lambda k: abs(k - spot))[:count])
+    gaps = {}
+    for lo, hi in zip(near, near[1:]):
+        gap = strike_key(hi - lo)
+        if gap > 0:
+            gaps[gap] = gaps.get(gap, 0) + 1
+    return max(gaps, key=gaps.get) / 100 if gaps else 1
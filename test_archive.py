@@ -0,0 +1,109 @@
+# Checks for the columnar market-data archive.
+import glob
+import os
+import shutil
+import tempfile
+import numpy as np
+from archive import ArchiveWriter, flatten_payload, read_range, iter_frames, iter_range, segment_day, segment_index
+
+def payload(spot, impv=12.5):
+    rows = [{"pair": f"{k} / {k + 10}", "ce_strike": k, "ce_ltp": 5.0, "ce_vol": 10, "ce_oi": 100, "ce_impv": impv,
+             "pe_strike": k + 10, "pe_ltp": 6.0, "pe_vol": 11, "pe_oi": 101, "pe_impv": None,
+             "diff": -1.0, "fv_diff": 0.5, "bias": "BUY CE ⭐️", "lot": 75} for k in (100.0, 110.0)]
+    return {"timestamp": "09:15:00", "indices": [{"name": "NIFTY 50", "spot": spot, "expiry": "2026-03-30", "lot": 75, "rows": rows}]}
+
+def test_roundtrip_range_and_fields():
+    with tempfile.TemporaryDirectory() as root:
+        w = ArchiveWriter(root, "indices").start()
+        base = 1_770_000_000.0
+        for i in range(10):
+            w.append(payload(1000.0 + i), ts=base + i)
+        w.close()
+        assert w.rows_written == 20
+        cols = read_range(root, "indices")
+        assert len(cols["ts"]) == 20
+        assert cols["underlying"][0] == "NIFTY 50" and cols["bias"][0] == "BUY CE ⭐️"
+        assert cols["ce_impv"][0] == 12.5 and np.isnan(cols["pe_impv"][0])
+        assert list(cols["pair_index"][:2]) == [0, 1]
+        part = read_range(root, "indices", start=base + 3, end=base + 4, fields=["spot"])
+        assert sorted(part) == ["spot", "ts"]
+        assert list(part["spot"]) == [1003.0, 1003.0, 1004.0, 1004.0]
+
+def test_rotates_by_size_and_day():
+    with tempfile.TemporaryDirectory() as root:
+        w = ArchiveWriter(root, "nifty50_chain", max_bytes=1, flush_rows=1).start()
+        day1 = 1_770_000_000.0
+        w.append(payload(1.0), ts=day1)
+        w.append(payload(2.0), ts=day1 + 1)
+        w.append(payload(3.0), ts=day1 + 86400)
+        w.close()
+        names = sorted(os.path.basename(p) for p in glob.glob(os.path.join(root, "*.mda")))
+        d1, d2 = segment_day(day1), segment_day(day1 + 86400)
+        assert names == [f"nifty50_chain_{d1}_000.mda", f"nifty50_chain_{d1}_001.mda", f"nifty50_chain_{d2}_000.mda"]
+        assert list(read_range(root, "nifty50_chain", start=day1 + 86000)["spot"]) == [3.0, 3.0]
+
+def test_torn_tail_is_ignored():
+    with tempfile.TemporaryDirectory() as root:
+        w = ArchiveWriter(root, "indices").start()
+        w.append(payload(1.0), ts=1_770_000_000.0)
+        w.close()
+        path = glob.glob(os.path.join(root, "*.mda"))[0]
+        with open(path, "ab") as f:
+            f.write(b"MDA1\xff\xff\x00\x00partial")
+        assert len(list(iter_frames(path))) == 1
+        assert len(read_range(root, "indices")["ts"]) == 2
+
+def two_stock_payload(spot):
+    p = payload(spot)
+    p["indices"].append(dict(p["indices"][0], name="SENSEX", spot=spot * 2))
+    return p
+
+def test_index_seeks_one_underlying():
+    with tempfile.TemporaryDirectory() as root:
+        w = ArchiveWriter(root, "indices", flush_rows=4).start()
+        base = 1_770_000_000.0
+        for i in range(6):
+            w.append(two_stock_payload(100.0 + i), ts=base + i)
+        w.close()
+        path = glob.glob(os.path.join(root, "*.mda"))[0]
+        entries = segment_index(path)
+        assert len(entries) == 12 and {e["underlying"] for e in entries} == {"NIFTY 50", "SENSEX"}
+        batches = list(iter_range(root, "indices", start=base + 2, end=base + 3, fields=["spot"], underlying="SENSEX"))
+        assert len(batches) == 2  # only the two SENSEX frames in the window are read
+        assert [list(b["spot"]) for b in batches] == [[204.0, 204.0], [206.0, 206.0]]
+        # Without the sidecar the index is rebuilt from the frames
+        os.remove(path + ".idx")
+        assert [(e["offset"], e["underlying"], e["rows"]) for e in segment_index(path)] == \
+               [(e["offset"], e["underlying"], e["rows"]) for e in entries]
+
+def test_recovers_when_segment_dir_vanishes():
+    with tempfile.TemporaryDirectory() as tmp:
+        root = os.path.join(tmp, "archive")
+        w = ArchiveWriter(root, "indices")
+        ts = 1_770_000_000.0
+        day = segment_day(ts)
+        os.makedirs(root)
+        w._write(day, flatten_payload(payload(1.0), ts))
+        shutil.rmtree(root)
+        w._write(day, flatten_payload(payload(2.0), ts + 1))
+        assert list(read_range(root, "indices")["spot"]) == [2.0, 2.0]
+        blocker = w.segment[1] + ".idx"
+        os.rename(blocker, blocker + ".bak")
+        os.mkdir(blocker)
+        try:
+            w._write(day, flatten_payload(payload(3.0), ts + 2))
+            assert False, "expected the index open to fail"
+        except OSError:
+            assert w.segment is None
+        os.rmdir(blocker)
+        os.rename(blocker + ".bak", blocker)
+        w._write(day, flatten_payload(payload(4.0), ts + 3))
+        assert list(read_range(root, "indices")["spot"]) == [2.0, 2.0, 4.0, 4.0]
+
+if __name__ == "__main__":
+    test_roundtrip_range_and_fields()
+    test_rotates_by_size_and_day()
+    test_torn_tail_is_ignored()
+    test_index_seeks_one_underlying()
+    test_recovers_when_segment_dir_vanishes()
+    print("archive tests passed")
@@ -0,0 +1,28 @@
+# Checks for the benchmark harness (not the numbers themselves).
+import json
+import os
+import tempfile
+from benchmarks import compare, main
+
+def test_compare_flags_slowdowns_only():
+    results = {"a": {"median": 1.3}, "b": {"median": 0.5}, "c": {"median": 9.0}}
+    baseline = {"a": {"median": 1.0}, "b": {"median": 1.0}}
+    assert compare(results, baseline, 0.25) == {"a": 1.3}
+    assert results["b"]["vs_baseline"] == 0.5 and "vs_baseline" not in results["c"]
+
+def test_run_writes_json_and_checks_baseline():
+    with tempfile.TemporaryDirectory() as root:
+        out, base = os.path.join(root, "out.json"), os.path.join(root, "base.json")
+        assert main(["--only", "pricing.bs_call_price", "--out", out, "--baseline", base, "--save-baseline", base]) == 0
+        report = json.load(open(out))
+        assert list(report["results"]) == ["pricing.bs_call_price"] and report["results"]["pricing.bs_call_price"]["median"] > 0
+        saved = json.load(open(base))
+        saved["results"]["pricing.bs_call_price"]["median"] /= 100  # pretend it used to be 100x faster
+        json.dump(saved, open(base, "w"))
+        assert main(["--only", "pricing.bs_call_price", "--out", out, "--baseline", base]) == 1
+        assert "pricing.bs_call_price" in json.load(open(out))["regressions"]
+
+if __name__ == "__main__":
+    test_compare_flags_slowdowns_only()
+    test_run_writes_json_and_checks_baseline()
+    print("benchmark harness tests passed")
@@ -0,0 +1,79 @@
+# Checks for the serialize-once broadcast hub.
+import asyncio
+import json
+from broadcast import BroadcastHub
+
+def payload(v):
+    return {"timestamp": str(v), "indices": [{"name": "A", "v": v}]}
+
+async def drain(sub):
+    out = []
+    while not sub.queue.empty():
+        out.append(json.loads(sub.queue.get_nowait()))
+    return out
+
+def test_fanout_shares_one_encoding():
+    async def run():
+        hub = BroadcastHub()
+        hub.publish(payload(0))
+        subs = [hub.subscribe() for _ in range(3)]
+        hub.publish(payload(1))
+        await asyncio.sleep(0)
+        texts = []
+        for sub in subs:
+            texts.append(sub.queue.get_nowait())  # snapshot
+            texts.append(sub.queue.get_nowait())  # patch
+        assert texts[1] is texts[3] is texts[5]
+        assert json.loads(texts[1])["seq"] == 2
+        assert hub.published == 1
+    asyncio.run(run())
+
+def test_early_subscriber_gets_first_payload():
+    async def run():
+        hub = BroadcastHub()
+        sub = hub.subscribe()
+        hub.publish(payload(0))
+        await asyncio.sleep(0)
+        hub.publish(payload(1))
+        await asyncio.sleep(0)
+        messages = await drain(sub)
+        assert [m["type"] for m in messages] == ["snapshot", "patch"]
+        assert messages[0]["data"] == payload(0) and messages[1]["base"] == 1
+    asyncio.run(run())
+
+def test_slow_consumer_is_resynced_with_snapshot():
+    async def run():
+        hub = BroadcastHub(queue_size=2)
+        hub.publish(payload(0))
+        slow = hub.subscribe()
+        for v in range(1, 6):
+            hub.publish(payload(v))
+        await asyncio.sleep(0)
+        messages = await drain(slow)
+        assert messages[0]["type"] == "snapshot"
+        # Everything it still has queued applies cleanly on top of each other
+        seq = messages[0]["seq"]
+        for m in messages[1:]:
+            assert m["type"] == "patch" and m["base"] == seq
+            seq = m["seq"]
+        assert seq == hub.channel.seq
+        assert slow.dropped >= 1
+    asyncio.run(run())
+
+def test_patch_already_in_snapshot_is_skipped():
+    async def run():
+        hub = BroadcastHub()
+        hub.publish(payload(0))
+        hub.subscribe()  # binds the loop
+        hub.publish(payload(1))  # fan-out still pending on the loop
+        late = hub.subscribe()   # its snapshot already contains seq 2
+        await asyncio.sleep(0)
+        messages = await drain(late)
+        assert [(m["type"], m["seq"]) for m in messages] == [("snapshot", 2)]
+    asyncio.run(run())
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_"):
+            fn()
+            print("OK", name)
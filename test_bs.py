@@ -1,4 +1,5 @@
-from server import bs_call_price, get_days_to_expiry
+from pricing import bs_call_price
+from server import get_days_to_expiry
 spot = 82392.61
 strike = 82300
 days = get_days_to_expiry("2026-02-26")
@@ -0,0 +1,85 @@
+# Checks for the session-aware fetch cadence.
+import asyncio
+import os
+from datetime import datetime
+from cadence import CLOSED, OPEN, POST_CLOSE, PRE_OPEN, IST, MarketCalendar, Ticker, load_holidays
+
+def at(text):
+    return datetime.strptime(text, "%Y-%m-%d %H:%M").replace(tzinfo=IST).timestamp()
+
+class FakeClock:
+    def __init__(self, now):
+        self.now = now
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.sleeps.append(round(seconds, 3))
+        self.now += seconds
+
+def test_phases_weekends_and_holidays():
+    cal = MarketCalendar({"2026-10-02"})
+    assert cal.phase(at("2026-10-19 08:59")) == CLOSED
+    assert cal.phase(at("2026-10-19 09:05")) == PRE_OPEN
+    assert cal.phase(at("2026-10-19 12:00")) == OPEN
+    assert cal.phase(at("2026-10-19 15:45")) == POST_CLOSE
+    assert cal.phase(at("2026-10-19 16:00")) == CLOSED
+    assert cal.phase(at("2026-10-18 12:00")) == CLOSED  # Sunday
+    assert cal.phase(at("2026-10-02 12:00")) == CLOSED  # holiday
+    assert MarketCalendar(always_open=True).phase(at("2026-10-18 03:00")) == OPEN
+    # Friday evening before a Monday holiday -> Tuesday pre-open
+    cal.holidays.add("2026-10-26")
+    assert cal.next_open(at("2026-10-23 16:30")) == at("2026-10-27 09:00")
+    assert cal.next_open(at("2026-10-19 08:00")) == at("2026-10-19 09:00")
+
+def test_shipped_holiday_calendar():
+    holidays = load_holidays(os.path.join(os.path.dirname(os.path.abspath(__file__)), "market_holidays.json"), 2026)
+    cal = MarketCalendar(holidays)
+    assert len(holidays) == 15
+    for day in ("2026-03-03", "2026-04-03", "2026-10-20", "2026-11-10"):  # Holi, Good Friday, Dussehra, Diwali
+        assert not cal.is_trading_day(datetime.strptime(day, "%Y-%m-%d")), day
+
+def test_fixed_rate_ticks_skip_overruns():
+    clock = FakeClock(at("2026-10-19 10:00"))
+    ticker = Ticker("t", 5, MarketCalendar(), clock=clock, sleep=clock.sleep)
+    async def run():
+        await ticker.wait()  # first tick is immediate
+        clock.now += 1.5  # cycle work
+        await ticker.wait()
+        clock.now += 12  # overran two ticks
+        await ticker.wait()
+    asyncio.run(run())
+    assert clock.sleeps == [3.5, 0] and ticker.skipped == 2
+
+def test_faster_on_expiry_day_and_high_vix():
+    ts = at("2026-10-20 10:00")
+    vix = [12.0]
+    ticker = Ticker("t", 5, MarketCalendar(), expiries=lambda: {"2026-10-27"}, vix=lambda: vix[0])
+    ticker.phase = OPEN
+    assert ticker.current_interval(ts) == 5
+    vix[0] = 25.0
+    assert ticker.current_interval(ts) == 2.5
+    ticker.expiries = lambda: {"2026-10-20"}
+    ticker.phase = PRE_OPEN
+    assert ticker.current_interval(ts) == 7.5
+    ticker.phase = CLOSED
+    assert ticker.current_interval(ts) is None
+
+def test_one_snapshot_after_close_then_sleep_until_open():
+    clock = FakeClock(at("2026-10-23 16:10"))  # Friday after the close
+    ticker = Ticker("t", 5, MarketCalendar(), clock=clock, sleep=clock.sleep)
+    asyncio.run(ticker.wait())
+    assert clock.sleeps == []  # EOD snapshot runs right away
+    asyncio.run(ticker.wait())
+    assert clock.now == at("2026-10-26 09:00") and len(clock.sleeps) == 1
+    assert ticker.phase == PRE_OPEN and not ticker.eod_done
+
+if __name__ == "__main__":
+    test_phases_weekends_and_holidays()
+    test_shipped_holiday_calendar()
+    test_fixed_rate_ticks_skip_overruns()
+    test_faster_on_expiry_day_and_high_vix()
+    test_one_snapshot_after_close_then_sleep_until_open()
+    print("cadence tests passed")
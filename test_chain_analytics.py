@@ -0,0 +1,48 @@
+# Checks for the whole-chain index analytics.
+import numpy as np
+import chain_analytics
+from chain_analytics import analyze_chain, max_pain
+from pricing import bs_price_vec
+
+def chain(spot, strikes, T, sigma, ce_oi, pe_oi, prev=None):
+    rows = []
+    for i, k in enumerate(strikes):
+        ce = float(bs_price_vec(spot, k, T, 0.1, sigma, True))
+        pe = float(bs_price_vec(spot, k, T, 0.1, sigma, False))
+        rows.append({"strike_price": float(k), "underlying_spot_price": spot,
+                     "call_options": {"market_data": {"ltp": round(ce, 2), "oi": ce_oi[i], "volume": 10, "prev_oi": (prev or ce_oi)[i]}},
+                     "put_options": {"market_data": {"ltp": round(pe, 2), "oi": pe_oi[i], "volume": 30}}})
+    return rows[::-1]  # the API does not promise any order
+
+def test_max_pain():
+    strikes = np.array([90.0, 100.0, 110.0])
+    # Heavy call OI at 100 and put OI at 110: settling at 100 pays the least
+    assert max_pain(strikes, np.array([0, 500, 0.0]), np.array([0, 0, 100.0])) == 100.0
+    assert max_pain(strikes, np.array([0, 0, 0.0]), np.array([0, 0, 900.0])) == 110.0
+
+def test_analyze_chain():
+    strikes = list(range(24000, 27050, 50))
+    n = len(strikes)
+    ce_oi, pe_oi = [1000] * n, [1500] * n
+    prev = list(ce_oi)
+    prev[strikes.index(25600)] = 400  # +600 calls written at 25600
+    stats = analyze_chain(chain(25482.5, strikes, 7 / 365, 0.13, ce_oi, pe_oi, prev), 25482.5, 7 / 365, 0.2)
+    assert stats["atm"] == 25500.0 and stats["strikes_listed"] == n
+    assert stats["pcr"] == 1.5 and stats["pcr_volume"] == 3.0
+    assert stats["top_oi_change"] == [{"strike": 25600.0, "side": "CE", "oi": 1000, "change": 600}]
+    assert abs(stats["atm_iv"] - 13.0) < 0.2
+    profile = stats["profile"]
+    assert len(profile) == 2 * chain_analytics.PROFILE_STRIKES + 1
+    assert [p["strike"] for p in profile] == sorted(p["strike"] for p in profile)
+    atm = profile[chain_analytics.PROFILE_STRIKES]
+    assert atm["strike"] == 25500.0 and atm["pe_oi_chg"] == 0
+    assert abs(atm["ce_delta"] - atm["pe_delta"] - 1) < 1e-3  # parity
+    # Minutes from expiry the IV is not solved and the fallback vol is used
+    rows = chain(25482.5, strikes, 7 / 365, 0.13, ce_oi, pe_oi)
+    assert analyze_chain(rows, 25482.5, 1e-5, 0.2)["atm_iv"] is None
+    assert analyze_chain([], 25482.5, 7 / 365, 0.2) is None
+
+if __name__ == "__main__":
+    test_max_pain()
+    test_analyze_chain()
+    print("chain analytics tests passed")
@@ -0,0 +1,102 @@
+# Checks for raw HTTP capture and the fake Upstox server that serves it.
+import asyncio
+import gzip
+import json
+import os
+import tempfile
+import httpx
+from fake_upstox import CaptureStore, create_app
+from http_capture import HttpCapture, read_captures
+from instruments import InstrumentMaster
+from rate_limit import RequestScheduler
+from upstox_api import UpstoxAPI
+
+CHAIN = [{"strike_price": 100.0, "underlying_spot_price": 101.0}]
+
+def upstream(request):
+    if request.url.path == "/v2/option/chain":
+        return httpx.Response(200, json={"status": "success", "data": CHAIN})
+    keys = request.url.params["instrument_key"].split(",")
+    return httpx.Response(200, json={"status": "success", "data": {
+        k.replace("|", ":"): {"instrument_token": k, "last_price": float(len(k))} for k in keys}})
+
+async def capture(path):
+    api = UpstoxAPI("token", transport=httpx.MockTransport(upstream), capture=HttpCapture(path))
+    await api.start()
+    await api.option_chain("NSE_EQ|X", "2026-03-30")
+    await api.quotes(["NSE_EQ|A", "NSE_EQ|BB"])
+    await api.quotes(["NSE_INDEX|India VIX"])
+    await api.close()
+
+def test_capture_records_raw_responses():
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, "cap.jsonl.gz")
+        asyncio.run(capture(path))
+        with open(path, "ab") as f:
+            f.write(gzip.compress(b'{"torn": ')[:-4])
+        records = list(read_captures(path))
+        assert [r["path"] for r in records] == ["/v2/option/chain", "/v2/market-quote/quotes", "/v2/market-quote/quotes"]
+        assert records[0]["params"] == {"instrument_key": "NSE_EQ|X", "expiry_date": "2026-03-30"}
+        assert json.loads(records[0]["body"])["data"] == CHAIN and records[0]["status"] == 200
+
+def test_fake_server_answers_any_chunking():
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, "cap.jsonl.gz")
+        asyncio.run(capture(path))
+        app = create_app(CaptureStore(read_captures(path)), speed=0)
+
+        async def run():
+            api = UpstoxAPI("token", transport=httpx.ASGITransport(app=app))
+            await api.start()
+            chain = await api.option_chain("NSE_EQ|X", "2026-03-30")
+            quotes = await api.quotes(["NSE_EQ|BB", "NSE_INDEX|India VIX", "NSE_EQ|missing"])
+            await api.close()
+            return chain, quotes
+        chain, quotes = asyncio.run(run())
+        assert chain == CHAIN
+        assert sorted(quotes) == ["NSE_EQ:BB", "NSE_INDEX:India VIX"]
+        assert quotes["NSE_EQ:BB"]["last_price"] == 9.0
+
+def test_fake_server_lists_contracts_from_chains():
+    chain = [{"strike_price": k, "call_options": {"instrument_key": f"NSE_FO|{k}CE"}, "put_options": {"instrument_key": f"NSE_FO|{k}PE"}}
+             for k in (1410.0, 1400.0)]
+    store = CaptureStore([{"ts": 0.0, "path": "/v2/option/chain", "status": 200,
+                           "params": {"instrument_key": "NSE_EQ|R", "expiry_date": "2026-10-27"},
+                           "body": json.dumps({"status": "success", "data": chain})}])
+    app = create_app(store, speed=0)
+
+    async def run():
+        api = UpstoxAPI("token", transport=httpx.ASGITransport(app=app))
+        await api.start()
+        contracts = await api.option_contracts("NSE_EQ|R")
+        await api.close()
+        return contracts
+    contracts = asyncio.run(run())
+    assert len(contracts) == 4 and {c["segment"] for c in contracts} == {"NSE_FO"}
+    # Enough for the watchlist to stand in for the instrument master
+    master = InstrumentMaster.from_contracts([("RELIANCE", "OPTSTK", contracts)])
+    assert master.expiries("RELIANCE", "NSE_FO", "OPTSTK") == ["2026-10-27"]
+    assert master.options("RELIANCE", "NSE_FO")["2026-10-27"][0] == {"strike": 1400.0, "ce_key": "NSE_FO|1400.0CE",
+                                                                    "pe_key": "NSE_FO|1400.0PE"}
+
+def test_fake_server_injects_errors():
+    app = create_app(CaptureStore(), error_rate=1.0, error_status=429, seed=1)
+
+    async def run():
+        sched = RequestScheduler(retries=2, backoff=0.001)
+        api = UpstoxAPI("token", transport=httpx.ASGITransport(app=app), scheduler=sched)
+        await api.start()
+        data = await api.quotes(["NSE_EQ|A"])
+        await api.close()
+        return data, sched.counters
+    data, counters = asyncio.run(run())
+    assert data == {}
+    assert counters["throttled"] == 3 and counters["failed"] == 1
+    assert app.state.errors == 3
+
+if __name__ == "__main__":
+    test_capture_records_raw_responses()
+    test_fake_server_answers_any_chunking()
+    test_fake_server_lists_contracts_from_chains()
+    test_fake_server_injects_errors()
+    print("http capture tests passed")
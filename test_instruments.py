@@ -0,0 +1,57 @@
+# Checks for the indexed instrument-master loader.
+import os
+import tempfile
+from conftest import write_master_rows
+from instruments import InstrumentMaster
+
+def write_master(path, lot=500):
+    rows = [["NSE_EQ|INE002A01018", "2885", "RELIANCE", "RELIANCE INDUSTRIES LTD", "1400", "", "", "0.05", "1", "EQ", "", "NSE_EQ"],
+            ["NSE_EQ|INE155A01022", "3456", "TMPV", "TATA MOTORS PASS VEH LTD", "680", "", "", "0.05", "1", "EQ", "", "NSE_EQ"],
+            ["BSE_EQ|INE002A01018", "500325", "RELIANCE", "RELIANCE INDUSTRIES LTD", "1400", "", "", "0.05", "1", "A", "", "BSE_EQ"]]
+    # Listed out of order, as the file does not promise any
+    for expiry, size in (("2026-11-24", lot + 50), ("2026-10-27", lot)):
+        for strike in (1420, 1400, 1410):
+            for side in ("PE", "CE"):
+                rows.append([f"NSE_FO|R{expiry[5:7]}{strike}{side}", "1", f"RELIANCE26{expiry[5:7]}{strike}{side}",
+                             "RELIANCE", "0", expiry, str(strike), "0.05", str(size), "OPTSTK", side, "NSE_FO"])
+    rows.append(["NSE_FO|RFUT", "1", "RELIANCE26OCTFUT", "RELIANCE", "0", "2026-10-27", "", "0.1", str(lot), "FUTSTK", "", "NSE_FO"])
+    write_master_rows(path, rows)
+
+def test_lookups():
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, "complete.csv.gz")
+        write_master(path)
+        master = InstrumentMaster.load(path)
+    assert len(master) == 16
+    assert master.instrument_key("RELIANCE") == "NSE_EQ|INE002A01018"
+    assert master.instrument_key("RELIANCE", "BSE_EQ", "A") == "BSE_EQ|INE002A01018"
+    assert master.instrument_key("TATAMOTORS") is None
+    assert sorted(master.symbols("NSE_EQ", "EQ")) == ["RELIANCE", "TMPV"]
+    assert master.expiries("RELIANCE", "NSE_FO", "OPTSTK") == ["2026-10-27", "2026-11-24"]
+    assert master.lot_size("RELIANCE", "NSE_FO", "OPTSTK") == 500
+    options = master.options("RELIANCE", "NSE_FO")
+    assert [s["strike"] for s in options["2026-10-27"]] == [1400.0, 1410.0, 1420.0]
+    assert options["2026-10-27"][0] == {"strike": 1400.0, "ce_key": "NSE_FO|R101400CE", "pe_key": "NSE_FO|R101400PE"}
+
+def test_binary_cache_follows_the_source():
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, "complete.csv.gz")
+        write_master(path)
+        InstrumentMaster.load(path)
+        assert os.path.exists(path + ".npz")
+        parse = InstrumentMaster.__dict__["parse"]
+        InstrumentMaster.parse = None  # the unchanged CSV must not be parsed again
+        try:
+            assert InstrumentMaster.load(path).lot_size("RELIANCE", "NSE_FO", "OPTSTK") == 500
+        finally:
+            InstrumentMaster.parse = parse
+        # A new download (different size or mtime) is parsed and re-cached
+        stamp = os.stat(path).st_mtime_ns
+        write_master(path, lot=250)
+        os.utime(path, ns=(stamp + 10**9, stamp + 10**9))
+        assert InstrumentMaster.load(path).lot_size("RELIANCE", "NSE_FO", "OPTSTK") == 250
+
+if __name__ == "__main__":
+    test_lookups()
+    test_binary_cache_follows_the_source()
+    print("instrument master tests passed")
@@ -0,0 +1,110 @@
+# Offline checks for the streaming ingestion pipeline, driven by ReplayStreamer.
+import json
+import os
+import tempfile
+import time
+from market_feed import MarketFeed, ReplayStreamer, ShardedFeed, parse_feed_message
+
+CE_KEY = "NSE_FO|12345"
+SPOT_KEY = "NSE_EQ|INE040A01034"
+VIX_KEY = "NSE_INDEX|India VIX"
+
+def full_tick(key, ltp, oi, vtt):
+    return {key: {"fullFeed": {"marketFF": {"ltpc": {"ltp": ltp, "cp": ltp - 1}, "oi": oi, "vtt": str(vtt)}}}}
+
+def write_replay(records):
+    fd, path = tempfile.mkstemp(suffix=".jsonl")
+    with os.fdopen(fd, "w") as f:
+        for ts, feeds in records:
+            f.write(json.dumps({"ts": ts, "message": {"type": "live_feed", "feeds": feeds}}) + "\n")
+    return path
+
+def test_parse_feed_message_modes():
+    message = {"feeds": {}}
+    message["feeds"].update(full_tick(CE_KEY, 24.25, 1500.0, 98000))
+    message["feeds"][VIX_KEY] = {"fullFeed": {"indexFF": {"ltpc": {"ltp": 13.61, "cp": 13.2}}}}
+    message["feeds"][SPOT_KEY] = {"ltpc": {"ltp": 907.6, "cp": 900.0}}
+    updates = parse_feed_message(message)
+    assert updates[CE_KEY] == {"ltp": 24.25, "close": 23.25, "oi": 1500.0, "volume": 98000}
+    assert updates[VIX_KEY] == {"ltp": 13.61, "close": 13.2}
+    assert updates[SPOT_KEY] == {"ltp": 907.6, "close": 900.0}
+    assert parse_feed_message({"type": "market_info"}) == {}
+
+def wait_for(predicate, timeout=2.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline and not predicate():
+        time.sleep(0.01)
+    return predicate()
+
+def stop(feed):
+    # Stops every replay thread before the test removes its file
+    for shard in getattr(feed, "shards", [feed]):
+        shard.stop()
+        if shard.streamer is not None:
+            shard.streamer._thread.join(2.0)
+
+def test_replay_feeds_only_subscribed_keys():
+    path = write_replay([
+        (0.0, full_tick(CE_KEY, 24.0, 10.0, 1)),
+        (0.1, full_tick("NSE_FO|99999", 5.0, 1.0, 1)),
+        (0.2, full_tick(CE_KEY, 25.0, 11.0, 2)),
+    ])
+    received = []
+    feed = MarketFeed(lambda keys: ReplayStreamer(path, keys, speed=0), received.append)
+    feed.start([CE_KEY])
+    assert wait_for(lambda: len(received) == 2)
+    assert [u[CE_KEY]["ltp"] for u in received] == [24.0, 25.0]
+    # A connect always asks the consumer for one REST gap fill
+    assert feed.take_gapfill() is True
+    assert feed.take_gapfill() is False
+    assert wait_for(lambda: not feed.connected)
+    os.remove(path)
+
+def test_replay_paces_by_speed():
+    path = write_replay([(0.0, full_tick(CE_KEY, 1.0, 1.0, 1)), (1.0, full_tick(CE_KEY, 2.0, 1.0, 1))])
+    received = []
+    feed = MarketFeed(lambda keys: ReplayStreamer(path, keys, speed=10), lambda u: received.append(time.monotonic()))
+    feed.start([CE_KEY])
+    assert wait_for(lambda: len(received) == 2)
+    assert 0.05 < received[1] - received[0] < 0.5
+    stop(feed)
+    os.remove(path)
+
+def test_subscription_follows_key_changes():
+    path = write_replay([])
+    feed = MarketFeed(lambda keys: ReplayStreamer(path, keys, speed=0), lambda u: None)
+    feed.start([CE_KEY])
+    feed.sync_keys([SPOT_KEY])
+    assert feed.streamer.subscriptions == {SPOT_KEY}
+    stop(feed)
+    os.remove(path)
+
+def test_keys_are_sharded_within_the_limit():
+    feed = ShardedFeed(lambda keys: None, lambda u: None, max_keys=2, max_connections=2)
+    assert feed.assign(["a", "b", "c", "d", "e", "a"]) == [{"a", "b"}, {"c", "d"}]
+    assert feed.dropped == ["e"]
+    # Keys stay on their connection; newcomers fill the free room
+    feed.shards[0].keys, feed.shards[1].keys = {"b", "x"}, {"c", "d"}
+    assert feed.assign(["a", "b", "c"]) == [{"a", "b"}, {"c"}]
+    assert feed.dropped == []
+
+def test_sharded_feed_streams_every_connection():
+    path = write_replay([(0.0, full_tick(CE_KEY, 24.0, 10.0, 1)), (0.1, full_tick(SPOT_KEY, 1500.0, 0.0, 9))])
+    received = []
+    feed = ShardedFeed(lambda keys: ReplayStreamer(path, keys, speed=0), received.append, max_keys=1)
+    assert feed.last_tick == 0.0 and not feed.connected
+    feed.ensure_running([CE_KEY, SPOT_KEY])
+    assert wait_for(lambda: len(received) == 2)
+    assert sorted(k for u in received for k in u) == [SPOT_KEY, CE_KEY]
+    assert [shard.keys for shard in feed.shards] == [{CE_KEY}, {SPOT_KEY}]
+    assert feed.tick_count == 2 and time.time() - feed.last_tick < 1.0
+    assert feed.take_gapfill() is True and feed.take_gapfill() is False
+    assert all(not shard.unseen() for shard in feed.shards)
+    stop(feed)
+    os.remove(path)
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_"):
+            fn()
+            print("OK", name)
@@ -0,0 +1,46 @@
+# Checks for the persistent option-chain metadata cache.
+import os
+import tempfile
+import time
+from meta_cache import MetaCache, meta_from_chain, needs_recenter
+
+def chain(spot, strikes):
+    return [{"strike_price": k, "underlying_spot_price": spot,
+             "call_options": {"instrument_key": f"NSE_FO|X{k}CE"}, "put_options": {"instrument_key": f"NSE_FO|X{k}PE"}}
+            for k in strikes]
+
+def test_window_and_recenter():
+    meta = meta_from_chain("X", "NSE_EQ|X", "2026-10-27", chain(1000, range(700, 1310, 10)), 10)
+    assert len(meta["strikes"]) == 31 and meta["strike_keys"][100000] == ("NSE_FO|X1000CE", "NSE_FO|X1000PE")
+    assert len(meta["local_keys"]) == 62
+    assert not needs_recenter(meta, 1060)
+    assert needs_recenter(meta, 1080)  # ATM + 8 intervals is past the 1150 edge
+    assert needs_recenter(meta, 920)
+    # The chain itself ends at 1150: nothing further out to fetch
+    short = meta_from_chain("X", "NSE_EQ|X", "2026-10-27", chain(1000, range(700, 1160, 10)), 10)
+    assert not needs_recenter(short, 1100) and needs_recenter(short, 900)
+
+def test_round_trip_drops_expired_and_old_entries():
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, "meta.json")
+        cache = MetaCache(path)
+        assert cache.load("2026-10-19") == 0
+        strikes = range(950, 1060, 10)
+        cache.put(meta_from_chain("X", "NSE_EQ|X", "2026-10-27", chain(1000, strikes), 10))
+        cache.put(meta_from_chain("Y", "NSE_EQ|Y", "2026-10-20", chain(1000, strikes), 10))
+        old = meta_from_chain("Z", "NSE_EQ|Z", "2026-10-27", chain(1000, strikes), 10)
+        old["fetched_at"] = time.time() - 2 * 86400
+        cache.put(old)
+        cache.save()
+
+        warm = MetaCache(path)
+        assert warm.load("2026-10-21") == 1  # Y has expired, Z is stale
+        meta = warm.get("X", "2026-10-27")
+        assert meta["local_keys"] == cache.get("X", "2026-10-27")["local_keys"]
+        assert meta["chain_range"] == (95000, 105000)
+        assert warm.get("X", "2026-11-03") is None and (warm.hits, warm.misses) == (1, 1)
+
+if __name__ == "__main__":
+    test_window_and_recenter()
+    test_round_trip_drops_expired_and_old_entries()
+    print("meta cache tests passed")
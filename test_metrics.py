@@ -0,0 +1,46 @@
+# Checks for the in-process metrics registry.
+import metrics
+from metrics import Registry
+
+def test_render_prometheus_text():
+    reg = Registry()
+    hits = reg.counter("hits_total", "Hits")
+    lat = reg.histogram("lat_seconds", "Latency", buckets=(0.1, 1.0))
+    hits.inc(endpoint="quote")
+    hits.inc(2, endpoint="quote")
+    for v in (0.05, 0.5, 3.0):
+        lat.observe(v, endpoint="quote")
+    lines = reg.render().splitlines()
+    assert "# TYPE hits_total counter" in lines
+    assert 'hits_total{endpoint="quote"} 3' in lines
+    assert 'lat_seconds_bucket{endpoint="quote",le="0.1"} 1' in lines
+    assert 'lat_seconds_bucket{endpoint="quote",le="1.0"} 2' in lines
+    assert 'lat_seconds_bucket{endpoint="quote",le="+Inf"} 3' in lines
+    assert 'lat_seconds_count{endpoint="quote"} 3' in lines
+    stats = reg.stats()["lat_seconds"]['{endpoint="quote"}']
+    assert stats["count"] == 3 and stats["max"] == 3.0 and stats["p95_le"] is None
+
+def test_collectors_run_per_scrape():
+    reg = Registry()
+    depth = reg.gauge("depth", "Queue depth")
+    calls = []
+    reg.collector(lambda: (calls.append(1), depth.set(len(calls))))
+    reg.render()
+    assert reg.stats()["depth"] == {"": 2}
+
+def test_disabled_is_a_noop():
+    reg = Registry()
+    lat = reg.histogram("lat_seconds", "Latency")
+    metrics.enabled = False
+    try:
+        with lat.time(stage="x"):
+            pass
+        assert lat.values == {}
+    finally:
+        metrics.enabled = True
+
+if __name__ == "__main__":
+    test_render_prometheus_text()
+    test_collectors_run_per_scrape()
+    test_disabled_is_a_noop()
+    print("metrics tests passed")
@@ -0,0 +1,134 @@
+# Parity check: the vectorized models in pricing.py must agree with the
+# scalar reference implementations. Runs offline (no server import).
+import itertools
+import math
+import numpy as np
+import pricing
+
+SPOTS = [907.6, 25482.5, 82392.61]
+MONEYNESS = [0.8, 0.95, 0.99, 1.0, 1.01, 1.05, 1.2]
+DAYS = [0.001, 0.5, 3, 30, 90]
+VOLS = [0.05, 0.14, 0.35]
+
+def grid():
+    rows = list(itertools.product(SPOTS, MONEYNESS, DAYS, VOLS))
+    S = np.array([r[0] for r in rows])
+    K = np.array([r[0] * r[1] for r in rows])
+    T = np.array([r[2] / 365.0 for r in rows])
+    sigma = np.array([r[3] for r in rows])
+    return S, K, T, sigma
+
+def check(vec, ref, S):
+    # Absolute tolerance scaled to the underlying, well below the 2dp rounding of the payload
+    assert np.allclose(vec, ref, rtol=1e-9, atol=1e-9 * S.max()), np.max(np.abs(vec - ref))
+
+def test_norm_cdf():
+    x = np.linspace(-12, 12, 2001)
+    ref = np.array([pricing.norm_cdf(v) for v in x])
+    assert np.max(np.abs(pricing.norm_cdf_vec(x) - ref)) < 1e-14
+    # Deep tails keep their relative accuracy instead of collapsing to 0
+    x = np.linspace(-30, -6, 241)
+    ref = np.array([0.5 * math.erfc(-v / math.sqrt(2.0)) for v in x])
+    assert np.max(np.abs(pricing.norm_cdf_vec(x) / ref - 1.0)) < 1e-12
+
+def test_bs_parity():
+    S, K, T, sigma = grid()
+    for is_call, fn in ((True, pricing.bs_call_price), (False, pricing.bs_put_price)):
+        ref = np.array([fn(s, k, t, 0.1, v) for s, k, t, v in zip(S, K, T, sigma)])
+        check(pricing.bs_price_vec(S, K, T, 0.1, sigma, is_call), ref, S)
+
+def test_mjd_parity():
+    S, K, T, sigma = grid()
+    for is_call, fn in ((True, pricing.mjd_call_price), (False, pricing.mjd_put_price)):
+        ref = np.array([fn(s, k, t, 0.1, v) for s, k, t, v in zip(S, K, T, sigma)])
+        check(pricing.mjd_price_vec(S, K, T, 0.1, sigma, is_call), ref, S)
+
+def test_cs_parity():
+    S, K, T, sigma = grid()
+    for is_call, fn in ((True, pricing.cs_call_price), (False, pricing.cs_put_price)):
+        ref = np.array([fn(s, k, t, 0.1, v) for s, k, t, v in zip(S, K, T, sigma)])
+        check(pricing.cs_price_vec(S, K, T, 0.1, sigma, is_call), ref, S)
+
+def test_price_pairs_matches_rows():
+    S, K, T, sigma = grid()
+    pe_K = 2 * S - K
+    out = pricing.price_pairs(S, K, pe_K, T, sigma)
+    ref = {
+        "ce_fv": [pricing.mjd_call_price(s, k, t, 0.1, v) for s, k, t, v in zip(S, K, T, sigma)],
+        "pe_fv": [pricing.mjd_put_price(s, k, t, 0.1, v) for s, k, t, v in zip(S, pe_K, T, sigma)],
+        "bs_ce_fv": [pricing.bs_call_price(s, k, t, 0.1, 0.14) for s, k, t in zip(S, K, T)],
+        "bs_pe_fv": [pricing.bs_put_price(s, k, t, 0.1, 0.14) for s, k, t in zip(S, pe_K, T)],
+        "cs_ce_fv": [pricing.cs_call_price(s, k, t, 0.1, v) for s, k, t, v in zip(S, K, T, sigma)],
+        "cs_pe_fv": [pricing.cs_put_price(s, k, t, 0.1, v) for s, k, t, v in zip(S, pe_K, T, sigma)],
+    }
+    for name, values in ref.items():
+        check(out[name], np.array(values), S)
+
+def test_invalid_inputs_price_to_zero():
+    S = np.array([0.0, 100.0, 100.0, 100.0])
+    K = np.array([100.0, 0.0, 100.0, 100.0])
+    T = np.array([0.1, 0.1, 0.0, 0.1])
+    sigma = np.array([0.2, 0.2, 0.2, 0.0])
+    for fn in (pricing.bs_price_vec, pricing.mjd_price_vec, pricing.cs_price_vec):
+        assert np.all(fn(S, K, T, 0.1, sigma, True) == 0.0)
+
+def test_implied_vol_round_trip():
+    S, K, T, sigma = grid()
+    for is_call in (True, False):
+        price = pricing.bs_price_vec(S, K, T, 0.1, sigma, is_call)
+        iv, converged = pricing.implied_vol_vec(price, S, K, T, 0.1, is_call)
+        # Recovered vols must reprice the option; where they do not converge they must be NaN
+        repriced = pricing.bs_price_vec(S, K, T, 0.1, np.where(converged, iv, 0.0), is_call)
+        assert np.all(np.abs(repriced - price)[converged] < 1e-6 * np.maximum(price, 0.01)[converged])
+        assert np.all(np.isnan(iv[~converged]))
+        # Every option with meaningful time value must converge to the true vol
+        disc_K = K * np.exp(-0.1 * T)
+        intrinsic = np.maximum(S - disc_K, 0.0) if is_call else np.maximum(disc_K - S, 0.0)
+        informative = (price - intrinsic > 0.05 * S / 100)
+        assert np.all(converged[informative])
+        assert np.allclose(iv[informative], sigma[informative], atol=1e-4)
+
+def test_implied_vol_flags_arbitrage_violations():
+    # Below intrinsic, above the spot, zero price and a zero strike cannot be solved
+    price = np.array([5.0, 120.0, 0.0, 10.0])
+    S = np.array([100.0, 100.0, 100.0, 100.0])
+    K = np.array([90.0, 100.0, 100.0, 0.0])
+    iv, converged = pricing.implied_vol_vec(price, S, K, 30 / 365.0, 0.1, True)
+    assert not converged.any()
+    assert np.all(np.isnan(iv))
+
+def test_greeks_match_finite_differences():
+    S, K, T, sigma = grid()
+    keep = T > 1 / 365.0  # bumps on the last minutes before expiry are all noise
+    S, K, T, sigma = S[keep], K[keep], T[keep], sigma[keep]
+    for is_call in (True, False):
+        g = pricing.bs_greeks_vec(S, K, T, 0.1, sigma, is_call)
+        price = lambda **kw: pricing.bs_price_vec(kw.get("S", S), K, kw.get("T", T), 0.1, kw.get("sigma", sigma), is_call)
+        h = S * 1e-4
+        delta = (price(S=S + h) - price(S=S - h)) / (2 * h)
+        gamma = (price(S=S + h) - 2 * price() + price(S=S - h)) / h**2
+        vega = (price(sigma=sigma + 1e-5) - price(sigma=sigma - 1e-5)) / 2e-5 / 100
+        theta = (price(T=T - 1e-6) - price(T=T + 1e-6)) / 2e-6 / 365
+        assert np.allclose(g["delta"], delta, atol=1e-5)
+        assert np.allclose(g["gamma"], gamma, rtol=1e-3, atol=1e-7)
+        assert np.allclose(g["vega"], vega, rtol=1e-5, atol=1e-6)
+        assert np.allclose(g["theta"], theta, rtol=1e-4, atol=1e-4)
+    assert pricing.bs_greeks_vec(100.0, 100.0, 0.0, 0.1, 0.2, True)["delta"] == 0.0
+
+def test_calculate_iv_agrees_with_solver():
+    # The scalar Newton path and implied_vol_vec agree wherever both solve
+    for S, K, days, sigma, opt in ((25482.5, 25450.0, 4, 0.12, 'CE'), (1450.0, 1500.0, 20, 0.3, 'PE'), (907.6, 900.0, 1, 0.6, 'CE')):
+        price = (pricing.bs_call_price if opt == 'CE' else pricing.bs_put_price)(S, K, days / 365.0, 0.1, sigma)
+        assert pricing.calculate_iv(price, S, K, days, 0.1, opt) == round(sigma * 100, 2)
+        vec, ok = pricing.implied_vol_vec(price, S, K, days / 365.0, 0.1, opt == 'CE')
+        assert ok and round(float(vec) * 100, 2) == round(sigma * 100, 2)
+    # Below intrinsic: the solver reports no solution, calculate_iv keeps its
+    # legacy last-iterate return rather than 0.0
+    _, ok = pricing.implied_vol_vec(1.0, 25482.5, 25000.0, 4 / 365.0, 0.1, True)
+    assert not ok and pricing.calculate_iv(1.0, 25482.5, 25000.0, 4, 0.1, 'CE') != 0.0
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_"):
+            fn()
+            print("OK", name)
@@ -0,0 +1,50 @@
+# Checks for the columnar quote store used by the Nifty 50 path.
+import numpy as np
+from quote_store import QuoteStore
+
+def test_update_and_gather():
+    store = QuoteStore(capacity=2)
+    changed = store.update({"A": {"ltp": 10.0, "close": 9.0, "oi": 100, "volume": 5},
+                            "B": {"ltp": 0.0, "close": 4.5},
+                            "C": {"ltp": 1.0}}, now=1.0)
+    assert sorted(changed) == ["A", "B", "C"]
+    assert len(store) == 3  # grew past the initial capacity
+    out = store.gather(store.lookup(["A", "B", "missing", "C"]))
+    # B has not traded: price falls back to the close; unknown keys read as 0
+    assert out["price"].tolist() == [10.0, 4.5, 0.0, 1.0]
+    assert out["oi"].tolist() == [100, 0, 0, 0]
+    assert out["volume"].tolist() == [5, 0, 0, 0]
+    assert out["ts"].tolist() == [1.0, 1.0, 0.0, 1.0]
+
+def test_update_reports_only_changes():
+    store = QuoteStore()
+    store.update({"A": {"ltp": 10.0, "oi": 1}})
+    assert store.update({"A": {"ltp": 10.0, "oi": 1}}) == []
+    assert store.update({"A": {"oi": 2}}) == ["A"]
+    # Partial updates leave the other fields alone
+    assert store.price("A") == 10.0
+
+def test_rest_snapshot_does_not_overwrite_newer_ticks():
+    store = QuoteStore()
+    store.update({"A": {"ltp": 11.0}, "B": {"ltp": 20.0}}, now=105.0)
+    store.update({"B": {"ltp": 19.0}}, now=95.0)
+    changed = store.update_from_quotes({
+        "NSE_FO:A": {"instrument_token": "A", "last_price": 10.0, "ohlc": {"close": 9.0}, "open_interest": 7, "volume": 3},
+        "NSE_FO:B": {"instrument_token": "B", "last_price": 21.0, "ohlc": {"close": 9.0}, "open_interest": 7, "volume": 3},
+    }, as_of=100.0)
+    assert changed == ["B"]
+    assert store.price("A") == 11.0
+    assert store.price("B") == 21.0
+
+def test_gather_returns_copies():
+    store = QuoteStore()
+    store.update({"A": {"ltp": 1.0}})
+    out = store.gather(np.array([0]))
+    store.update({"A": {"ltp": 2.0}})
+    assert out["price"][0] == 1.0
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_"):
+            fn()
+            print("OK", name)
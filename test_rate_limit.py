@@ -0,0 +1,89 @@
+# Checks for the Upstox request scheduler against an in-process fake server.
+import asyncio
+import httpx
+from rate_limit import RequestScheduler, TokenBucket, PRIORITY_LIVE, PRIORITY_META
+from upstox_api import UpstoxAPI
+
+def test_token_bucket_paces_after_burst():
+    now = [0.0]
+    bucket = TokenBucket(rate=2.0, burst=2, clock=lambda: now[0])
+    assert bucket.take() == 0 and bucket.take() == 0
+    assert abs(bucket.take() - 0.5) < 1e-9
+    now[0] = 0.5
+    assert bucket.take() == 0
+
+def test_live_lane_overtakes_meta():
+    async def run():
+        sched = RequestScheduler(limits={"default": (50.0, 1)})
+        order = []
+        async def call(name, priority):
+            await sched.acquire("default", priority)
+            order.append(name)
+        await sched.acquire("default")  # spend the burst so everyone queues
+        tasks = [asyncio.create_task(call(f"meta{i}", PRIORITY_META)) for i in range(3)]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(call("live", PRIORITY_LIVE)))
+        await asyncio.gather(*tasks)
+        return order
+    order = asyncio.run(run())
+    assert order[0] == "live"
+    assert order[1:] == ["meta0", "meta1", "meta2"]
+
+def test_retries_429_and_5xx_then_succeeds():
+    replies = iter([429, 503, 200])
+    def handler(request):
+        status = next(replies)
+        body = {"status": "success", "data": {"A": 1}} if status == 200 else {"status": "error"}
+        return httpx.Response(status, json=body)
+
+    async def run():
+        sched = RequestScheduler(backoff=0.001)
+        api = UpstoxAPI("token", transport=httpx.MockTransport(handler), scheduler=sched)
+        await api.start()
+        data = await api.quotes(["A"])
+        await api.close()
+        return data, sched.counters
+    data, counters = asyncio.run(run())
+    assert data == {"A": 1}
+    assert counters["throttled"] == 1 and counters["retried"] == 2 and counters["failed"] == 0
+
+def test_gives_up_after_retries():
+    def handler(request):
+        return httpx.Response(500, text="upstream down")
+
+    async def run():
+        sched = RequestScheduler(retries=2, backoff=0.001)
+        api = UpstoxAPI("token", transport=httpx.MockTransport(handler), scheduler=sched)
+        await api.start()
+        data = await api.option_chain("X", "2026-03-30")
+        await api.close()
+        return data, sched.counters
+    data, counters = asyncio.run(run())
+    assert data == []
+    assert counters["requests"] == 3 and counters["failed"] == 1
+
+def test_identical_requests_are_coalesced():
+    calls = []
+    async def handler(request):
+        calls.append(str(request.url))
+        await asyncio.sleep(0.01)
+        return httpx.Response(200, json={"status": "success", "data": [1]})
+
+    async def run():
+        sched = RequestScheduler()
+        api = UpstoxAPI("token", transport=httpx.MockTransport(handler), scheduler=sched)
+        await api.start()
+        results = await asyncio.gather(*(api.option_chain("X", "2026-03-30") for _ in range(4)))
+        await api.close()
+        return results, sched.counters
+    results, counters = asyncio.run(run())
+    assert results == [[1]] * 4
+    assert len(calls) == 1 and counters["coalesced"] == 3
+
+if __name__ == "__main__":
+    test_token_bucket_paces_after_burst()
+    test_live_lane_overtakes_meta()
+    test_retries_429_and_5xx_then_succeeds()
+    test_gives_up_after_retries()
+    test_identical_requests_are_coalesced()
+    print("rate limit tests passed")
@@ -0,0 +1,47 @@
+# Checks for the archive replay engine.
+import asyncio
+import tempfile
+from archive import ArchiveWriter
+from replay import ArchiveReplay
+from test_archive import payload
+
+BASE = 1_770_000_000.0
+
+def record(root):
+    idx = ArchiveWriter(root, "indices").start()
+    chain = ArchiveWriter(root, "nifty50_chain").start()
+    for i in range(5):
+        idx.append(payload(1000.0 + i), ts=BASE + 2 * i, vix=13.0)
+        chain.append(payload(2000.0 + i), ts=BASE + 2 * i + 1)
+    idx.close()
+    chain.close()
+
+def test_snapshots_rebuild_inputs_in_time_order():
+    with tempfile.TemporaryDirectory() as root:
+        record(root)
+        events = list(ArchiveReplay(root, window=3.0).snapshots())
+        assert [ts - BASE for ts, _, _ in events] == list(range(10))  # no gaps or repeats across windows
+        assert [src for _, src, _ in events[:2]] == ["indices", "nifty50_chain"]
+        ts, _, blocks = events[0]
+        block = blocks[0]
+        assert block["name"] == "NIFTY 50" and block["spot"] == 1000.0 and block["vix"] == 13.0
+        assert [leg["ce_strike"] for leg in block["legs"]] == [100.0, 110.0]
+        assert block["legs"][0]["pe_oi"] == 101
+        assert events[1][2][0]["vix"] is None
+
+def test_run_paces_by_speed():
+    with tempfile.TemporaryDirectory() as root:
+        record(root)
+        seen = []
+        replay = ArchiveReplay(root, start=BASE + 4, end=BASE + 6, speed=20.0)
+        loop = asyncio.new_event_loop()
+        started = loop.time()
+        count = loop.run_until_complete(replay.run(lambda ts, src, blocks: seen.append((ts - BASE, loop.time() - started))))
+        loop.close()
+        assert count == 3 and [t for t, _ in seen] == [4.0, 5.0, 6.0]
+        assert seen[-1][1] >= 2 / 20.0 - 0.01
+
+if __name__ == "__main__":
+    test_snapshots_rebuild_inputs_in_time_order()
+    test_run_paces_by_speed()
+    print("replay tests passed")
@@ -0,0 +1,66 @@
+# Checks for the memoized Nifty 50 row blocks and incremental summary.
+from row_book import RowBook
+
+def block(name, weight, status, spot=100.0):
+    return {"name": name, "weight": weight, "status": status, "spot": spot, "rows": []}
+
+def full_summary(blocks):
+    out = {}
+    for field, status in (("pos", "POSITIVE"), ("neg", "NEGATIVE"), ("neu", "NEUTRAL")):
+        members = [b for b in blocks if b["status"] == status]
+        out[f"{field}_count"] = len(members)
+        out[f"{field}_weight"] = round(sum(b["weight"] for b in members), 2)
+    return out
+
+def test_signature_memo():
+    book = RowBook()
+    assert not book.is_fresh("TCS", ("sig", 1))
+    book.put("TCS", ("sig", 1), block("TCS", 3.7, "POSITIVE"))
+    assert book.is_fresh("TCS", ("sig", 1))
+    assert not book.is_fresh("TCS", ("sig", 2))
+    book.invalidate()
+    assert not book.is_fresh("TCS", ("sig", 1))
+
+def test_summary_patched_incrementally():
+    book = RowBook()
+    book.put("HDFCBANK", 1, block("HDFCBANK", 11.6, "NEGATIVE"))
+    book.put("TCS", 1, block("TCS", 3.7, "POSITIVE"))
+    book.put("ITC", 1, block("ITC", 3.81, "NEUTRAL"))
+    book.put("TCS", 2, block("TCS", 3.7, "NEGATIVE"))
+    book.remove("ITC")
+    for _ in range(1000):
+        book.put("HDFCBANK", 3, block("HDFCBANK", 11.6, "POSITIVE"))
+        book.put("HDFCBANK", 4, block("HDFCBANK", 11.6, "NEGATIVE"))
+    assert book.summary() == full_summary(book.blocks.values())
+    assert [b["name"] for b in book.results()] == ["HDFCBANK", "TCS"]
+
+def test_commit_reports_changes_with_versions():
+    book = RowBook()
+    book.put("TCS", 1, block("TCS", 3.7, "POSITIVE"))
+    book.put("ITC", 1, block("ITC", 3.81, "POSITIVE"))
+    assert sorted(book.commit()[0]) == ["ITC", "TCS"]
+    assert book.version == 1
+    # Identical block under a new signature is not a change
+    assert book.put("TCS", 2, block("TCS", 3.7, "POSITIVE")) is False
+    assert book.commit() == ([], [])
+    assert book.version == 1
+    book.put("TCS", 3, block("TCS", 3.7, "NEGATIVE", spot=101.0))
+    book.remove("ITC")
+    assert book.commit() == (["TCS"], ["ITC"])
+    assert book.changed_at == {"TCS": 2}
+    assert book.removed_at == {"ITC": 2}
+
+def test_invalidate_one_block():
+    book = RowBook()
+    book.put("TCS", 1, block("TCS", 3.7, "POSITIVE"))
+    book.put("ITC", 1, block("ITC", 3.81, "POSITIVE"))
+    book.invalidate("TCS")
+    assert not book.is_fresh("TCS", 1) and book.is_fresh("ITC", 1)
+    book.invalidate()
+    assert not book.is_fresh("ITC", 1)
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_"):
+            fn()
+            print("OK", name)
@@ -0,0 +1,84 @@
+# Checks for the memory-mapped snapshot hand-off between processes.
+import os
+import subprocess
+import sys
+import tempfile
+from shared_snapshot import SEQ, SEQ_OFFSET, SnapshotReader, SnapshotWriter
+
+def segment_name():
+    return f"test-snap-{os.getpid()}"
+
+def test_reader_sees_each_new_payload_once():
+    with tempfile.TemporaryDirectory() as root:
+        writer = SnapshotWriter(segment_name(), size=64, directory=root)
+        reader = SnapshotReader(writer.name, directory=root)
+        try:
+            assert reader.read() is None  # nothing published yet
+            writer.write(b'{"a": 1}')
+            assert reader.read() == b'{"a": 1}'
+            assert reader.read() is None
+            writer.write(b'{"b": 22}')
+            assert reader.read() == b'{"b": 22}' and reader.bytes == 9
+            try:
+                writer.write(b"x" * 65)
+                assert False, "oversized snapshot accepted"
+            except ValueError:
+                pass
+            assert reader.read() is None
+        finally:
+            reader.close()
+            writer.close()
+        assert not os.listdir(root)
+
+def test_write_in_progress_does_not_block_the_last_payload():
+    with tempfile.TemporaryDirectory() as root:
+        writer = SnapshotWriter(segment_name(), size=64, directory=root)
+        reader = SnapshotReader(writer.name, retries=2, directory=root)
+        try:
+            writer.write(b"old")
+            SEQ.pack_into(writer.map, SEQ_OFFSET, writer.seq + 1)  # writer stalled copying the next one
+            assert reader.read() == b"old" and reader.torn == 0
+            SEQ.pack_into(writer.map, SEQ_OFFSET, writer.seq)
+            # A zero-copy view stays good across one more write, not two
+            writer.write(b"new")
+            seq, view = reader.view()
+            assert bytes(view) == b"new"
+            writer.write(b"newer")
+            assert reader.valid(seq)
+            writer.write(b"newest")  # reuses the viewed slot
+            assert not reader.valid(seq)
+            view.release()
+        finally:
+            reader.close()
+            writer.close()
+
+def test_other_process_reads_and_writer_restarts():
+    with tempfile.TemporaryDirectory() as root:
+        writer = SnapshotWriter(segment_name(), size=64, directory=root)
+        reader = SnapshotReader(writer.name, directory=root)
+        try:
+            writer.write(b"hello")
+            script = (f"from shared_snapshot import SnapshotReader; "
+                      f"print(SnapshotReader({writer.name!r}, directory={root!r}).read().decode())")
+            out = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True,
+                                 cwd=os.path.dirname(os.path.abspath(__file__)))
+            assert out.stdout.strip() == "hello", out.stderr
+            assert reader.read() == b"hello"
+            # A restarted writer resumes the file; one that needs more room
+            # replaces it and readers follow
+            writer.close(unlink=False)
+            resumed = SnapshotWriter(writer.name, size=64, directory=root)
+            assert resumed.seq == writer.seq
+            resumed.close(unlink=False)
+            writer = SnapshotWriter(writer.name, size=128, directory=root)
+            writer.write(b"bigger")
+            assert reader.read() == b"bigger"
+        finally:
+            reader.close()
+            writer.close()
+
+if __name__ == "__main__":
+    test_reader_sees_each_new_payload_once()
+    test_write_in_progress_does_not_block_the_last_payload()
+    test_other_process_reads_and_writer_restarts()
+    print("shared snapshot tests passed")
@@ -0,0 +1,28 @@
+# Checks for the tick-normalized strike lookups.
+from strike_index import atm_pairs, strike_interval, strike_key
+
+def test_strike_key_ignores_float_noise():
+    assert strike_key(1002.5) == strike_key(1000 + 0.1 * 25) == 100250
+    assert strike_key(907.5 - 3 * 2.5) == strike_key(900.0)
+
+def test_atm_pairs_odd_interval():
+    pairs = atm_pairs(999.0, 2.5, count=3)
+    assert pairs == [(997.5, 1002.5), (995.0, 1005.0), (992.5, 1007.5)]
+
+def test_atm_pairs_matches_legacy_rounding():
+    spot, interval = 25482.5, 50
+    atm = round(round(spot / interval) * interval, 2)
+    assert atm_pairs(spot, interval) == [(atm - n * interval, atm + n * interval) for n in range(1, 7)]
+
+def test_strike_interval_near_spot():
+    # 50-point strikes around ATM, 100-point ones further out
+    strikes = list(range(20000, 24000, 100)) + list(range(24000, 27000, 50)) + list(range(27000, 31000, 100))
+    assert strike_interval(strikes, 25482.5) == 50.0
+    assert strike_interval(strikes, 21000) == 100.0
+    assert strike_interval([997.5, 1000.0, 1002.5], 1000) == 2.5
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_"):
+            fn()
+            print("OK", name)
@@ -0,0 +1,61 @@
+# Checks for the pooled async Upstox client against an in-process transport.
+import asyncio
+import httpx
+from upstox_api import UpstoxAPI
+
+def make_api(handler, **kw):
+    return UpstoxAPI("token", transport=httpx.MockTransport(handler), **kw)
+
+def test_success_and_failure_payloads():
+    def handler(request):
+        assert request.headers["Authorization"] == "Bearer token"
+        if request.url.path == "/v2/option/chain":
+            assert request.url.params["expiry_date"] == "2026-03-30"
+            return httpx.Response(200, json={"status": "success", "data": [{"strike_price": 100.0}]})
+        return httpx.Response(401, json={"status": "error", "errors": []})
+
+    async def run():
+        api = make_api(handler)
+        await api.start()
+        assert await api.option_chain("NSE_EQ|X", "2026-03-30") == [{"strike_price": 100.0}]
+        assert await api.quotes(["NSE_EQ|X"]) == {}
+        await api.close()
+    asyncio.run(run())
+
+def test_quotes_joins_keys():
+    seen = []
+    def handler(request):
+        seen.append(request.url.params["instrument_key"])
+        return httpx.Response(200, json={"status": "success", "data": {"NSE_EQ:A": {"last_price": 1}}})
+
+    async def run():
+        api = make_api(handler)
+        await api.start()
+        assert await api.quotes(["NSE_EQ|A", "NSE_EQ|B"]) == {"NSE_EQ:A": {"last_price": 1}}
+        await api.close()
+    asyncio.run(run())
+    assert seen == ["NSE_EQ|A,NSE_EQ|B"]
+
+def test_concurrency_is_bounded():
+    state = {"active": 0, "peak": 0}
+
+    async def run():
+        async def handler(request):
+            state["active"] += 1
+            state["peak"] = max(state["peak"], state["active"])
+            await asyncio.sleep(0.01)
+            state["active"] -= 1
+            return httpx.Response(200, json={"status": "success", "data": {}})
+
+        api = make_api(handler, concurrency=3)
+        await api.start()
+        await asyncio.gather(*(api.quotes([f"K{i}"]) for i in range(12)))
+        await api.close()
+    asyncio.run(run())
+    assert state["peak"] == 3
+
+if __name__ == "__main__":
+    test_success_and_failure_payloads()
+    test_quotes_joins_keys()
+    test_concurrency_is_bounded()
+    print("upstox api tests passed")
@@ -0,0 +1,62 @@
+# Checks for the instrument-master watchlist.
+import os
+import tempfile
+from datetime import datetime
+from cadence import IST
+from conftest import write_master_rows
+from instruments import InstrumentMaster
+from watchlist import STOCKS, Watchlist, expiry_label, live_expiries
+
+CONFIG = {"indices": [{"name": "NIFTY 50", "key": "NSE_INDEX|Nifty 50", "symbol": "NIFTY", "exchange": "NSE_FO", "expiries": 2},
+                      {"name": "SENSEX", "key": "BSE_INDEX|SENSEX", "symbol": "SENSEX", "exchange": "BSE_FO", "expiries": 1}]}
+
+def ist(text):
+    return datetime.strptime(text, "%Y-%m-%d %H:%M").replace(tzinfo=IST).timestamp()
+
+def write_master(path):
+    rows = [["NSE_EQ|INE002A01018", "2885", "RELIANCE", "RELIANCE INDUSTRIES LTD", "1400", "", "0", "0.05", "1", "EQ", "", "NSE_EQ"]]
+    n = 0
+    for expiry in ("2026-10-20", "2026-10-27", "2026-11-03"):
+        for strike in (25400, 25450, 25500):
+            for side in ("CE", "PE"):
+                n += 1
+                rows.append([f"NSE_FO|{n}", str(n), f"NIFTY{expiry[2:4]}{expiry[5:7]}{expiry[8:]}{strike}{side}", "NIFTY",
+                             "0", expiry, str(strike), "0.05", "75", "OPTIDX", side, "NSE_FO"])
+    rows.append(["BSE_FO|1", "1", "SENSEX26O2283000CE", "SENSEX", "0", "2026-10-22", "83000", "0.05", "20", "OPTIDX", "CE", "BSE_FO"])
+    # A NIFTY row on another exchange and a stock option named only by its symbol
+    rows.append(["BSE_FO|2", "2", "NIFTY26O2025500CE", "NIFTY", "0", "2026-10-21", "25500", "0.05", "75", "OPTIDX", "CE", "BSE_FO"])
+    rows.append(["NSE_FO|900", "900", "RELIANCE26OCT1400CE", "RELIANCE INDUSTRIES LTD", "0", "2026-10-27", "1400", "0.05", "500", "OPTSTK", "CE", "NSE_FO"])
+    write_master_rows(path, rows)
+
+def test_live_expiries_roll_at_the_close():
+    expiries = ["2026-11-03", "2026-10-20", "2026-10-27"]
+    assert live_expiries(expiries, ist("2026-10-20 15:29"), 2) == ["2026-10-20", "2026-10-27"]
+    assert live_expiries(expiries, ist("2026-10-20 15:30"), 2) == ["2026-10-27", "2026-11-03"]
+    assert live_expiries(expiries, ist("2026-11-04 09:00"), 2) == []
+    assert expiry_label("NIFTY 50", "2026-11-03", 0) == "NIFTY 50"
+    assert expiry_label("NIFTY 50", "2026-11-03", 1) == "NIFTY 50 03NOV"
+
+def test_load_from_master():
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, "complete.csv.gz")
+        write_master(path)
+        watchlist = Watchlist(CONFIG)
+        watchlist.load(InstrumentMaster.load(path), ["RELIANCE"], 1.0)
+    assert watchlist.expiries["NIFTY 50"] == ["2026-10-20", "2026-10-27", "2026-11-03"]
+    assert watchlist.expiries[STOCKS] == ["2026-10-27"]
+
+    entries = watchlist.entries(ist("2026-10-20 16:00"))
+    assert [(e["name"], e["expiry"], e["rank"]) for e in entries] == [
+        ("NIFTY 50", "2026-10-27", 0), ("NIFTY 50 03NOV", "2026-11-03", 1), ("SENSEX", "2026-10-22", 0)]
+    strikes = entries[0]["strikes"]
+    assert [s["strike"] for s in strikes] == [25400.0, 25450.0, 25500.0]
+    assert strikes[0]["ce_key"] and strikes[0]["pe_key"] and strikes[0]["ce_key"] != strikes[0]["pe_key"]
+    assert entries[2]["strikes"][0]["pe_key"] == ""
+    assert watchlist.stock_expiry(ist("2026-10-20 16:00")) == "2026-10-27"
+    assert watchlist.tracked_expiries(ist("2026-10-23 10:00")) == {"2026-10-27", "2026-11-03"}
+    assert watchlist.stock_expiry(ist("2026-10-28 10:00")) is None
+
+if __name__ == "__main__":
+    test_live_expiries_roll_at_the_close()
+    test_load_from_master()
+    print("watchlist tests passed")
@@ -0,0 +1,62 @@
+# Checks for the snapshot + patch WebSocket protocol.
+from ws_protocol import DeltaChannel
+
+def payload(ts, **blocks):
+    return {"timestamp": ts, "summary": {"n": len(blocks)},
+            "indices": [dict(name=name, **fields) for name, fields in blocks.items()]}
+
+def apply(state, patch):
+    # Same merge the dashboards do in applyMessage()
+    blocks = {b["name"]: b for b in state["indices"]}
+    for b in patch["upsert"]:
+        blocks[b["name"]] = b
+    for name in patch["remove"]:
+        blocks.pop(name, None)
+    order = patch.get("order", [b["name"] for b in state["indices"]])
+    return dict(state, **patch["fields"], indices=[blocks[n] for n in order if n in blocks])
+
+def test_snapshot_then_patches_rebuild_payload():
+    channel = DeltaChannel()
+    assert channel.messages_since(None) == []
+    channel.publish(payload("1", A={"v": 1}, B={"v": 1}))
+    [snapshot] = channel.messages_since(None)
+    assert snapshot["type"] == "snapshot" and snapshot["seq"] == 1
+    state, seq = snapshot["data"], snapshot["seq"]
+
+    latest = payload("2", C={"v": 1}, A={"v": 2})
+    patch = channel.publish(latest)
+    assert [b["name"] for b in patch["upsert"]] == ["C", "A"]
+    assert patch["remove"] == ["B"]
+    assert patch["fields"] == {"timestamp": "2"}
+    for message in channel.messages_since(seq):
+        assert message["base"] == seq
+        state, seq = apply(state, message), message["seq"]
+    assert state == latest
+
+def test_unchanged_payload_is_not_published():
+    channel = DeltaChannel()
+    channel.publish(payload("1", A={"v": 1}))
+    assert channel.publish(payload("1", A={"v": 1})) is None
+    assert channel.seq == 1
+
+def test_producer_hints_limit_upserts():
+    channel = DeltaChannel()
+    channel.publish(payload("1", A={"v": 1}, B={"v": 1}))
+    patch = channel.publish(payload("2", A={"v": 1}, B={"v": 2}), changed=["B"], removed=[])
+    assert [b["name"] for b in patch["upsert"]] == ["B"]
+    assert "order" not in patch
+
+def test_lagging_client_gets_snapshot():
+    channel = DeltaChannel(history=2)
+    for i in range(5):
+        channel.publish(payload(str(i), A={"v": i}))
+    [message] = channel.messages_since(1)
+    assert message["type"] == "snapshot" and message["seq"] == 5
+    assert [m["seq"] for m in channel.messages_since(3)] == [4, 5]
+    assert channel.messages_since(5) == []
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_"):
+            fn()
+            print("OK", name)
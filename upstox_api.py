@@ -0,0 +1,86 @@
+import asyncio
+import time
+
+import httpx
+
+from metrics import HTTP_SECONDS, HTTP_RESPONSES
+from rate_limit import RequestScheduler, PRIORITY_LIVE
+
+BASE_URL = "https://api.upstox.com"
+
+# One pooled, keep-alive HTTP client for every Upstox REST call, so requests
+# reuse TCP/TLS connections instead of paying the handshake each time.
+# In-flight requests are capped by a semaphore (the pool is sized to match),
+# and every request is paced and retried by a shared RequestScheduler.
+
+ENDPOINT_CLASSES = {
+    "/v2/market-quote/quotes": "quote",
+    "/v2/option/chain": "option_chain",
+}
+
+class UpstoxAPI:
+    def __init__(self, access_token, concurrency=8, timeout=10.0, base_url=BASE_URL, transport=None, scheduler=None, capture=None):
+        self.headers = {"Authorization": f"Bearer {access_token}", "Accept": "application/json"}
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.base_url = base_url
+        self.transport = transport  # e.g. httpx.MockTransport in tests
+        self.scheduler = scheduler or RequestScheduler()
+        self.capture = capture  # HttpCapture recording raw responses, if any
+        self.client = None
+        self._sem = None
+
+    async def start(self):
+        self.client = httpx.AsyncClient(
+            base_url=self.base_url,
+            headers=self.headers,
+            timeout=self.timeout,
+            limits=httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency),
+            transport=self.transport,
+        )
+        self._sem = asyncio.Semaphore(self.concurrency)
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    async def _send(self, path, params):
+        endpoint = ENDPOINT_CLASSES.get(path, "default")
+        async with self._sem:
+            started = time.time()
+            try:
+                r = await self.client.get(path, params=params)
+            except Exception:
+                HTTP_RESPONSES.inc(endpoint=endpoint, status="error")
+                raise
+        HTTP_SECONDS.observe(time.time() - started, endpoint=endpoint)
+        HTTP_RESPONSES.inc(endpoint=endpoint, status=r.status_code)
+        if self.capture is not None:
+            await asyncio.to_thread(self.capture.record, started, path, params, r.status_code,
+                                    time.time() - started, r.content.decode("utf-8", "replace"))
+        return r
+
+    async def get_data(self, path, params, priority=PRIORITY_LIVE):
+        # The "data" member of a successful response, None otherwise (after
+        # the scheduler's retries). Transport errors that outlast the retries
+        # propagate to the caller.
+        endpoint = ENDPOINT_CLASSES.get(path, "default")
+        key = (path, tuple(sorted(params.items())))
+        r = await self.scheduler.submit(endpoint, lambda: self._send(path, params), priority=priority, key=key)
+        try:
+            payload = r.json()
+        except ValueError:
+            return None
+        if payload.get("status") == "success":
+            return payload.get("data")
+        return None
+
+    async def option_chain(self, instrument_key, expiry, priority=PRIORITY_LIVE):
+        return await self.get_data("/v2/option/chain", {"instrument_key": instrument_key, "expiry_date": expiry}, priority) or []
+
+    async def option_contracts(self, instrument_key, priority=PRIORITY_LIVE):
+        return await self.get_data("/v2/option/contract", {"instrument_key": instrument_key}, priority) or []
+
+    async def quotes(self, instrument_keys, priority=PRIORITY_LIVE):
+        return await self.get_data("/v2/market-quote/quotes", {"instrument_key": ",".join(instrument_keys)}, priority) or {}
@@ -0,0 +1,71 @@
+from datetime import datetime
+
+from cadence import IST, POST_CLOSE, SESSION
+
+# Which option expiries the dashboard tracks. watchlist.json lists each
+# index (display name, spot key, option symbol and exchange in the
+# instrument master) with how many expiries of it to show side by side; the
+# Nifty 50 stock options follow their nearest expiry. The expiries
+# themselves come from the instrument master, so weekly rolls need no code
+# change: an expiry drops out at the close of its expiry day and the next
+# listed one moves up.
+
+STOCKS = "*stocks*"  # expiries key of the Nifty 50 stock options
+STOCK_EXCHANGE = "NSE_FO"
+CLOSE = next((hour, minute) for hour, minute, phase in SESSION if phase == POST_CLOSE)
+
+def live_expiries(expiries, ts, count):
+    # The first count expiries still trading at ts
+    now = datetime.fromtimestamp(ts, IST)
+    today = now.strftime('%Y-%m-%d')
+    closed = (now.hour, now.minute) >= CLOSE
+    return [e for e in sorted(expiries) if e > today or (e == today and not closed)][:count]
+
+def expiry_label(name, expiry, rank):
+    # The nearest expiry keeps the plain index name; later ones are told
+    # apart by date, e.g. "NIFTY 50 03NOV"
+    if rank == 0:
+        return name
+    return f"{name} {datetime.strptime(expiry, '%Y-%m-%d').strftime('%d%b').upper()}"
+
+class Watchlist:
+    def __init__(self, config):
+        self.indices = config.get("indices", [])
+        self.strikes = {}  # (index name, expiry) -> [{"strike", "ce_key", "pe_key"}]
+        self.expiries = {}  # index name -> listed expiries; STOCKS -> those of the stock options
+        self.loaded_at = 0.0
+
+    def load(self, master, stock_symbols, now):
+        # Expiries and strikes of every index and stock from an InstrumentMaster
+        strikes, expiries = {}, {}
+        for idx in self.indices:
+            listed = master.options(idx["symbol"], idx["exchange"])
+            expiries[idx["name"]] = sorted(listed)
+            strikes.update(((idx["name"], expiry), rows) for expiry, rows in listed.items())
+        expiries[STOCKS] = sorted({e for symbol in stock_symbols for e in master.expiries(symbol, STOCK_EXCHANGE, "OPTSTK")})
+        self.strikes, self.expiries, self.loaded_at = strikes, expiries, now
+        return sum(len(v) for v in expiries.values())
+
+    def set_expiries(self, name, expiries):
+        # Pins the expiries of one index (or STOCKS) without a master, e.g. in benchmarks
+        self.expiries[name] = sorted(expiries)
+
+    def entries(self, ts):
+        # One entry per index and live expiry, nearest first:
+        # {"name": block name, "index", "key", "expiry", "rank", "strikes"}
+        out = []
+        for idx in self.indices:
+            for rank, expiry in enumerate(live_expiries(self.expiries.get(idx["name"], ()), ts, idx.get("expiries", 1))):
+                out.append({"name": expiry_label(idx["name"], expiry, rank), "index": idx["name"], "key": idx["key"],
+                            "expiry": expiry, "rank": rank, "strikes": self.strikes.get((idx["name"], expiry), [])})
+        return out
+
+    def stock_expiry(self, ts):
+        live = live_expiries(self.expiries.get(STOCKS, ()), ts, 1)
+        return live[0] if live else None
+
+    def tracked_expiries(self, ts):
+        tracked = {entry["expiry"] for entry in self.entries(ts)}
+        tracked.add(self.stock_expiry(ts))
+        tracked.discard(None)
+        return tracked
@@ -0,0 +1,67 @@
+import threading
+from collections import deque
+
+# Versioned delta protocol for the dashboard sockets. Every payload published
+# on a channel gets a sequence number. A client receives one full snapshot
+#   {"type": "snapshot", "seq": n, "data": <payload>}
+# and afterwards only patches against the previous sequence:
+#   {"type": "patch", "seq": n, "base": n - 1,
+#    "fields": {...changed top-level keys such as timestamp/summary...},
+#    "upsert": [...changed "indices" blocks...], "remove": [...names...],
+#    "order": [...names, only when the block order changed...]}
+# Patches are kept for the last `history` sequences; a client further behind
+# than that (or whose base does not match) gets a fresh snapshot instead.
+
+class DeltaChannel:
+    def __init__(self, history=64):
+        self.seq = 0
+        self.payload = None
+        self.patches = deque(maxlen=history)
+        self._blocks = {}
+        self._order = []
+        self._lock = threading.Lock()
+
+    def publish(self, payload, changed=None, removed=None):
+        # changed/removed are optional hints (block names) from a producer that
+        # already knows what moved; without them blocks are diffed by value.
+        # Returns the patch, or None if the payload is identical.
+        if not payload:
+            return None
+        blocks = {b["name"]: b for b in payload.get("indices", [])}
+        order = [b["name"] for b in payload.get("indices", [])]
+        with self._lock:
+            if self.payload is None:
+                self.seq += 1
+                self.payload, self._blocks, self._order = payload, blocks, order
+                return None
+            if changed is None:
+                changed = [n for n, b in blocks.items() if self._blocks.get(n) != b]
+            if removed is None:
+                removed = [n for n in self._blocks if n not in blocks]
+            fields = {k: v for k, v in payload.items() if k != "indices" and self.payload.get(k) != v}
+            upsert = [blocks[n] for n in changed if n in blocks]
+            removed = [n for n in removed if n not in blocks]
+            if not (fields or upsert or removed or order != self._order):
+                return None
+            patch = {"type": "patch", "seq": self.seq + 1, "base": self.seq, "fields": fields, "upsert": upsert, "remove": removed}
+            if order != self._order:
+                patch["order"] = order
+            self.seq += 1
+            self.patches.append(patch)
+            self.payload, self._blocks, self._order = payload, blocks, order
+            return patch
+
+    def snapshot_message(self):
+        with self._lock:
+            if self.payload is None:
+                return None
+            return {"type": "snapshot", "seq": self.seq, "data": self.payload}
+
+    def messages_since(self, seq):
+        # What a client that last saw `seq` (None = nothing yet) needs next
+        with self._lock:
+            if self.payload is None or seq == self.seq:
+                return []
+            if seq is not None and self.patches and self.patches[0]["base"] <= seq < self.seq:
+                return [p for p in self.patches if p["seq"] > seq]
+        return [self.snapshot_message()]